@@ -0,0 +1,155 @@
+"""Размер на диске и время загрузки сжатых форматов по сравнению с JSON.
+
+Запуск: python benchmarks/compression_footprint.py [размер ...]
+По умолчанию 10 000 и 100 000 заметок и столько же финансовых записей.
+Тексты собираются из повторяющихся фраз с фиксированным seed, поэтому
+результаты воспроизводимы. Для заметок сравниваются export_as_json
+и export_as_compressed (без сжатия, zlib, zlib со словарем, lzma),
+для финансов - save_to_json и save_to_binary со сжатием описаний.
+Файлы пишутся во временный каталог и удаляются после замера.
+"""
+
+import glob
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "personal_assistant"))
+
+from finance_record import FinanceRecord, FinanceService  # noqa: E402
+from note import Note, NoteService  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000)
+
+PHRASES = (
+    "Позвонить в банк по поводу карты",
+    "купить продукты на неделю",
+    "обсудить с командой план релиза",
+    "проверить показания счетчиков",
+    "записаться к врачу на следующей неделе",
+    "оплатить интернет и мобильную связь",
+    "подготовить отчет за квартал",
+    "забрать посылку из пункта выдачи",
+)
+CATEGORIES = ("Еда", "Транспорт", "Зарплата", "Жилье", "Связь")
+
+
+def _text(rng: random.Random, phrases: int) -> str:
+    return ". ".join(rng.choices(PHRASES, k=phrases)) + "."
+
+
+def make_notes(size: int, seed: int = 1) -> NoteService:
+    rng = random.Random(seed)
+    service = NoteService()
+    for i in range(size):
+        service.add_note(
+            Note(f"Заметка {i}", _text(rng, rng.randint(3, 30)), "01-01-2024")
+        )
+    return service
+
+
+def make_records(size: int, seed: int = 1) -> FinanceService:
+    rng = random.Random(seed)
+    service = FinanceService()
+    for _ in range(size):
+        service.add_record(
+            FinanceRecord(
+                round(rng.uniform(-500, 500), 2),
+                rng.choice(CATEGORIES),
+                f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2024",
+                _text(rng, rng.randint(1, 3)),
+            )
+        )
+    return service
+
+
+def _footprint(filename: str) -> int:
+    """Размер файла вместе со служебными файлами (.heap, .categories)."""
+    return sum(os.path.getsize(path) for path in glob.glob(filename + "*"))
+
+
+def _row(name: str, size: int, baseline: int, load: float) -> None:
+    print(
+        f"{name:>24} {size / 1024:>12.0f} {size / baseline:>8.2f} {load:>12.2f}"
+    )
+
+
+def _measure(filename: str, save, load) -> tuple:
+    save(filename)
+    started = time.perf_counter()
+    load(filename)
+    return _footprint(filename), time.perf_counter() - started
+
+
+def run_notes(size: int, directory: str) -> None:
+    service = make_notes(size)
+    print(f"\nЗаметки: {size}")
+    variants = {
+        "json (indent=4)": (service.export_as_json, "import_json"),
+        "без сжатия": (
+            lambda name: service.export_as_compressed(name, "none"),
+            "import_compressed",
+        ),
+        "zlib": (
+            lambda name: service.export_as_compressed(name, "zlib", False),
+            "import_compressed",
+        ),
+        "zlib + словарь": (
+            lambda name: service.export_as_compressed(name, "zlib", True),
+            "import_compressed",
+        ),
+        "lzma": (
+            lambda name: service.export_as_compressed(name, "lzma"),
+            "import_compressed",
+        ),
+    }
+    baseline = None
+    for number, (name, (save, load)) in enumerate(variants.items()):
+        filename = os.path.join(directory, f"notes{number}")
+        footprint, elapsed = _measure(
+            filename, save, lambda name: getattr(NoteService(), load)(name)
+        )
+        baseline = baseline or footprint
+        _row(name, footprint, baseline, elapsed)
+
+
+def run_finance(size: int, directory: str) -> None:
+    service = make_records(size)
+    print(f"\nФинансовые записи: {size}")
+    variants = {
+        "json": (service.save_to_json, "load_from_json"),
+        "binary": (
+            lambda name: service.save_to_binary(name, compression="none"),
+            "load_from_binary",
+        ),
+        "binary + zlib": (
+            lambda name: service.save_to_binary(name, compression="zlib"),
+            "load_from_binary",
+        ),
+        "binary + lzma": (
+            lambda name: service.save_to_binary(name, compression="lzma"),
+            "load_from_binary",
+        ),
+    }
+    baseline = None
+    for number, (name, (save, load)) in enumerate(variants.items()):
+        filename = os.path.join(directory, f"finance{number}")
+        footprint, elapsed = _measure(
+            filename, save, lambda name: getattr(FinanceService(), load)(name)
+        )
+        baseline = baseline or footprint
+        _row(name, footprint, baseline, elapsed)
+
+
+def main(sizes) -> None:
+    print(f"{'формат':>24} {'размер, КБ':>12} {'к JSON':>8} {'загрузка, с':>12}")
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as directory:
+            run_notes(size, directory)
+            run_finance(size, directory)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,80 @@
+"""Нечеткий поиск контактов в зависимости от размера книги.
+
+Запуск: python benchmarks/contact_fuzzy.py [размер ...]
+По умолчанию 10 000, 100 000 и 1 000 000 контактов. Имена состоят
+из имени и фамилии, собранной из слогов; запросы - слово имени
+с одной или двумя опечатками и пары "имя фамилия" с опечаткой.
+Печатается время заполнения на контакт и среднее время запроса.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "personal_assistant"))
+
+from contact import Contact, ContactService  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+QUERIES = 200
+
+FIRST_NAMES = (
+    "анна", "иван", "мария", "петр", "ольга", "сергей", "елена", "олег",
+    "дмитрий", "наталья", "андрей", "татьяна", "алексей", "ирина", "юрий",
+    "светлана", "михаил", "екатерина", "николай", "людмила",
+)  # fmt: skip
+SYLLABLES = (
+    "ка", "ро", "ви", "ле", "ман", "тов", "ни", "ша", "бе", "дор",
+    "гу", "ла", "ми", "сен", "ко", "ря", "зо", "пу", "ло", "ва",
+)  # fmt: skip
+ALPHABET = "абвгдежзиклмнопрстуфхцчшщыэюя"
+
+
+def _surname(rng: random.Random) -> str:
+    return "".join(rng.choices(SYLLABLES, k=rng.randint(2, 4))) + "ов"
+
+
+def _typo(rng: random.Random, word: str, edits: int) -> str:
+    for _ in range(edits):
+        position = rng.randrange(len(word))
+        word = word[:position] + rng.choice(ALPHABET) + word[position + 1 :]
+    return word
+
+
+def _measure(service: ContactService, queries, max_distance: int) -> float:
+    started = time.perf_counter()
+    for query in queries:
+        service.find_contact_fuzzy(query, max_distance)
+    return (time.perf_counter() - started) / len(queries) * 1000
+
+
+def main(sizes) -> None:
+    print(
+        f"{'контактов':>10} {'слов':>8} {'add, мкс':>9} {'1 слово d=1, мс':>16} "
+        f"{'1 слово d=2, мс':>16} {'2 слова d=2, мс':>16}"
+    )
+    for size in sizes:
+        rng = random.Random(size)
+        names = [f"{rng.choice(FIRST_NAMES)} {_surname(rng)}" for _ in range(size)]
+        service = ContactService()
+        started = time.perf_counter()
+        for i, name in enumerate(names):
+            service.add_contact(Contact(name, f"+7999{i:07d}", ""))
+        add_time = (time.perf_counter() - started) / size * 1e6
+
+        sample = rng.sample(names, QUERIES)
+        surnames = [name.split()[1] for name in sample]
+        one_edit = [_typo(rng, surname, 1) for surname in surnames]
+        two_edits = [_typo(rng, surname, 2) for surname in surnames]
+        pairs = [_typo(rng, name, 1) for name in sample]
+        print(
+            f"{size:>10} {len(service._word_contacts):>8} {add_time:>9.1f} "
+            f"{_measure(service, one_edit, 1):>16.2f} "
+            f"{_measure(service, two_edits, 2):>16.2f} "
+            f"{_measure(service, pairs, 2):>16.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,59 @@
+"""Время загрузки реестра и отчета за квартал в зависимости от размера реестра.
+
+Запуск: python benchmarks/finance_report.py [размер ...]
+По умолчанию размеры 10 000, 100 000 и 1 000 000 записей; даты записей
+идут в случайном порядке, как в несортированной банковской выгрузке.
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "personal_assistant"))
+
+from finance_record import FinanceRecord, FinanceService  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+REPORTS = 20
+
+
+def make_records(size: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [
+        FinanceRecord(
+            rng.uniform(-500, 500),
+            rng.choice(("Еда", "Транспорт", "Зарплата", "Жилье")),
+            f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-"
+            f"{rng.randint(2015, 2024)}",
+            "",
+        )
+        for _ in range(size)
+    ]
+
+
+def main(sizes) -> None:
+    print(
+        f"{'записей':>10} {'загрузка, с':>12} {'на запись, мкс':>15} "
+        f"{'отчет, мс':>10} {'строк':>8}"
+    )
+    for size in sizes:
+        records = make_records(size)
+        service = FinanceService()
+        started = time.perf_counter()
+        for record in records:
+            service.add_record(record)
+        load = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for _ in range(REPORTS):
+            rows = service.generate_report("01-01-2020", "31-03-2020")
+        report = (time.perf_counter() - started) / REPORTS
+        print(
+            f"{size:>10} {load:>12.2f} {load / size * 1e6:>15.1f} "
+            f"{report * 1000:>10.2f} {len(rows):>8}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,132 @@
+"""Операции по id во всех четырех сервисах в зависимости от числа записей.
+
+Запуск: python benchmarks/services_by_id.py [размер ...]
+По умолчанию 10 000, 100 000 и 1 000 000 записей. Для каждого сервиса
+печатается среднее время добавления одной записи при заполнении и
+время поиска, замены и удаления по id (по OPERATIONS случайных id).
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "personal_assistant"))
+
+from contact import Contact, ContactService  # noqa: E402
+from finance_record import FinanceRecord, FinanceService  # noqa: E402
+from note import Note, NoteService  # noqa: E402
+from task import Task, TaskService  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+OPERATIONS = 10_000
+
+WORDS = ("анна", "иван", "мария", "петр", "ольга", "сергей", "елена", "олег")
+
+
+def _date(rng: random.Random) -> str:
+    day, month = rng.randint(1, 28), rng.randint(1, 12)
+    return f"{day:02d}-{month:02d}-{rng.randint(2015, 2024)}"
+
+
+def _contact(rng: random.Random, i: int) -> Contact:
+    return Contact(f"{rng.choice(WORDS)} {rng.choice(WORDS)}{i}", f"+7999{i:07d}", "")
+
+
+def _note(rng: random.Random, i: int) -> Note:
+    return Note(f"Заметка {i}", f"{rng.choice(WORDS)} {rng.choice(WORDS)}", "")
+
+
+def _task(rng: random.Random, i: int) -> Task:
+    return Task(f"Задача {i}", "", rng.random() < 0.3, rng.randint(0, 5), _date(rng))
+
+
+def _record(rng: random.Random, i: int) -> FinanceRecord:
+    return FinanceRecord(rng.uniform(-500, 500), rng.choice(WORDS), _date(rng), "")
+
+
+# сервис, фабрика записей, добавление, поиск, замена и удаление по id
+SERVICES = {
+    "contacts": (
+        ContactService,
+        _contact,
+        "add_contact",
+        lambda service, item_id: service.contacts.get(item_id),
+        lambda service, item_id, item: service.edit_contact(
+            str(item_id), item.name, item.phone, item.email
+        ),
+        lambda service, item_id: service.delete_contact(str(item_id)),
+    ),
+    "notes": (
+        NoteService,
+        _note,
+        "add_note",
+        lambda service, item_id: service.get_note_by_id(item_id),
+        lambda service, item_id, item: service.replace_note_by_id(item_id, item),
+        lambda service, item_id: service.delete_note_by_id(item_id),
+    ),
+    "tasks": (
+        TaskService,
+        _task,
+        "add_task",
+        lambda service, item_id: service.get_task_by_id(item_id),
+        lambda service, item_id, item: service.replace_task_by_id(item_id, item),
+        lambda service, item_id: service.delete_task_by_id(item_id),
+    ),
+    "finance": (
+        FinanceService,
+        _record,
+        "add_record",
+        lambda service, item_id: service.get_record_by_id(item_id),
+        lambda service, item_id, item: service.replace_record_by_id(item_id, item),
+        lambda service, item_id: service.delete_record_by_id(item_id),
+    ),
+}
+
+
+def _per_op(started: float, count: int) -> float:
+    return (time.perf_counter() - started) / count * 1e6
+
+
+def run(name: str, size: int) -> None:
+    service_type, factory, add, get, replace, delete = SERVICES[name]
+    rng = random.Random(size)
+    items = [factory(rng, i) for i in range(size)]
+    service = service_type()
+    add_item = getattr(service, add)
+    started = time.perf_counter()
+    for item in items:
+        add_item(item)
+    add_time = _per_op(started, size)
+
+    ids = [item.id for item in rng.sample(items, min(OPERATIONS, size))]
+    started = time.perf_counter()
+    for item_id in ids:
+        get(service, item_id)
+    get_time = _per_op(started, len(ids))
+    started = time.perf_counter()
+    for i, item_id in enumerate(ids):
+        replace(service, item_id, factory(rng, size + i))
+    replace_time = _per_op(started, len(ids))
+    started = time.perf_counter()
+    for item_id in ids:
+        delete(service, item_id)
+    delete_time = _per_op(started, len(ids))
+    print(
+        f"{name:>9} {size:>10} {add_time:>10.1f} {get_time:>10.2f} "
+        f"{replace_time:>10.1f} {delete_time:>10.1f}"
+    )
+
+
+def main(sizes) -> None:
+    print(
+        f"{'сервис':>9} {'записей':>10} {'add, мкс':>10} {'get, мкс':>10} "
+        f"{'replace':>10} {'delete':>10}"
+    )
+    for size in sizes:
+        for name in SERVICES:
+            run(name, size)
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,80 @@
+"""Заполнение TaskService и запросы TaskQuery в зависимости от числа задач.
+
+Запуск: python benchmarks/task_query.py [размер ...]
+По умолчанию 10 000, 100 000 и 1 000 000 задач. Печатается среднее время
+добавления и замены задачи (индексы приоритета и срока обновляются при
+каждой операции) и время запроса "не выполнена, приоритет >= 3, срок
+в ближайшие 7 дней, в названии есть слово" с выбранным индексом.
+"""
+
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "personal_assistant"))
+
+from task import Task, TaskService  # noqa: E402
+
+DEFAULT_SIZES = (10_000, 100_000, 1_000_000)
+OPERATIONS = 10_000
+QUERIES = 20
+TODAY = date(2024, 6, 1)
+WORDS = ("отчет", "звонок", "встреча", "покупка", "оплата", "ремонт")
+
+
+def _task(rng: random.Random, i: int) -> Task:
+    due = TODAY + timedelta(days=rng.randint(-365, 365))
+    return Task(
+        f"{rng.choice(WORDS)} {i}",
+        "",
+        rng.random() < 0.3,
+        rng.randint(0, 5),
+        due.strftime("%d-%m-%Y"),
+    )
+
+
+def main(sizes) -> None:
+    print(
+        f"{'задач':>10} {'add, мкс':>10} {'replace, мкс':>13} "
+        f"{'запрос, мс':>11} {'индекс':>9} {'строк':>8}"
+    )
+    for size in sizes:
+        rng = random.Random(size)
+        tasks = [_task(rng, i) for i in range(size)]
+        service = TaskService()
+        started = time.perf_counter()
+        for task in tasks:
+            service.add_task(task)
+        add_time = (time.perf_counter() - started) / size * 1e6
+
+        ids = [task.id for task in rng.sample(tasks, min(OPERATIONS, size))]
+        started = time.perf_counter()
+        for i, task_id in enumerate(ids):
+            service.replace_task_by_id(task_id, _task(rng, size + i))
+        replace_time = (time.perf_counter() - started) / len(ids) * 1e6
+
+        def query():
+            return (
+                service.query()
+                .done(False)
+                .priority(3)
+                .due_within(7, TODAY)
+                .title_contains("отчет")
+                .limit(20)
+            )
+
+        started = time.perf_counter()
+        for _ in range(QUERIES):
+            query().all()
+        query_time = (time.perf_counter() - started) / QUERIES * 1000
+        plan = query().explain()
+        print(
+            f"{size:>10} {add_time:>10.1f} {replace_time:>13.1f} "
+            f"{query_time:>11.2f} {plan['index']:>9} {plan['rows']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
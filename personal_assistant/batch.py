@@ -0,0 +1,459 @@
+import json
+import math
+import os
+import sys
+import uuid
+from typing import Any, Callable, Dict, Iterable, Optional, TextIO, Tuple
+
+from calculator import calculate
+from contact import Contact, ContactService
+from finance_record import FinanceRecord, FinanceService
+from indexes import MERGE_OVERWRITE, parse_id
+from note import Note, NoteService
+from task import Task, TaskService
+
+# Результаты сбрасываются в вывод пачками по столько строк
+_FLUSH_EVERY = 1024
+
+# NaN и бесконечности не пишутся: это не JSON, и ответ с ними не прочитает
+# строгий парсер; такой результат становится ошибкой команды (_encode_result)
+_encode = json.JSONEncoder(
+    ensure_ascii=False, separators=(",", ":"), check_circular=False, allow_nan=False
+).encode
+_decode = json.JSONDecoder().decode
+
+
+def _id(args: dict, key: str = "id") -> uuid.UUID:
+    value = parse_id(args[key])
+    if value is None:
+        raise ValueError(f"Некорректный ID: {args[key]}")
+    return value
+
+
+def _amount(value: Any) -> float:
+    amount = float(value)
+    if not math.isfinite(amount):
+        raise ValueError(f"Некорректная сумма: {value}")
+    return amount
+
+
+def _encode_result(request_id: Any, result: Any) -> str:
+    try:
+        return _encode({"id": request_id, "ok": True, "result": result})
+    except ValueError:
+        raise ValueError("Результат содержит NaN или бесконечность") from None
+
+
+def _dicts(items: Iterable[Any]) -> list:
+    return [item.to_dict() for item in items]
+
+
+def _file(args: dict) -> str:
+    """Имя файла для загрузки; отсутствующий файл - ошибка команды.
+
+    Методы загрузки сервисов при отсутствии файла печатают сообщение
+    в stdout, что смешало бы его с ответами пакетного режима.
+    """
+    filename = args["file"]
+    if not os.path.exists(filename):
+        raise ValueError(f"Файл {filename} не найден")
+    return filename
+
+
+def _format(args: dict, formats: Iterable[str]) -> str:
+    value = args.get("format", "json")
+    if value not in formats:
+        raise ValueError(f"Неизвестный формат: {value}")
+    return value
+
+
+class BatchRunner:
+    """Выполнение команд без меню: одна команда JSON в строке.
+
+    Строка команды: {"cmd": "task.add", "args": {...}, "id": ...}; "id"
+    необязателен и возвращается в ответе для сопоставления. На каждую
+    команду выводится строка {"id": ..., "ok": true, "result": ...} или
+    {"id": ..., "ok": false, "error": "..."}; ошибка одной команды
+    не прерывает выполнение остальных. Список команд — COMMANDS.
+    Команды *.edit меняют только переданные поля; *.save и *.load
+    сохраняют и загружают раздел в формате args["format"] (по умолчанию
+    JSON), *.export и *.import работают с CSV; загрузка возвращает
+    число записей в разделе после нее.
+    """
+
+    def __init__(
+        self,
+        note_service: Optional[NoteService] = None,
+        task_service: Optional[TaskService] = None,
+        contact_service: Optional[ContactService] = None,
+        finance_service: Optional[FinanceService] = None,
+    ) -> None:
+        self.notes = note_service or NoteService()
+        self.tasks = task_service or TaskService()
+        self.contacts = contact_service or ContactService()
+        self.finance = finance_service or FinanceService()
+        # имя команды -> (метод, обязательные аргументы)
+        self.commands: Dict[str, Tuple[Callable[[dict], Any], Tuple[str, ...]]] = {
+            name: (getattr(self, method), required)
+            for name, (method, required) in COMMANDS.items()
+        }
+
+    # Заметки
+
+    def note_add(self, args: dict) -> str:
+        note = Note(args["title"], args["content"], args.get("timestamp", ""))
+        self.notes.add_note(note)
+        return str(note.id)
+
+    def note_get(self, args: dict) -> Optional[dict]:
+        note = self.notes.get_note_by_id(_id(args))
+        return note.to_dict() if note else None
+
+    def note_list(self, args: dict) -> list:
+        return _dicts(self.notes.get_all_notes())
+
+    def note_edit(self, args: dict) -> bool:
+        """Замена заметки; не переданные поля остаются прежними."""
+        note_id = _id(args)
+        note = self.notes.get_note_by_id(note_id)
+        if note is None:
+            return False
+        return self.notes.replace_note_by_id(
+            note_id,
+            Note(
+                args.get("title", note.title),
+                args.get("content", note.content),
+                args.get("timestamp", note.timestamp),
+            ),
+        )
+
+    def note_delete(self, args: dict) -> bool:
+        return self.notes.delete_note_by_id(_id(args))
+
+    def note_search(self, args: dict) -> list:
+        return _dicts(self.notes.search_notes(args["query"], args.get("limit", 10)))
+
+    def note_save(self, args: dict) -> bool:
+        if _format(args, ("json", "pack")) == "pack":
+            self.notes.export_as_compressed(args["file"], args.get("method", "zlib"))
+        else:
+            self.notes.export_as_json(args["file"])
+        return True
+
+    def note_load(self, args: dict) -> int:
+        policy = args.get("policy", MERGE_OVERWRITE)
+        if _format(args, ("json", "pack")) == "pack":
+            self.notes.import_compressed(_file(args), policy)
+        else:
+            self.notes.import_json(_file(args), policy)
+        return len(self.notes.notes)
+
+    def note_export(self, args: dict) -> bool:
+        self.notes.export_as_csv(args["file"])
+        return True
+
+    def note_import(self, args: dict) -> int:
+        self.notes.import_csv(_file(args))
+        return len(self.notes.notes)
+
+    # Задачи
+
+    def task_add(self, args: dict) -> str:
+        task = Task(
+            args["title"],
+            args.get("description", ""),
+            bool(args.get("done", False)),
+            int(args.get("priority", 0)),
+            args.get("due_date", ""),
+        )
+        self.tasks.add_task(task)
+        return str(task.id)
+
+    def task_get(self, args: dict) -> Optional[dict]:
+        task = self.tasks.get_task_by_id(_id(args))
+        return task.to_dict() if task else None
+
+    def task_list(self, args: dict) -> list:
+        return _dicts(self.tasks.get_all_tasks())
+
+    def task_edit(self, args: dict) -> bool:
+        """Замена задачи; не переданные поля остаются прежними."""
+        task_id = _id(args)
+        task = self.tasks.get_task_by_id(task_id)
+        if task is None:
+            return False
+        return self.tasks.replace_task_by_id(
+            task_id,
+            Task(
+                args.get("title", task.title),
+                args.get("description", task.description),
+                bool(args.get("done", task.done)),
+                int(args.get("priority", task.priority)),
+                args.get("due_date", task.due_date),
+            ),
+        )
+
+    def task_delete(self, args: dict) -> bool:
+        return self.tasks.delete_task_by_id(_id(args))
+
+    def task_done(self, args: dict) -> bool:
+        return self.tasks.mark_task_done(_id(args))
+
+    def task_next(self, args: dict) -> list:
+        return _dicts(self.tasks.next_tasks(args.get("n", 5)))
+
+    def task_overdue(self, args: dict) -> list:
+        return _dicts(self.tasks.overdue(args.get("today")))
+
+    def task_save(self, args: dict) -> bool:
+        _format(args, ("json",))
+        self.tasks.export_as_json(args["file"])
+        return True
+
+    def task_load(self, args: dict) -> int:
+        _format(args, ("json",))
+        self.tasks.import_json(_file(args), args.get("policy", MERGE_OVERWRITE))
+        return len(self.tasks.tasks)
+
+    def task_export(self, args: dict) -> bool:
+        self.tasks.export_as_csv(args["file"])
+        return True
+
+    def task_import(self, args: dict) -> int:
+        self.tasks.import_csv(_file(args), args.get("rejects"))
+        return len(self.tasks.tasks)
+
+    # Контакты
+
+    def contact_add(self, args: dict) -> str:
+        contact = Contact(args["name"], args.get("phone", ""), args.get("email", ""))
+        self.contacts.add_contact(contact)
+        return str(contact.id)
+
+    def contact_edit(self, args: dict) -> bool:
+        return self.contacts.edit_contact(
+            str(_id(args)), args.get("name"), args.get("phone"), args.get("email")
+        )
+
+    def contact_find(self, args: dict) -> list:
+        return _dicts(self.contacts.find_contact(args["term"]))
+
+    def contact_list(self, args: dict) -> list:
+        return _dicts(self.contacts.get_all_contacts())
+
+    def contact_delete(self, args: dict) -> bool:
+        return self.contacts.delete_contact(str(_id(args)))
+
+    def contact_save(self, args: dict) -> bool:
+        _format(args, ("json",))
+        self.contacts.save_to_json(args["file"])
+        return True
+
+    def contact_load(self, args: dict) -> int:
+        _format(args, ("json",))
+        self.contacts.load_from_json(_file(args), args.get("policy", MERGE_OVERWRITE))
+        return len(self.contacts.contacts)
+
+    def contact_export(self, args: dict) -> bool:
+        self.contacts.export_to_csv(args["file"])
+        return True
+
+    def contact_import(self, args: dict) -> int:
+        self.contacts.import_from_csv(
+            _file(args), args.get("policy", MERGE_OVERWRITE)
+        )
+        return len(self.contacts.contacts)
+
+    # Финансы
+
+    def finance_add(self, args: dict) -> str:
+        record = FinanceRecord(
+            _amount(args["amount"]),
+            args["category"],
+            args["date"],
+            args.get("description", ""),
+        )
+        self.finance.add_record(record)
+        return str(record.id)
+
+    def finance_get(self, args: dict) -> Optional[dict]:
+        record = self.finance.get_record_by_id(_id(args))
+        return record.to_dict() if record else None
+
+    def finance_list(self, args: dict) -> list:
+        return _dicts(self.finance.get_all_records())
+
+    def finance_edit(self, args: dict) -> bool:
+        """Замена записи; не переданные поля остаются прежними."""
+        record_id = _id(args)
+        record = self.finance.get_record_by_id(record_id)
+        if record is None:
+            return False
+        return self.finance.replace_record_by_id(
+            record_id,
+            FinanceRecord(
+                _amount(args.get("amount", record.amount)),
+                args.get("category", record.category),
+                args.get("date", record.date),
+                args.get("description", record.description),
+            ),
+        )
+
+    def finance_delete(self, args: dict) -> bool:
+        return self.finance.delete_record_by_id(_id(args))
+
+    def finance_filter(self, args: dict) -> list:
+        return _dicts(
+            self.finance.filter_records(args.get("category"), args.get("date"))
+        )
+
+    def finance_report(self, args: dict) -> list:
+        return _dicts(self.finance.generate_report(args["start"], args["end"]))
+
+    def finance_totals(self, args: dict) -> dict:
+        return self.finance.get_totals().to_dict()
+
+    def finance_save(self, args: dict) -> bool:
+        if _format(args, ("json", "binary")) == "binary":
+            self.finance.save_to_binary(
+                args["file"], compression=args.get("compression", "none")
+            )
+        else:
+            self.finance.save_to_json(args["file"])
+        return True
+
+    def finance_load(self, args: dict) -> int:
+        policy = args.get("policy", MERGE_OVERWRITE)
+        if _format(args, ("json", "binary")) == "binary":
+            self.finance.load_from_binary(_file(args), policy)
+        else:
+            self.finance.load_from_json(_file(args), policy)
+        return len(self.finance.records)
+
+    def finance_export(self, args: dict) -> bool:
+        self.finance.export_to_csv(args["file"])
+        return True
+
+    def finance_import(self, args: dict) -> int:
+        self.finance.import_from_csv(_file(args), args.get("rejects"))
+        return len(self.finance.records)
+
+    # Калькулятор
+
+    def calc(self, args: dict) -> float:
+        return calculate(args["expression"], args.get("variables"))
+
+    def execute(self, line: str) -> Tuple[str, bool]:
+        """Выполнение одной строки; возвращает строку ответа и признак успеха."""
+        request_id = None
+        try:
+            request = _decode(line)
+            request_id = request.get("id")
+            command = self.commands.get(request.get("cmd"))
+            if command is None:
+                raise ValueError(f"Неизвестная команда: {request.get('cmd')}")
+            method, required = command
+            args = request.get("args") or {}
+            missing = [name for name in required if name not in args]
+            if missing:
+                raise ValueError(f"Отсутствует аргумент: {', '.join(missing)}")
+            result = method(args)
+            response = _encode_result(request_id, result)
+        except Exception as error:
+            # Любая ошибка команды (в том числе OverflowError, RecursionError
+            # или результат, который нельзя записать в JSON) становится
+            # ответом и не прерывает пакет
+            message = str(error) or type(error).__name__
+        else:
+            return response, True
+        return _encode({"id": request_id, "ok": False, "error": message}), False
+
+    def run(self, lines: Iterable[str], output: TextIO) -> Tuple[int, int]:
+        """Выполнение потока команд; возвращает число команд и число ошибок.
+
+        Пустые строки пропускаются, ответы пишутся в output по мере
+        выполнения.
+        """
+        count = errors = 0
+        pending = []
+        for line in lines:
+            if not line.strip():
+                continue
+            response, ok = self.execute(line)
+            count += 1
+            errors += not ok
+            pending.append(response)
+            if len(pending) >= _FLUSH_EVERY:
+                pending.append("")
+                output.write("\n".join(pending))
+                pending.clear()
+        if pending:
+            pending.append("")
+            output.write("\n".join(pending))
+        output.flush()
+        return count, errors
+
+
+# Имя команды -> (метод BatchRunner, обязательные аргументы)
+COMMANDS = {
+    "note.add": ("note_add", ("title", "content")),
+    "note.get": ("note_get", ("id",)),
+    "note.list": ("note_list", ()),
+    "note.edit": ("note_edit", ("id",)),
+    "note.delete": ("note_delete", ("id",)),
+    "note.search": ("note_search", ("query",)),
+    "note.save": ("note_save", ("file",)),
+    "note.load": ("note_load", ("file",)),
+    "note.export": ("note_export", ("file",)),
+    "note.import": ("note_import", ("file",)),
+    "task.add": ("task_add", ("title",)),
+    "task.get": ("task_get", ("id",)),
+    "task.list": ("task_list", ()),
+    "task.edit": ("task_edit", ("id",)),
+    "task.delete": ("task_delete", ("id",)),
+    "task.done": ("task_done", ("id",)),
+    "task.next": ("task_next", ()),
+    "task.overdue": ("task_overdue", ()),
+    "task.save": ("task_save", ("file",)),
+    "task.load": ("task_load", ("file",)),
+    "task.export": ("task_export", ("file",)),
+    "task.import": ("task_import", ("file",)),
+    "contact.add": ("contact_add", ("name",)),
+    "contact.edit": ("contact_edit", ("id",)),
+    "contact.find": ("contact_find", ("term",)),
+    "contact.list": ("contact_list", ()),
+    "contact.delete": ("contact_delete", ("id",)),
+    "contact.save": ("contact_save", ("file",)),
+    "contact.load": ("contact_load", ("file",)),
+    "contact.export": ("contact_export", ("file",)),
+    "contact.import": ("contact_import", ("file",)),
+    "finance.add": ("finance_add", ("amount", "category", "date")),
+    "finance.get": ("finance_get", ("id",)),
+    "finance.list": ("finance_list", ()),
+    "finance.edit": ("finance_edit", ("id",)),
+    "finance.delete": ("finance_delete", ("id",)),
+    "finance.filter": ("finance_filter", ()),
+    "finance.report": ("finance_report", ("start", "end")),
+    "finance.totals": ("finance_totals", ()),
+    "finance.save": ("finance_save", ("file",)),
+    "finance.load": ("finance_load", ("file",)),
+    "finance.export": ("finance_export", ("file",)),
+    "finance.import": ("finance_import", ("file",)),
+    "calc": ("calc", ("expression",)),
+}
+
+
+def main(argv: Optional[list] = None, runner: Optional[BatchRunner] = None) -> int:
+    """Точка входа пакетного режима: команды из файла argv[0] или stdin."""
+    argv = sys.argv[1:] if argv is None else argv
+    runner = runner or BatchRunner()
+    if argv and argv[0] != "-":
+        with open(argv[0], mode="r", encoding="utf-8") as file:
+            _, errors = runner.run(file, sys.stdout)
+    else:
+        _, errors = runner.run(sys.stdin, sys.stdout)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import json
+import mmap
+import os
+import struct
+import uuid
+from datetime import date as date_type
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from compression import METHOD_NONE, BlockCodec
+from finance_record import FinanceRecord
+from indexes import DATE_FORMAT, date_key
+
+MAGIC = b"PALEDGER"
+VERSION = 4
+HEADER = struct.Struct("<8sII")
+# id, сумма, порядковый номер дня, код категории, смещение и длина описания,
+# время последнего изменения
+RECORD = struct.Struct("<16sdiIQId")
+
+
+@lru_cache(maxsize=4096)
+def _date_string(ordinal: int) -> str:
+    return date_type.fromordinal(ordinal).strftime(DATE_FORMAT)
+
+
+class BinaryLedger:
+    """Двоичный файл финансовых записей фиксированной ширины.
+
+    Записи лежат в основном файле, описания — в куче строк filename.heap,
+    названия категорий — по одному JSON значению в строке filename.categories.
+    Куча начинается с описания кодека, каждое описание сжато отдельно;
+    кодек нового файла задается параметром codec, существующего — читается
+    из файла.
+    Файлы отображаются в память через mmap и читаются по требованию;
+    новые записи дописываются в конец без перезаписи файла.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        create: bool = False,
+        codec: Optional[BlockCodec] = None,
+    ) -> None:
+        self.filename = filename
+        self.heap_filename = filename + ".heap"
+        self.categories_filename = filename + ".categories"
+        mode = "w+b" if create or not os.path.exists(filename) else "r+b"
+        self._file = open(filename, mode)
+        self._heap_file = open(self.heap_filename, mode)
+        self._categories_file = open(
+            self.categories_filename, mode.replace("b", ""), encoding="utf-8"
+        )
+        self._map: Optional[mmap.mmap] = None
+        self._heap_map: Optional[mmap.mmap] = None
+
+        if mode == "w+b":
+            self.codec = codec or BlockCodec(METHOD_NONE)
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size))
+            self._file.flush()
+            self._heap_file.write(self.codec.header())
+            self._heap_file.flush()
+        else:
+            magic, version, record_size = HEADER.unpack(
+                self._file.read(HEADER.size)
+            )
+            if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+                self.close()
+                raise ValueError(f"Файл {filename} не является двоичным реестром")
+            self.codec = BlockCodec.read_header(self._heap_file)
+
+        self._categories: List[str] = [
+            json.loads(line) for line in self._categories_file if line.strip()
+        ]
+        self._category_codes: Dict[str, int] = {
+            name: code for code, name in enumerate(self._categories)
+        }
+        self._remap()
+
+    def __enter__(self) -> "BinaryLedger":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._unmap()
+        self._file.close()
+        self._heap_file.close()
+        self._categories_file.close()
+
+    def _unmap(self) -> None:
+        for mapped in (self._map, self._heap_map):
+            if mapped is not None:
+                mapped.close()
+        self._map = self._heap_map = None
+
+    def _remap(self) -> None:
+        """Повторное отображение файлов после дозаписи."""
+        self._unmap()
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._heap_map = mmap.mmap(
+            self._heap_file.fileno(), 0, access=mmap.ACCESS_READ
+        )
+
+    def __len__(self) -> int:
+        return (len(self._map) - HEADER.size) // RECORD.size
+
+    def _unpack(self, index: int) -> tuple:
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)
+
+    def _description(self, offset: int, length: int) -> str:
+        if length == 0:
+            return ""
+        data = self.codec.decompress(self._heap_map[offset : offset + length])
+        return str(data, "utf-8")
+
+    def amount(self, index: int) -> float:
+        """Сумма записи без создания объекта FinanceRecord."""
+        return self._unpack(index)[1]
+
+    def record_id(self, index: int) -> uuid.UUID:
+        return uuid.UUID(bytes=self._unpack(index)[0])
+
+    def _record(self, fields: tuple) -> FinanceRecord:
+        raw_id, amount, ordinal, category_code, offset, length, updated_at = fields
+        return FinanceRecord(
+            amount=amount,
+            category=self._categories[category_code],
+            date=_date_string(ordinal),
+            description=self._description(offset, length),
+            id=uuid.UUID(bytes=raw_id),
+            updated_at=updated_at,
+        )
+
+    def __getitem__(self, index: int) -> FinanceRecord:
+        return self._record(self._unpack(index))
+
+    def __iter__(self) -> Iterator[FinanceRecord]:
+        unpack, size = RECORD.unpack_from, RECORD.size
+        for position in range(HEADER.size, HEADER.size + len(self) * size, size):
+            yield self._record(unpack(self._map, position))
+
+    def _category_code(self, category: str) -> int:
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(category)
+            self._category_codes[category] = code
+            self._categories_file.seek(0, os.SEEK_END)
+            self._categories_file.write(json.dumps(category, ensure_ascii=False))
+            self._categories_file.write("\n")
+        return code
+
+    def extend(self, records: Iterable[FinanceRecord]) -> None:
+        """Дозапись записей в конец файла."""
+        self._unmap()
+        self._file.seek(0, os.SEEK_END)
+        self._heap_file.seek(0, os.SEEK_END)
+        heap_offset = self._heap_file.tell()
+        chunk = bytearray()
+        heap_chunk = bytearray()
+        for record in records:
+            ordinal = date_key(record.date)
+            if ordinal is None:
+                self._remap()
+                raise ValueError(
+                    f"Некорректная дата записи {record.id}: {record.date}"
+                )
+            description = (
+                self.codec.compress(record.description.encode("utf-8"))
+                if record.description
+                else b""
+            )
+            chunk += RECORD.pack(
+                record.id.bytes,
+                record.amount,
+                ordinal,
+                self._category_code(record.category),
+                heap_offset + len(heap_chunk),
+                len(description),
+                record.updated_at,
+            )
+            heap_chunk += description
+        self._categories_file.flush()
+        self._heap_file.write(heap_chunk)
+        self._heap_file.flush()
+        self._file.write(chunk)
+        self._file.flush()
+        self._remap()
+
+    def append(self, record: FinanceRecord) -> None:
+        self.extend([record])
@@ -1,31 +1,463 @@
-def calculate(expression: str) -> float:
-    """Calculates the result of a simple arithmetic expression."""
+import math
+import operator
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, FrozenSet, List, Mapping, Optional, Tuple
+
+COMPILE_CACHE_SIZE = 4096
+
+# Expression tree nodes are tuples:
+#   ("num", value), ("var", name), ("neg", operand),
+#   ("bin", operator, left, right), ("call", name, arguments)
+Node = Tuple[Any, ...]
+Compiled = Callable[[Mapping[str, float]], float]
+
+
+class CalculatorError(ValueError):
+    """Base error of the calculator; position is an offset in the expression."""
+
+    def __init__(self, message: str, position: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.position = position
+
+
+class ExpressionSyntaxError(CalculatorError):
+    pass
+
+
+class UnknownNameError(CalculatorError):
+    pass
+
+
+class DivisionByZeroError(CalculatorError, ZeroDivisionError):
+    pass
+
+
+class EvaluationError(CalculatorError):
+    pass
+
+
+FUNCTIONS: Dict[str, Tuple[Callable[..., float], Optional[int]]] = {
+    # name -> (function, number of arguments or None for two or more)
+    "abs": (abs, 1),
+    "round": (round, 1),
+    "sqrt": (math.sqrt, 1),
+    "exp": (math.exp, 1),
+    "log": (math.log, 1),
+    "sin": (math.sin, 1),
+    "cos": (math.cos, 1),
+    "tan": (math.tan, 1),
+    "pow": (math.pow, 2),
+    "min": (min, None),
+    "max": (max, None),
+}
+CONSTANTS = {"pi": math.pi, "e": math.e}
+
+_BINARY = {
+    "+": operator.add,
+    "-": operator.sub,
+    "*": operator.mul,
+    "/": operator.truediv,
+    "^": operator.pow,
+}
+# Binding power of binary operators; "^" is right-associative.
+_PRECEDENCE = {"+": 1, "-": 1, "*": 2, "/": 2, "^": 4}
+_UNARY_PRECEDENCE = 3
+
+_TOKEN = re.compile(
+    r"\s*(?:(?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)"
+    r"|(?P<name>[^\W\d]\w*)"
+    r"|(?P<op>\*\*|[-+*/^(),]))"
+)
+
+
+def _tokenize(expression: str) -> List[Tuple[str, str, int]]:
+    """Split an expression into (kind, text, position) tokens."""
+    tokens = []
+    position = 0
+    length = len(expression)
+    while position < length:
+        if expression[position].isspace():
+            position += 1
+            continue
+        match = _TOKEN.match(expression, position)
+        if match is None or match.lastgroup is None:
+            raise ExpressionSyntaxError(
+                f"Недопустимый символ '{expression[position]}' в позиции "
+                f"{position + 1}",
+                position,
+            )
+        text = match.group(match.lastgroup)
+        kind = match.lastgroup
+        if text == "**":
+            text = "^"
+        tokens.append((kind, text, match.start(match.lastgroup)))
+        position = match.end()
+    tokens.append(("end", "", length))
+    return tokens
+
+
+class _Parser:
+    """Precedence-climbing parser producing the tuple expression tree."""
+
+    def __init__(self, expression: str) -> None:
+        self.tokens = _tokenize(expression)
+        self.index = 0
+
+    def _peek(self) -> Tuple[str, str, int]:
+        return self.tokens[self.index]
+
+    def _next(self) -> Tuple[str, str, int]:
+        token = self.tokens[self.index]
+        self.index += 1
+        return token
+
+    def _expect(self, text: str) -> None:
+        kind, token_text, position = self._next()
+        if token_text != text or kind != "op":
+            raise ExpressionSyntaxError(
+                f"Ожидалось '{text}' в позиции {position + 1}", position
+            )
+
+    def parse(self) -> Node:
+        if self._peek()[0] == "end":
+            raise ExpressionSyntaxError("Пустое выражение", 0)
+        tree = self._expression(0)
+        kind, text, position = self._peek()
+        if kind != "end":
+            raise ExpressionSyntaxError(
+                f"Лишний символ '{text}' в позиции {position + 1}", position
+            )
+        return tree
+
+    def _expression(self, min_precedence: int) -> Node:
+        left = self._unary()
+        while True:
+            kind, text, _ = self._peek()
+            precedence = _PRECEDENCE.get(text) if kind == "op" else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self._next()
+            # "^" binds to the right, the rest to the left
+            next_precedence = precedence if text == "^" else precedence + 1
+            left = ("bin", text, left, self._expression(next_precedence))
+
+    def _unary(self) -> Node:
+        kind, text, _ = self._peek()
+        if kind == "op" and text in "+-":
+            self._next()
+            operand = self._expression(_UNARY_PRECEDENCE)
+            return ("neg", operand) if text == "-" else operand
+        return self._primary()
+
+    def _primary(self) -> Node:
+        kind, text, position = self._next()
+        if kind == "number":
+            return ("num", float(text))
+        if kind == "name":
+            if self._peek()[1] == "(":
+                return self._call(text, position)
+            return ("var", text)
+        if text == "(":
+            tree = self._expression(0)
+            self._expect(")")
+            return tree
+        if kind == "end":
+            raise ExpressionSyntaxError("Неожиданный конец выражения", position)
+        raise ExpressionSyntaxError(
+            f"Неожиданный символ '{text}' в позиции {position + 1}", position
+        )
+
+    def _call(self, name: str, position: int) -> Node:
+        if name not in FUNCTIONS:
+            raise UnknownNameError(f"Неизвестная функция: {name}", position)
+        self._expect("(")
+        arguments = [self._expression(0)]
+        while self._peek()[1] == ",":
+            self._next()
+            arguments.append(self._expression(0))
+        self._expect(")")
+        arity = FUNCTIONS[name][1]
+        if arity is None and len(arguments) < 2:
+            raise ExpressionSyntaxError(
+                f"Функция {name} принимает не меньше 2 аргументов", position
+            )
+        if arity is not None and len(arguments) != arity:
+            raise ExpressionSyntaxError(
+                f"Функция {name} принимает аргументов: {arity}", position
+            )
+        return ("call", name, tuple(arguments))
+
+
+def parse(expression: str) -> Node:
+    """Parse an expression into its tuple tree (constants are substituted)."""
+    return _fold(_Parser(expression).parse())
+
+
+def _variables(tree: Node) -> FrozenSet[str]:
+    kind = tree[0]
+    if kind == "var":
+        return frozenset((tree[1],))
+    if kind == "neg":
+        return _variables(tree[1])
+    if kind == "bin":
+        return _variables(tree[2]) | _variables(tree[3])
+    if kind == "call":
+        return frozenset().union(*(_variables(argument) for argument in tree[2]))
+    return frozenset()
+
+
+def _apply(name: str, function: Callable[..., float], *arguments: float) -> float:
     try:
-        tokens = expression.split(" ")
-
-        if len(tokens) != 3:
-            raise ValueError("Неверное количество операндов")
-
-        num1 = float(tokens[0])
-        operator = tokens[1]
-        num2 = float(tokens[2])
-
-        if operator == "+":
-            return num1 + num2
-        elif operator == "-":
-            return num1 - num2
-        elif operator == "*":
-            return num1 * num2
-        elif operator == "/":
-            if num2 == 0:
-                raise ZeroDivisionError("Деление на 0 недопустимо")
-            return num1 / num2
-        else:
-            raise ValueError("Не валидный оператор. Доступные операторы: +, -, *, /")
-
-    except ValueError as ve:
-        print(f"Error: {ve}")
-    except ZeroDivisionError as zde:
-        print(f"Error: {zde}")
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        return function(*arguments)
+    except ZeroDivisionError:
+        raise DivisionByZeroError("Деление на 0 недопустимо") from None
+    except (ValueError, OverflowError, TypeError) as error:
+        raise EvaluationError(f"Ошибка вычисления {name}: {error}") from None
+
+
+def _divide(left: float, right: float) -> float:
+    if right == 0:
+        raise DivisionByZeroError("Деление на 0 недопустимо")
+    return left / right
+
+
+def _power(base: float, exponent: float) -> float:
+    # A negative base with a fractional exponent gives a complex number,
+    # which must not flow into abs() or other functions as a real value.
+    result = _apply("степени", operator.pow, base, exponent)
+    if isinstance(result, complex):
+        raise EvaluationError(
+            "Ошибка вычисления степени: результат не является действительным числом"
+        )
+    return result
+
+
+def _fold(tree: Node) -> Node:
+    """Substitute constants and pre-compute subtrees without variables.
+
+    Subtrees whose evaluation fails are kept, so errors still surface
+    when the expression is evaluated.
+    """
+    kind = tree[0]
+    if kind == "var" and tree[1] in CONSTANTS:
+        return ("num", CONSTANTS[tree[1]])
+    if kind == "neg":
+        tree = ("neg", _fold(tree[1]))
+    elif kind == "bin":
+        tree = ("bin", tree[1], _fold(tree[2]), _fold(tree[3]))
+    elif kind == "call":
+        tree = ("call", tree[1], tuple(_fold(argument) for argument in tree[2]))
+    else:
+        return tree
+    if _variables(tree):
+        return tree
+    try:
+        return ("num", _build(tree)({}))
+    except CalculatorError:
+        return tree
+
+
+def _build(tree: Node) -> Compiled:
+    """Turn an expression tree into nested closures over a variables mapping."""
+    kind = tree[0]
+    if kind == "num":
+        value = tree[1]
+        return lambda variables: value
+    if kind == "var":
+        name = tree[1]
+        return lambda variables: variables[name]
+    if kind == "neg":
+        operand = _build(tree[1])
+        return lambda variables: -operand(variables)
+    if kind == "bin":
+        symbol, left, right = tree[1], _build(tree[2]), _build(tree[3])
+        if symbol == "/":
+            return lambda variables: _divide(left(variables), right(variables))
+        if symbol == "^":
+            return lambda variables: _power(left(variables), right(variables))
+        function = _BINARY[symbol]
+        return lambda variables: function(left(variables), right(variables))
+    name, arguments = tree[1], [_build(argument) for argument in tree[2]]
+    function = FUNCTIONS[name][0]
+    return lambda variables: _apply(
+        name, function, *[argument(variables) for argument in arguments]
+    )
+
+
+# Element-wise counterparts of FUNCTIONS, looked up on the numpy module
+_NUMPY_FUNCTIONS = {
+    "abs": "abs",
+    "round": "round",
+    "sqrt": "sqrt",
+    "exp": "exp",
+    "log": "log",
+    "sin": "sin",
+    "cos": "cos",
+    "tan": "tan",
+    "pow": "power",
+    "min": "minimum",
+    "max": "maximum",
+}
+_NUMPY_BINARY = {
+    "+": "add",
+    "-": "subtract",
+    "*": "multiply",
+    "/": "divide",
+    "^": "power",
+}
+# Vectorized closures take the column mapping and a list that collects
+# the masks of elements divided by zero.
+Vectorized = Callable[[Mapping[str, Any], List[Any]], Any]
+
+
+def _build_vectorized(tree: Node, np: Any) -> Vectorized:
+    """Turn an expression tree into closures over whole NumPy arrays."""
+    kind = tree[0]
+    if kind == "num":
+        value = tree[1]
+        return lambda columns, zero_masks: value
+    if kind == "var":
+        name = tree[1]
+        return lambda columns, zero_masks: columns[name]
+    if kind == "neg":
+        operand = _build_vectorized(tree[1], np)
+        return lambda columns, zero_masks: np.negative(operand(columns, zero_masks))
+    if kind == "bin":
+        symbol = tree[1]
+        left = _build_vectorized(tree[2], np)
+        right = _build_vectorized(tree[3], np)
+        function = getattr(np, _NUMPY_BINARY[symbol])
+        if symbol != "/":
+            return lambda columns, zero_masks: function(
+                left(columns, zero_masks), right(columns, zero_masks)
+            )
+
+        def divide(columns: Mapping[str, Any], zero_masks: List[Any]) -> Any:
+            divisor = right(columns, zero_masks)
+            zero_masks.append(np.equal(divisor, 0))
+            return function(left(columns, zero_masks), divisor)
+
+        return divide
+    function = getattr(np, _NUMPY_FUNCTIONS[tree[1]])
+    arguments = [_build_vectorized(argument, np) for argument in tree[2]]
+    if len(arguments) == 1:
+        argument = arguments[0]
+        return lambda columns, zero_masks: function(argument(columns, zero_masks))
+
+    def reduce(columns: Mapping[str, Any], zero_masks: List[Any]) -> Any:
+        result = arguments[0](columns, zero_masks)
+        for argument in arguments[1:]:
+            result = function(result, argument(columns, zero_masks))
+        return result
+
+    return reduce
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Для пакетных вычислений требуется пакет numpy") from None
+    return numpy
+
+
+_TOO_DEEP = "Слишком глубокая вложенность выражения"
+
+
+class CompiledExpression:
+    """An expression parsed and compiled once, evaluated many times."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        # Parsing, folding and compiling recurse once per nesting level,
+        # so deeply nested input is reported as a syntax error.
+        try:
+            self.tree = parse(source)
+            self.variables = _variables(self.tree)
+            self._evaluate = _build(self.tree)
+        except RecursionError:
+            raise ExpressionSyntaxError(_TOO_DEEP) from None
+        self._vectorized: Optional[Vectorized] = None
+
+    def evaluate_batch(self, columns: Mapping[str, Any]) -> Any:
+        """Evaluate element-wise over columns in one vectorized pass.
+
+        Columns are NumPy arrays, array.array objects (used without
+        copying), sequences or scalars, broadcast against each other.
+        Returns a numpy masked array: elements divided by zero and
+        non-finite results (NaN, infinities such as log(0)) are masked
+        instead of raising.
+        """
+        np = _numpy()
+        missing = [name for name in self.variables if name not in columns]
+        if missing:
+            raise UnknownNameError(
+                f"Неизвестная переменная: {', '.join(sorted(missing))}"
+            )
+        if self._vectorized is None:
+            self._vectorized = _build_vectorized(self.tree, np)
+        arrays = {
+            name: np.asarray(columns[name], dtype=np.float64)
+            for name in self.variables
+        }
+        zero_masks: List[Any] = []
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            try:
+                result = np.asarray(
+                    self._vectorized(arrays, zero_masks), dtype=np.float64
+                )
+            except ValueError as error:
+                raise EvaluationError(f"Ошибка пакетного вычисления: {error}") from None
+            except RecursionError:
+                raise EvaluationError(_TOO_DEEP) from None
+        mask = ~np.isfinite(result)
+        for zero_mask in zero_masks:
+            mask |= zero_mask
+        return np.ma.masked_array(result, mask=mask)
+
+    def evaluate(self, variables: Optional[Mapping[str, float]] = None) -> float:
+        variables = variables or {}
+        missing = [name for name in self.variables if name not in variables]
+        if missing:
+            raise UnknownNameError(
+                f"Неизвестная переменная: {', '.join(sorted(missing))}"
+            )
+        try:
+            return self._evaluate(variables)
+        except RecursionError:
+            raise EvaluationError(_TOO_DEEP) from None
+
+    def __call__(self, **variables: float) -> float:
+        return self.evaluate(variables)
+
+    def __repr__(self) -> str:
+        return f"CompiledExpression({self.source!r})"
+
+
+@lru_cache(maxsize=COMPILE_CACHE_SIZE)
+def compile_expression(expression: str) -> CompiledExpression:
+    """Compile an expression; recent compiled forms are kept in an LRU cache."""
+    return CompiledExpression(expression)
+
+
+def calculate(
+    expression: str, variables: Optional[Mapping[str, float]] = None
+) -> float:
+    """Calculates the result of an arithmetic expression.
+
+    Supports + - * / ^, parentheses, unary minus, the functions in
+    FUNCTIONS, the constants pi and e and named variables. Raises
+    CalculatorError (or a subclass) on invalid input.
+    """
+    return compile_expression(expression).evaluate(variables)
+
+
+def calculate_batch(expression: Any, columns: Mapping[str, Any]) -> Any:
+    """Evaluate an expression (text or CompiledExpression) over column arrays.
+
+    See CompiledExpression.evaluate_batch; requires numpy.
+    """
+    if not isinstance(expression, CompiledExpression):
+        expression = compile_expression(expression)
+    return expression.evaluate_batch(columns)
@@ -0,0 +1,131 @@
+import lzma
+import struct
+import zlib
+from collections import Counter
+from typing import BinaryIO, Iterable, Optional
+
+METHOD_NONE = "none"
+METHOD_ZLIB = "zlib"
+METHOD_LZMA = "lzma"
+_METHOD_CODES = {METHOD_NONE: 0, METHOD_ZLIB: 1, METHOD_LZMA: 2}
+_METHODS = {code: method for method, code in _METHOD_CODES.items()}
+
+# код метода, уровень сжатия и длина словаря; уровень - знаковое 64-битное
+# число: в нем помещаются и -1 для zlib, и пресеты lzma с флагом
+# PRESET_EXTREME (бит 31)
+CODEC_HEADER = struct.Struct("<BqI")
+_NO_LEVEL = -1
+DEFAULT_DICTIONARY_SIZE = 32 * 1024
+
+
+class BlockCodec:
+    """Сжатие отдельных блоков (текстов) с общим словарем.
+
+    Каждый блок сжимается независимо, поэтому любой текст можно прочитать
+    без распаковки соседних. Словарь поддерживается только для zlib.
+    """
+
+    def __init__(
+        self,
+        method: str = METHOD_ZLIB,
+        level: Optional[int] = None,
+        dictionary: bytes = b"",
+    ) -> None:
+        if method not in _METHOD_CODES:
+            raise ValueError(f"Неизвестный метод сжатия: {method}")
+        if dictionary and method != METHOD_ZLIB:
+            raise ValueError("Словарь поддерживается только для zlib")
+        if level is not None and not _valid_level(method, level):
+            raise ValueError(f"Недопустимый уровень сжатия {method}: {level}")
+        self.method = method
+        self.level = level
+        self.dictionary = dictionary
+        self._lzma_filters = [
+            {
+                "id": lzma.FILTER_LZMA2,
+                "preset": lzma.PRESET_DEFAULT if level is None else level,
+            }
+        ]
+
+    def compress(self, data: bytes) -> bytes:
+        if self.method == METHOD_ZLIB:
+            level = zlib.Z_DEFAULT_COMPRESSION if self.level is None else self.level
+            if self.dictionary:
+                compressor = zlib.compressobj(level, zdict=self.dictionary)
+            else:
+                compressor = zlib.compressobj(level)
+            return compressor.compress(data) + compressor.flush()
+        if self.method == METHOD_LZMA:
+            return lzma.compress(
+                data, format=lzma.FORMAT_RAW, filters=self._lzma_filters
+            )
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        if self.method == METHOD_ZLIB:
+            if self.dictionary:
+                decompressor = zlib.decompressobj(zdict=self.dictionary)
+            else:
+                decompressor = zlib.decompressobj()
+            return decompressor.decompress(data) + decompressor.flush()
+        if self.method == METHOD_LZMA:
+            return lzma.decompress(
+                data, format=lzma.FORMAT_RAW, filters=self._lzma_filters
+            )
+        return data
+
+    def header(self) -> bytes:
+        """Описание кодека для записи в начало файла."""
+        level = _NO_LEVEL if self.level is None else self.level
+        return (
+            CODEC_HEADER.pack(
+                _METHOD_CODES[self.method], level, len(self.dictionary)
+            )
+            + self.dictionary
+        )
+
+    @classmethod
+    def read_header(cls, file: BinaryIO) -> "BlockCodec":
+        """Чтение кодека, записанного методом header."""
+        code, level, dictionary_size = CODEC_HEADER.unpack(
+            file.read(CODEC_HEADER.size)
+        )
+        if code not in _METHODS:
+            raise ValueError(f"Неизвестный код метода сжатия: {code}")
+        return cls(
+            _METHODS[code],
+            None if level == _NO_LEVEL else level,
+            file.read(dictionary_size),
+        )
+
+
+def _valid_level(method: str, level: int) -> bool:
+    if method == METHOD_ZLIB:
+        return -1 <= level <= 9
+    if method == METHOD_LZMA:
+        return 0 <= level & ~lzma.PRESET_EXTREME <= 9
+    return False
+
+
+def train_dictionary(
+    samples: Iterable[str], size: int = DEFAULT_DICTIONARY_SIZE
+) -> bytes:
+    """Общий словарь zlib из часто встречающихся в текстах слов.
+
+    zlib лучше всего находит совпадения в конце словаря, поэтому самые
+    частые слова ставятся последними.
+    """
+    counts: Counter = Counter()
+    for sample in samples:
+        counts.update(word for word in sample.split() if len(word) > 2)
+    chunks = []
+    total = 0
+    for word, count in counts.most_common():
+        if count < 2:
+            break
+        chunk = (word + " ").encode("utf-8")
+        if total + len(chunk) > size:
+            break
+        chunks.append(chunk)
+        total += len(chunk)
+    return b"".join(reversed(chunks))
@@ -1,15 +1,42 @@
 import json
 import csv
+import heapq
+import re
+import time
 import uuid
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+
+from indexes import (
+    CHANGE_ADD,
+    CHANGE_DELETE,
+    CHANGE_REPLACE,
+    MERGE_OVERWRITE,
+    ChangeEmitter,
+    HashIndex,
+    IndexedCollection,
+    NgramIndex,
+    PrefixTrie,
+    parse_id,
+    should_replace,
+)
+
+_NON_DIGITS = re.compile(r"[^0-9]")
 
 
 class Contact:
-    def __init__(self, name: str, phone: str, email: str) -> None:
-        self.id = uuid.uuid4()
+    def __init__(
+        self,
+        name: str,
+        phone: str,
+        email: str,
+        id: Optional[uuid.UUID] = None,
+        updated_at: Optional[float] = None,
+    ) -> None:
+        self.id = id or uuid.uuid4()
         self.name = name
         self.phone = phone
         self.email = email
+        self.updated_at = time.time() if updated_at is None else updated_at
 
     def to_dict(self) -> dict:
         return {
@@ -17,29 +44,292 @@ class Contact:
             "name": self.name,
             "phone": self.phone,
             "email": self.email,
+            "updated_at": self.updated_at,
         }
 
-
-class ContactService:
-    def __init__(self) -> None:
-        self.contacts: List[Contact] = []
+    @classmethod
+    def from_dict(cls, data: dict) -> "Contact":
+        """Создание контакта из словаря с сохранением id, если он есть."""
+        return cls(
+            name=data["name"],
+            phone=data["phone"],
+            email=data["email"],
+            id=parse_id(data.get("id")),
+            updated_at=data.get("updated_at"),
+        )
+
+    def same_data(self, other: "Contact") -> bool:
+        """Совпадают ли данные контактов (без id и времени изменения)."""
+        return (
+            self.name == other.name
+            and self.phone == other.phone
+            and self.email == other.email
+        )
+
+
+class PhoneNormalizer:
+    """Приведение номера телефона к цифрам в международном формате.
+
+    Номер из national_length цифр дополняется кодом страны, а ведущий
+    префикс выхода на междугороднюю связь (trunk_prefix) заменяется им:
+    "+7 (999) 123-45-67", "8 999 123 45 67" и "9991234567" дают "79991234567".
+    """
+
+    def __init__(
+        self,
+        country_code: str = "7",
+        trunk_prefix: str = "8",
+        national_length: int = 10,
+    ) -> None:
+        self.country_code = country_code
+        self.trunk_prefix = trunk_prefix
+        self.national_length = national_length
+
+    def _apply_prefix_rule(self, phone: str, digits: str) -> str:
+        if phone.lstrip().startswith("+"):
+            return digits
+        if self.trunk_prefix and digits.startswith(self.trunk_prefix):
+            return self.country_code + digits[len(self.trunk_prefix) :]
+        return digits
+
+    def normalize(self, phone: str) -> str:
+        """Номер телефона только из цифр, с кодом страны."""
+        digits = _NON_DIGITS.sub("", phone)
+        if len(digits) == self.national_length:
+            return self.country_code + digits
+        if len(digits) == self.national_length + len(self.trunk_prefix):
+            return self._apply_prefix_rule(phone, digits)
+        return digits
+
+    def normalize_prefix(self, prefix: str) -> str:
+        """Начало номера в том же виде, что и normalize."""
+        return self._apply_prefix_rule(prefix, _NON_DIGITS.sub("", prefix))
+
+
+def _contact_from_row(row: List[str]) -> Contact:
+    """Создание контакта из строки CSV (Id, Name, Phone, Email)."""
+    id_str, name, phone, email = row[:4]
+    return Contact(name=name, phone=phone, email=email, id=parse_id(id_str))
+
+
+class ContactService(ChangeEmitter):
+    # До стольких слов-совпадений нечеткий поиск проверяет их по индексу
+    _MEMBERSHIP_WORDS = 4
+
+    def __init__(self, phone_normalizer: Optional[PhoneNormalizer] = None) -> None:
+        super().__init__()
+        self.contacts = IndexedCollection()
+        self.phone_normalizer = phone_normalizer or PhoneNormalizer()
+        self._phone_trie = PrefixTrie()
+        self._search_order: Dict[uuid.UUID, int] = {}
+        self._search_counter = 0
+        self._name_index = NgramIndex(3)
+        self._phone_index = NgramIndex(3)
+        # Различные слова имен в префиксном дереве, контакты каждого слова
+        # в порядке добавления: слово "анна" хранится в дереве один раз
+        self._fuzzy_words = PrefixTrie()
+        self._word_contacts = HashIndex(self._search_order)
+        # Поисковые индексы не построены после пакетной загрузки
+        # в пустую книгу (upsert_contacts); их строит _ensure_indexes
+        self._deferred_index = False
+
+    @staticmethod
+    def _fuzzy_keys(name: str) -> Set[str]:
+        """Различные слова имени для нечеткого поиска."""
+        return set(name.lower().split())
+
+    def _index_contact(self, contact: Contact) -> None:
+        """Добавление контакта в поисковые индексы."""
+        self._name_index.add(contact.id, contact.name.lower())
+        self._phone_index.add(contact.id, contact.phone)
+        self._phone_trie.add(self.phone_normalizer.normalize(contact.phone), contact.id)
+        for word in self._fuzzy_keys(contact.name):
+            if not self._word_contacts.count(word):
+                self._fuzzy_words.add(word, word)
+            self._word_contacts.insert(word, contact.id, contact.id)
+
+    def _ensure_indexes(self) -> None:
+        """Построение индексов, отложенных пакетной загрузкой."""
+        if not self._deferred_index:
+            return
+        self._deferred_index = False
+        for contact in self.contacts:
+            self._index_contact(contact)
+
+    def _unindex_contact(self, contact: Contact) -> None:
+        """Удаление контакта из поисковых индексов."""
+        self._name_index.discard(contact.id, contact.name.lower())
+        self._phone_index.discard(contact.id, contact.phone)
+        self._phone_trie.discard(
+            self.phone_normalizer.normalize(contact.phone), contact.id
+        )
+        for word in self._fuzzy_keys(contact.name):
+            self._word_contacts.discard(word, contact.id)
+            if not self._word_contacts.count(word):
+                self._fuzzy_words.discard(word, word)
 
     def add_contact(self, contact: Contact) -> None:
         """Добавление нового контакта."""
-        self.contacts.append(contact)
+        self._ensure_indexes()
+        self.contacts.add(contact)
+        self._search_order[contact.id] = self._search_counter
+        self._search_counter += 1
+        self._index_contact(contact)
+        self._emit(CHANGE_ADD, contact)
 
     def get_all_contacts(self) -> List[Contact]:
         """Получение всех контактов."""
-        return self.contacts
+        return list(self.contacts)
 
     def find_contact(self, search_term: str) -> List[Contact]:
         """Поиск контакта по имени или номеру телефона."""
+        self._ensure_indexes()
+        term_lower = search_term.lower()
+        name_candidates = self._name_index.candidates(term_lower)
+        phone_candidates = self._phone_index.candidates(search_term)
+        if name_candidates is None or phone_candidates is None:
+            return [
+                contact
+                for contact in self.contacts
+                if term_lower in contact.name.lower() or search_term in contact.phone
+            ]
+
         return [
             contact
-            for contact in self.contacts
-            if search_term.lower() in contact.name.lower()
-            or search_term in contact.phone
+            for contact in self._contacts_in_order(name_candidates | phone_candidates)
+            if term_lower in contact.name.lower() or search_term in contact.phone
+        ]
+
+    def _contacts_in_order(self, contact_ids) -> List[Contact]:
+        return sorted(
+            (self.contacts.get(contact_id) for contact_id in contact_ids),
+            key=lambda contact: self._search_order[contact.id],
+        )
+
+    def find_contact_fuzzy(
+        self, search_term: str, max_distance: int = 2, limit: int = 10
+    ) -> List[Contact]:
+        """Нечеткий поиск по имени с опечатками.
+
+        Каждое слово запроса сравнивается с ближайшим словом имени; контакт
+        подходит, если сумма правок по всем словам запроса не больше
+        max_distance. Возвращает не больше limit контактов, от ближайших
+        к дальним, при равенстве в порядке добавления.
+        """
+        self._ensure_indexes()
+        terms = self._fuzzy_keys(search_term)
+        if not terms:
+            return []
+        matches = [
+            dict(
+                (word, distance)
+                for distance, word in self._fuzzy_words.fuzzy(term, max_distance)
+            )
+            for term in terms
         ]
+        if len(matches) == 1:
+            return self._nearest_contacts(matches[0], limit)
+
+        # Кандидаты - контакты самого редкого слова запроса. Слово имени
+        # на расстоянии d от него оставляет остальным словам запроса лишь
+        # max_distance - d правок, поэтому дальние слова проверяются только
+        # против точных совпадений остальных слов
+        anchor = min(
+            matches,
+            key=lambda words: sum(map(self._word_contacts.count, words)),
+        )
+        others = [words for words in matches if words is not anchor]
+        best: Dict[uuid.UUID, int] = {}
+        for anchor_word, anchor_distance in anchor.items():
+            budget = max_distance - anchor_distance
+            allowed = [
+                {word: gap for word, gap in words.items() if gap <= budget}
+                for words in others
+            ]
+            if not all(allowed):
+                continue
+            for contact_id in self._word_contacts.iter(anchor_word):
+                total = anchor_distance + self._extra_distance(
+                    contact_id, allowed, budget
+                )
+                if total <= max_distance and total < best.get(contact_id, total + 1):
+                    best[contact_id] = total
+        ranked = heapq.nsmallest(
+            limit,
+            best,
+            key=lambda contact_id: (best[contact_id], self._search_order[contact_id]),
+        )
+        return [self.contacts.get(contact_id) for contact_id in ranked]
+
+    def _extra_distance(
+        self, contact_id: uuid.UUID, allowed: List[Dict[str, int]], budget: int
+    ) -> int:
+        """Сумма правок остальных слов запроса; больше budget - не подходит."""
+        name_words = None
+        total = 0
+        for words in allowed:
+            if len(words) <= self._MEMBERSHIP_WORDS:
+                # Несколько слов дешевле проверить по индексу, чем разбирать имя
+                distance = min(
+                    (
+                        distance
+                        for word, distance in words.items()
+                        if self._word_contacts.contains(word, contact_id)
+                    ),
+                    default=budget + 1,
+                )
+            else:
+                if name_words is None:
+                    name = self.contacts.get(contact_id).name
+                    name_words = self._fuzzy_keys(name)
+                distance = min(
+                    (words[word] for word in name_words if word in words),
+                    default=budget + 1,
+                )
+            total += distance
+            if total > budget:
+                break
+        return total
+
+    def _nearest_contacts(self, words: Dict[str, int], limit: int) -> List[Contact]:
+        """Контакты найденных слов: по расстоянию, затем в порядке добавления."""
+        result: List[Contact] = []
+        seen: Set[uuid.UUID] = set()
+        for distance in sorted(set(words.values())):
+            merged = heapq.merge(
+                *(
+                    self._word_contacts.iter(word)
+                    for word, word_distance in words.items()
+                    if word_distance == distance
+                ),
+                key=self._search_order.__getitem__,
+            )
+            for contact_id in merged:
+                if contact_id in seen:
+                    continue
+                seen.add(contact_id)
+                result.append(self.contacts.get(contact_id))
+                if len(result) >= limit:
+                    return result
+        return result
+
+    def find_by_phone(self, phone: str) -> List[Contact]:
+        """Поиск контактов по номеру телефона в любом формате."""
+        self._ensure_indexes()
+        number = self.phone_normalizer.normalize(phone)
+        if not number:
+            return []
+        return self._contacts_in_order(self._phone_trie.exact(number))
+
+    def find_by_phone_prefix(
+        self, prefix: str, limit: Optional[int] = None
+    ) -> List[Contact]:
+        """Поиск контактов, номер которых начинается с prefix."""
+        self._ensure_indexes()
+        number = self.phone_normalizer.normalize_prefix(prefix)
+        if not number:
+            return []
+        return self._contacts_in_order(self._phone_trie.prefix(number, limit))
 
     def edit_contact(
         self,
@@ -49,24 +339,94 @@ class ContactService:
         email: Optional[str] = None,
     ) -> bool:
         """Редактирование контакта."""
-        for contact in self.contacts:
-            if str(contact.id) == contact_id:
-                if name is not None:
-                    contact.name = name
-                if phone is not None:
-                    contact.phone = phone
-                if email is not None:
-                    contact.email = email
-                return True
-        return False
+        self._ensure_indexes()
+        contact = self.contacts.get(parse_id(contact_id))
+        if contact is None:
+            return False
+        self._unindex_contact(contact)
+        if name is not None:
+            contact.name = name
+        if phone is not None:
+            contact.phone = phone
+        if email is not None:
+            contact.email = email
+        contact.updated_at = time.time()
+        self._index_contact(contact)
+        self._emit(CHANGE_REPLACE, contact)
+        return True
+
+    def upsert_contact(self, contact: Contact, policy: str = MERGE_OVERWRITE) -> bool:
+        """Добавление контакта или обновление контакта с тем же ID.
+
+        Возвращает True, если контакт добавлен или изменен.
+        """
+        self._ensure_indexes()
+        existing = self.contacts.get(contact.id)
+        if existing is None:
+            self.add_contact(contact)
+            return True
+        if not should_replace(existing, contact, policy):
+            return False
+        self._unindex_contact(existing)
+        existing.name = contact.name
+        existing.phone = contact.phone
+        existing.email = contact.email
+        existing.updated_at = contact.updated_at
+        self._index_contact(existing)
+        self._emit(CHANGE_REPLACE, existing)
+        return True
+
+    def upsert_contacts(
+        self, contacts: Iterable[Contact], policy: str = MERGE_OVERWRITE
+    ) -> int:
+        """Пакетный upsert_contact для загрузки больших книг.
+
+        В пустую книгу контакты только складываются, а поисковые индексы
+        строятся одним проходом при первом поиске или изменении. Иначе
+        контакты сливаются по одному. Возвращает число добавленных или
+        измененных контактов.
+        """
+        if self.contacts:
+            return sum(self.upsert_contact(contact, policy) for contact in contacts)
+        changed = 0
+        for contact in contacts:
+            existing = self.contacts.get(contact.id)
+            if existing is None:
+                self.contacts.add(contact)
+                self._search_order[contact.id] = self._search_counter
+                self._search_counter += 1
+                op = CHANGE_ADD
+            elif should_replace(existing, contact, policy):
+                self.contacts.replace(contact.id, contact)
+                op = CHANGE_REPLACE
+            else:
+                continue
+            self._deferred_index = True
+            self._emit(op, contact)
+            changed += 1
+        return changed
 
     def delete_contact(self, contact_id: str) -> bool:
         """Удаление контакта по ID."""
-        for i, contact in enumerate(self.contacts):
-            if str(contact.id) == contact_id:
-                self.contacts.pop(i)
-                return True
-        return False
+        self._ensure_indexes()
+        contact = self.contacts.remove(parse_id(contact_id))
+        if contact is None:
+            return False
+        self._unindex_contact(contact)
+        del self._search_order[contact.id]
+        self._emit(CHANGE_DELETE, contact)
+        return True
+
+    def iter_items(self) -> Iterator[Contact]:
+        """Обход всех контактов (для снимков журнала)."""
+        return iter(self.contacts)
+
+    def apply_change(self, op: str, data: dict) -> None:
+        """Применение изменения из журнала: добавление или удаление по ID."""
+        if op == CHANGE_DELETE:
+            self.delete_contact(data["id"])
+        else:
+            self.upsert_contact(Contact.from_dict(data))
 
     def export_to_csv(self, filename: str) -> None:
         """Экспорт контактов в CSV файл."""
@@ -78,17 +438,14 @@ class ContactService:
                     [str(contact.id), contact.name, contact.phone, contact.email]
                 )
 
-    def import_from_csv(self, filename: str) -> None:
-        """Импорт контактов из CSV файла."""
+    def import_from_csv(self, filename: str, policy: str = MERGE_OVERWRITE) -> None:
+        """Импорт контактов из CSV файла с обновлением контактов по ID."""
         with open(filename, mode="r", newline="", encoding="utf-8") as file:
             reader = csv.reader(file)
             next(reader)
-            for row in reader:
-                if len(row) < 4:
-                    continue
-                id_str, name, phone, email = row
-                contact = Contact(name=name, phone=phone, email=email)
-                self.add_contact(contact)
+            self.upsert_contacts(
+                (_contact_from_row(row) for row in reader if len(row) >= 4), policy
+            )
 
     def save_to_json(self, filename: str = "contacts.json") -> None:
         """Сохранение контактов в JSON файл."""
@@ -100,16 +457,16 @@ class ContactService:
                 indent=4,
             )
 
-    def load_from_json(self, filename: str = "contacts.json") -> None:
-        """Загрузка контактов из JSON файла."""
+    def load_from_json(
+        self, filename: str = "contacts.json", policy: str = MERGE_OVERWRITE
+    ) -> None:
+        """Загрузка контактов из JSON файла с обновлением контактов по ID."""
         try:
             with open(filename, mode="r", encoding="utf-8") as file:
                 contacts_data = json.load(file)
-                for data in contacts_data:
-                    contact = Contact(
-                        name=data["name"], phone=data["phone"], email=data["email"]
-                    )
-                    self.add_contact(contact)
+                self.upsert_contacts(
+                    (Contact.from_dict(data) for data in contacts_data), policy
+                )
         except FileNotFoundError:
             pass
 
@@ -0,0 +1,91 @@
+import csv
+import time
+from typing import Any, Callable, List, Optional
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+class ImportReport:
+    """Итоги импорта CSV файла."""
+
+    def __init__(self) -> None:
+        self.imported = 0
+        self.rejected = 0
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.imported / self.elapsed if self.elapsed > 0 else 0.0
+
+
+def stream_csv_import(
+    filename: str,
+    min_columns: int,
+    convert: Callable[[List[str]], Any],
+    apply_batch: Callable[[List[Any]], None],
+    rollback: Callable[[], None],
+    reject_filename: Optional[str] = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    progress: Optional[Callable[[ImportReport], None]] = None,
+) -> ImportReport:
+    """Потоковый импорт CSV файла пачками по batch_size строк.
+
+    convert превращает строку файла в объект или бросает ValueError.
+    Если задан reject_filename, некорректные строки записываются туда
+    с номером строки и причиной, иначе первая же ошибка прерывает импорт.
+    При любом прерывании вызывается rollback, отменяющий уже примененные
+    пачки, так что импортируются либо все строки, либо ни одной.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    reject_file = None
+    try:
+        with open(filename, mode="r", newline="", encoding="utf-8") as file:
+            reader = csv.reader(file)
+            next(reader, None)  # Пропустить заголовок
+            if reject_filename is not None:
+                reject_file = open(
+                    reject_filename, mode="w", newline="", encoding="utf-8"
+                )
+                reject_writer = csv.writer(reject_file)
+                reject_writer.writerow(["Line", "Error", "Row"])
+
+            batch: List[Any] = []
+            next_line = reader.line_num + 1
+            for row in reader:
+                line, next_line = next_line, reader.line_num + 1
+                if not row:
+                    continue
+                try:
+                    if len(row) < min_columns:
+                        if reject_file is None:
+                            continue  # Короткие строки пропускаются, как и раньше
+                        raise ValueError("недостаточно столбцов")
+                    batch.append(convert(row))
+                except ValueError as error:
+                    if reject_file is None:
+                        raise ValueError(f"Строка {line}: {error}") from error
+                    reject_writer.writerow([line, str(error), *row])
+                    report.rejected += 1
+
+                if len(batch) >= batch_size:
+                    apply_batch(batch)
+                    report.imported += len(batch)
+                    batch = []
+                    report.elapsed = time.perf_counter() - started
+                    if progress is not None:
+                        progress(report)
+
+            apply_batch(batch)
+            report.imported += len(batch)
+    except BaseException:
+        rollback()
+        raise
+    finally:
+        if reject_file is not None:
+            reject_file.close()
+
+    report.elapsed = time.perf_counter() - started
+    if progress is not None:
+        progress(report)
+    return report
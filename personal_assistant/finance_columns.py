@@ -0,0 +1,119 @@
+from typing import Any, Dict, List
+
+try:
+    import numpy as np
+except ImportError:  # numpy нужен только для колоночного режима
+    np = None
+
+# Порядковый номер дня 01-01-1970, начала отсчета datetime64
+_EPOCH_ORDINAL = 719163
+_INITIAL_CAPACITY = 1024
+
+
+class FinanceColumns:
+    """Колоночное хранилище финансовых записей на массивах NumPy.
+
+    Суммы хранятся в float64, даты — порядковыми номерами дней в int32
+    (0 означает некорректную дату), категории — кодами словаря в int32.
+    Строки не упорядочены: при удалении на место строки переносится последняя.
+    """
+
+    def __init__(self) -> None:
+        if np is None:
+            raise ImportError("Для колоночного режима требуется пакет numpy")
+        self._size = 0
+        self._amounts = np.zeros(_INITIAL_CAPACITY, dtype=np.float64)
+        self._dates = np.zeros(_INITIAL_CAPACITY, dtype=np.int32)
+        self._categories = np.zeros(_INITIAL_CAPACITY, dtype=np.int32)
+        self._records: List[Any] = []
+        self._rows: Dict[Any, int] = {}
+        self._category_codes: Dict[str, int] = {}
+        self._category_names: List[str] = []
+
+    def __len__(self) -> int:
+        return self._size
+
+    def _grow(self) -> None:
+        capacity = len(self._amounts) * 2
+        self._amounts = np.resize(self._amounts, capacity)
+        self._dates = np.resize(self._dates, capacity)
+        self._categories = np.resize(self._categories, capacity)
+
+    def _category_code(self, category: str) -> int:
+        code = self._category_codes.get(category)
+        if code is None:
+            code = len(self._category_names)
+            self._category_codes[category] = code
+            self._category_names.append(category)
+        return code
+
+    def add(self, record: Any, ordinal: int, category: str) -> None:
+        """Добавление строки для записи."""
+        if self._size == len(self._amounts):
+            self._grow()
+        row = self._size
+        self._amounts[row] = record.amount
+        self._dates[row] = ordinal
+        self._categories[row] = self._category_code(category)
+        self._records.append(record)
+        self._rows[record.id] = row
+        self._size += 1
+
+    def remove(self, record: Any) -> None:
+        """Удаление строки записи с переносом последней строки на ее место."""
+        row = self._rows.pop(record.id, None)
+        if row is None:
+            return
+        last = self._size - 1
+        if row != last:
+            moved = self._records[last]
+            self._amounts[row] = self._amounts[last]
+            self._dates[row] = self._dates[last]
+            self._categories[row] = self._categories[last]
+            self._records[row] = moved
+            self._rows[moved.id] = row
+        self._records.pop()
+        self._size = last
+
+    def sum_by_category(self) -> Dict[str, float]:
+        """Сумма по каждой категории."""
+        size = self._size
+        codes = self._categories[:size]
+        minlength = len(self._category_names)
+        sums = np.bincount(codes, weights=self._amounts[:size], minlength=minlength)
+        counts = np.bincount(codes, minlength=minlength)
+        return {
+            self._category_names[code]: float(sums[code])
+            for code in np.flatnonzero(counts)
+        }
+
+    def sum_by_month(self) -> Dict[str, float]:
+        """Сумма по каждому месяцу, ключ — строка ММ-ГГГГ."""
+        size = self._size
+        dates = self._dates[:size]
+        valid = dates > 0
+        days = (dates[valid].astype(np.int64) - _EPOCH_ORDINAL).astype("datetime64[D]")
+        months, inverse = np.unique(days.astype("datetime64[M]"), return_inverse=True)
+        sums = np.bincount(inverse, weights=self._amounts[:size][valid])
+        return {
+            month.item().strftime("%m-%Y"): float(total)
+            for month, total in zip(months, sums)
+        }
+
+    def balance_between(self, start_ordinal: int, end_ordinal: int) -> float:
+        """Баланс записей с датами в диапазоне [start_ordinal, end_ordinal]."""
+        size = self._size
+        dates = self._dates[:size]
+        mask = (dates >= start_ordinal) & (dates <= end_ordinal)
+        return float(self._amounts[:size][mask].sum())
+
+    def top_expenses(self, n: int) -> List[Any]:
+        """n самых крупных расходов (отрицательных сумм), от большего к меньшему."""
+        size = self._size
+        if n <= 0 or size == 0:
+            return []
+        amounts = self._amounts[:size]
+        n = min(n, size)
+        rows = np.argpartition(amounts, n - 1)[:n]
+        rows = rows[np.argsort(amounts[rows], kind="stable")]
+        return [self._records[row] for row in rows if amounts[row] < 0]
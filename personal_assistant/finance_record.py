@@ -1,19 +1,59 @@
 import json
 import csv
+import math
+import os
+import time
 import uuid
-from typing import List, Optional
-from datetime import datetime
+from datetime import date as date_type
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from calculator import CalculatorError, CompiledExpression, compile_expression
+from csv_import import DEFAULT_BATCH_SIZE, ImportReport, stream_csv_import
+from indexes import (
+    CHANGE_ADD,
+    CHANGE_DELETE,
+    CHANGE_REPLACE,
+    MERGE_OVERWRITE,
+    ChangeEmitter,
+    HashIndex,
+    IndexedCollection,
+    SortedIndex,
+    date_key,
+    parse_id,
+    should_replace,
+)
+
+if TYPE_CHECKING:
+    from finance_columns import FinanceColumns
 
 
 class FinanceRecord:
     def __init__(
-        self, amount: float, category: str, date: str, description: str
+        self,
+        amount: float,
+        category: str,
+        date: str,
+        description: str,
+        id: Optional[uuid.UUID] = None,
+        updated_at: Optional[float] = None,
     ) -> None:
-        self.id = uuid.uuid4()
+        self.id = id or uuid.uuid4()
         self.amount = amount
         self.category = category
         self.date = date
         self.description = description
+        self.updated_at = time.time() if updated_at is None else updated_at
 
     def to_dict(self) -> dict:
         """Преобразование объекта FinanceRecord в словарь для сериализации."""
@@ -23,79 +63,717 @@ class FinanceRecord:
             "category": self.category,
             "date": self.date,
             "description": self.description,
+            "updated_at": self.updated_at,
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "FinanceRecord":
+        """Создание записи из словаря с сохранением id, если он есть."""
+        return cls(
+            amount=data["amount"],
+            category=data["category"],
+            date=data["date"],
+            description=data["description"],
+            id=parse_id(data.get("id")),
+            updated_at=data.get("updated_at"),
+        )
+
+    def same_data(self, other: "FinanceRecord") -> bool:
+        """Совпадают ли данные записей (без id и времени изменения)."""
+        return (
+            self.amount == other.amount
+            and self.category == other.category
+            and self.date == other.date
+            and self.description == other.description
+        )
+
+
+def _add_exact(partials: List[float], value: float) -> None:
+    """Точное прибавление value к сумме, заданной списком partials.
+
+    Сумма хранится как неперекрывающиеся слагаемые (алгоритм Шевчука,
+    как в math.fsum), поэтому после любых прибавлений и вычитаний
+    math.fsum(partials) — точная сумма, округленная один раз.
+    """
+    count = 0
+    for partial in partials:
+        if abs(value) < abs(partial):
+            value, partial = partial, value
+        high = value + partial
+        low = partial - (high - value)
+        if low:
+            partials[count] = low
+            count += 1
+        value = high
+    partials[count:] = [value]
+
+
+class FinanceTotals:
+    """Накопленные суммы доходов и расходов группы записей.
+
+    Суммы накапливаются без ошибок округления (_add_exact): после
+    сотен тысяч добавлений и удалений они совпадают с пересчетом
+    math.fsum по оставшимся записям.
+    """
 
-class FinanceService:
     def __init__(self) -> None:
-        self.records: List[FinanceRecord] = []
+        self._income: List[float] = []
+        self._expense: List[float] = []
+        self.count = 0
+
+    @property
+    def income(self) -> float:
+        return math.fsum(self._income)
+
+    @property
+    def expense(self) -> float:
+        return math.fsum(self._expense)
+
+    @property
+    def balance(self) -> float:
+        return math.fsum(self._income + [-partial for partial in self._expense])
+
+    def add(self, amount: float) -> None:
+        if amount >= 0:
+            _add_exact(self._income, amount)
+        else:
+            _add_exact(self._expense, -amount)
+        self.count += 1
+
+    def remove(self, amount: float) -> None:
+        if amount >= 0:
+            _add_exact(self._income, -amount)
+        else:
+            _add_exact(self._expense, amount)
+        self.count -= 1
+
+    def matches(self, other: "FinanceTotals") -> bool:
+        """Совпадают ли итоги; суммы точные, поэтому сравниваются на равенство."""
+        return (
+            self.count == other.count
+            and self.income == other.income
+            and self.expense == other.expense
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "income": self.income,
+            "expense": self.expense,
+            "balance": self.balance,
+            "count": self.count,
+        }
+
+
+def _record_from_row(row: List[str]) -> FinanceRecord:
+    """Создание записи из строки CSV (Id, Amount, Category, Date, Description)."""
+    id_str, amount_str, category, date_str, description = row[:5]
+    try:
+        amount = float(amount_str)
+    except ValueError:
+        raise ValueError(f"некорректная сумма: {amount_str!r}") from None
+    date_str = date_str.strip()
+    if date_key(date_str) is None:
+        raise ValueError(f"некорректная дата: {date_str!r}")
+    return FinanceRecord(
+        amount=amount, category=category, date=date_str, description=description
+    )
+
+
+# Поля записи, доступные в формулах вычисляемых столбцов
+FORMULA_FIELDS = ("amount",)
+
+
+def category_key(category: str) -> str:
+    """Ключ категории без учета регистра."""
+    return category.casefold()
+
+
+@lru_cache(maxsize=4096)
+def month_key(ordinal: int) -> str:
+    """Ключ месяца ММ-ГГГГ для порядкового номера дня."""
+    day = date_type.fromordinal(ordinal)
+    return f"{day.month:02d}-{day.year}"
+
+
+class FinanceService(ChangeEmitter):
+    def __init__(self, columnar: bool = False) -> None:
+        super().__init__()
+        self.records = IndexedCollection()
+        # Порядковые номера записей: индексы выдают записи в порядке реестра
+        self._sequence: Dict[uuid.UUID, int] = {}
+        self._next_sequence = 0
+        self._date_index = SortedIndex(self._sequence)
+        self._category_index = HashIndex(self._sequence)
+        self._exact_date_index = HashIndex(self._sequence)
+        self._category_date_index = HashIndex(self._sequence)
+        self._filter_stats: Dict[str, int] = {}
+        # После пакетной загрузки индексы поиска и итоги строятся
+        # при первом обращении к ним
+        self._deferred_lookup = False
+        self._deferred_totals = False
+        self._columns: Optional["FinanceColumns"] = None
+        if columnar:
+            # numpy загружается только для колоночного режима
+            from finance_columns import FinanceColumns
+
+            self._columns = FinanceColumns()
+        self._totals = FinanceTotals()
+        self._category_totals: Dict[str, FinanceTotals] = {}
+        self._month_totals: Dict[str, FinanceTotals] = {}
+        # Вычисляемые столбцы: формулы в порядке определения, параметры
+        # формул и значения по id записи (None — ошибка вычисления)
+        self._formulas: Dict[str, CompiledExpression] = {}
+        self._formula_parameters: Dict[str, float] = {}
+        self._formula_values: Dict[
+            str, Dict[Optional[uuid.UUID], Optional[float]]
+        ] = {}
+        self._row_formulas: List[str] = []
+
+    @staticmethod
+    def _add_to_group(
+        groups: Dict[str, FinanceTotals], key: str, amount: float
+    ) -> None:
+        totals = groups.get(key)
+        if totals is None:
+            totals = groups[key] = FinanceTotals()
+        totals.add(amount)
+
+    @staticmethod
+    def _remove_from_group(
+        groups: Dict[str, FinanceTotals], key: str, amount: float
+    ) -> None:
+        totals = groups[key]
+        totals.remove(amount)
+        if totals.count == 0:
+            del groups[key]
+
+    def _index_record(self, record: FinanceRecord) -> None:
+        """Добавление записи во вспомогательные индексы."""
+        self._index_lookup(record)
+        self._add_aggregates(record)
+
+    def _unindex_record(self, record: FinanceRecord) -> None:
+        """Удаление записи из вспомогательных индексов."""
+        self._unindex_lookup(record)
+        self._remove_aggregates(record)
+
+    @staticmethod
+    def _lookup_key(record: FinanceRecord) -> Tuple[str, str]:
+        return category_key(record.category), record.date
+
+    def _index_lookup(
+        self, record: FinanceRecord, moved: bool = False, dated: bool = True
+    ) -> None:
+        """Добавление записи в индексы поиска по категории и дате.
+
+        Новая запись идет в конец; перенесенная (moved) — на место по
+        своему порядковому номеру. При dated=False индекс дат не трогается
+        (пакетная загрузка заполняет его одной сортировкой).
+        """
+        category = category_key(record.category)
+        for index, key in (
+            (self._category_index, category),
+            (self._exact_date_index, record.date),
+            (self._category_date_index, (category, record.date)),
+        ):
+            if moved:
+                index.insert(key, record.id, record)
+            else:
+                index.add(key, record.id, record)
+        ordinal = date_key(record.date)
+        if dated and ordinal is not None:
+            self._date_index.add(record.id, ordinal, record)
+
+    def _unindex_lookup(self, record: FinanceRecord) -> None:
+        category = category_key(record.category)
+        self._category_index.discard(category, record.id)
+        self._exact_date_index.discard(record.date, record.id)
+        self._category_date_index.discard((category, record.date), record.id)
+        self._date_index.discard(record.id)
+
+    def _add_aggregates(self, record: FinanceRecord) -> None:
+        """Учет записи в итогах, колонках и вычисляемых столбцах."""
+        ordinal = date_key(record.date)
+        if ordinal is not None:
+            self._add_to_group(self._month_totals, month_key(ordinal), record.amount)
+        self._totals.add(record.amount)
+        self._add_to_group(
+            self._category_totals, category_key(record.category), record.amount
+        )
+        if self._columns is not None:
+            self._columns.add(record, ordinal or 0, category_key(record.category))
+        for name in self._row_formulas:
+            self._formula_values[name][record.id] = self._evaluate_formula(
+                name, record
+            )
+
+    def _remove_aggregates(self, record: FinanceRecord) -> None:
+        ordinal = date_key(record.date)
+        if ordinal is not None:
+            self._remove_from_group(
+                self._month_totals, month_key(ordinal), record.amount
+            )
+        self._totals.remove(record.amount)
+        self._remove_from_group(
+            self._category_totals, category_key(record.category), record.amount
+        )
+        if self._columns is not None:
+            self._columns.remove(record)
+        for name in self._row_formulas:
+            self._formula_values[name].pop(record.id, None)
+
+    def _ensure_indexes(self) -> None:
+        """Построение индексов и итогов, отложенных пакетной загрузкой."""
+        self._ensure_lookup()
+        self._ensure_totals()
+
+    def _ensure_totals(self) -> None:
+        if self._deferred_totals:
+            self._deferred_totals = False
+            self.rebuild_totals()
+
+    def _ensure_lookup(self) -> None:
+        if not self._deferred_lookup:
+            return
+        self._deferred_lookup = False
+        category_index = self._category_index
+        exact_date_index = self._exact_date_index
+        category_date_index = self._category_date_index
+        dated: List[Tuple[uuid.UUID, int, FinanceRecord]] = []
+        for record in self.records:
+            record_id, date = record.id, record.date
+            category = category_key(record.category)
+            category_index.add(category, record_id, record)
+            exact_date_index.add(date, record_id, record)
+            category_date_index.add((category, date), record_id, record)
+            ordinal = date_key(date)
+            if ordinal is not None:
+                dated.append((record_id, ordinal, record))
+        self._date_index.update(dated)
 
     def add_record(self, record: FinanceRecord) -> None:
         """Добавление новой финансовой записи."""
-        self.records.append(record)
+        self._ensure_indexes()
+        self.records.add(record)
+        self._sequence[record.id] = self._next_sequence
+        self._next_sequence += 1
+        self._index_record(record)
+        self._emit(CHANGE_ADD, record)
+
+    def upsert_records(
+        self, records: Iterable[FinanceRecord], policy: str = MERGE_OVERWRITE
+    ) -> int:
+        """Пакетный upsert_record для загрузки больших реестров.
+
+        В пустой сервис (без колонок и вычисляемых столбцов) записи только
+        складываются, а индексы и итоги строятся одним проходом при первом
+        запросе или изменении. Иначе новые записи попадают в индекс дат
+        одной сортировкой в конце, а не вставкой по одной. Возвращает число
+        добавленных или измененных записей.
+        """
+        if not self.records and self._columns is None and not self._row_formulas:
+            return self._load_deferred(records, policy)
+        self._ensure_indexes()
+        changed = 0
+        dated: List[Tuple[uuid.UUID, int, FinanceRecord]] = []
+        for record in records:
+            if record.id in self.records:
+                if dated:
+                    self._date_index.update(dated)
+                    dated = []
+                changed += self.upsert_record(record, policy)
+                continue
+            self.records.add(record)
+            self._sequence[record.id] = self._next_sequence
+            self._next_sequence += 1
+            self._index_lookup(record, dated=False)
+            ordinal = date_key(record.date)
+            if ordinal is not None:
+                dated.append((record.id, ordinal, record))
+            self._add_aggregates(record)
+            self._emit(CHANGE_ADD, record)
+            changed += 1
+        self._date_index.update(dated)
+        return changed
+
+    def _load_deferred(self, records: Iterable[FinanceRecord], policy: str) -> int:
+        changed = 0
+        for record in records:
+            existing = self.records.get(record.id)
+            if existing is None:
+                self.records.add(record)
+                self._sequence[record.id] = self._next_sequence
+                self._next_sequence += 1
+                op = CHANGE_ADD
+            elif should_replace(existing, record, policy):
+                self.records.replace(record.id, record)
+                op = CHANGE_REPLACE
+            else:
+                continue
+            self._deferred_lookup = self._deferred_totals = True
+            self._emit(op, record)
+            changed += 1
+        return changed
 
     def get_all_records(self) -> List[FinanceRecord]:
         """Просмотр всех записей."""
-        return self.records
+        return list(self.records)
 
     def get_record_by_id(self, record_id: uuid.UUID) -> Optional[FinanceRecord]:
         """Получение записи по идентификатору."""
-        for record in self.records:
-            if record.id == record_id:
-                return record
-        return None
+        return self.records.get(record_id)
 
     def replace_record_by_id(
         self, record_id: uuid.UUID, new_record: FinanceRecord
-    ) -> None:
-        for record in self.records:
-            if record.id == record_id:
-                record.amount = new_record.amount
-                record.category = new_record.category
-                record.date = new_record.date
-                record.description = new_record.description
-                break
+    ) -> bool:
+        self._ensure_indexes()
+        record = self.records.get(record_id)
+        if record is None:
+            return False
+        # Индексы поиска трогаются, только если изменился их ключ, поэтому
+        # запись остается на своем месте в выдаче filter_records
+        moved = self._lookup_key(record) != self._lookup_key(new_record)
+        if moved:
+            self._unindex_lookup(record)
+        self._remove_aggregates(record)
+        record.amount = new_record.amount
+        record.category = new_record.category
+        record.date = new_record.date
+        record.description = new_record.description
+        record.updated_at = new_record.updated_at
+        if moved:
+            self._index_lookup(record, moved=True)
+        self._add_aggregates(record)
+        self._emit(CHANGE_REPLACE, record)
+        return True
 
-    def delete_record_by_id(self, record_id: uuid.UUID) -> None:
-        for record in self.records:
-            if record.id == record_id:
-                self.records.remove(record)
-                break
+    def upsert_record(
+        self, record: FinanceRecord, policy: str = MERGE_OVERWRITE
+    ) -> bool:
+        """Добавление записи или обновление записи с тем же ID.
+
+        Возвращает True, если запись добавлена или изменена.
+        """
+        existing = self.records.get(record.id)
+        if existing is None:
+            self.add_record(record)
+            return True
+        if not should_replace(existing, record, policy):
+            return False
+        return self.replace_record_by_id(record.id, record)
+
+    def delete_record_by_id(self, record_id: uuid.UUID) -> bool:
+        self._ensure_indexes()
+        record = self.records.remove(record_id)
+        if record is None:
+            return False
+        self._unindex_record(record)
+        del self._sequence[record_id]
+        self._emit(CHANGE_DELETE, record)
+        return True
+
+    def iter_items(self) -> Iterator[FinanceRecord]:
+        """Обход всех записей (для снимков журнала)."""
+        return iter(self.records)
+
+    def apply_change(self, op: str, data: dict) -> None:
+        """Применение изменения из журнала: добавление или удаление по ID."""
+        if op == CHANGE_DELETE:
+            self.delete_record_by_id(uuid.UUID(data["id"]))
+        else:
+            self.upsert_record(FinanceRecord.from_dict(data))
+
+    def _choose_filter_index(
+        self, category: Optional[str], date: Optional[str]
+    ) -> Tuple[str, Optional[HashIndex], Any]:
+        if category is not None and date is not None:
+            return (
+                "category+date",
+                self._category_date_index,
+                (category_key(category), date),
+            )
+        if category is not None:
+            return "category", self._category_index, category_key(category)
+        if date is not None:
+            return "date", self._exact_date_index, date
+        return "none", None, None
 
     def filter_records(
         self, category: Optional[str] = None, date: Optional[str] = None
     ) -> List[FinanceRecord]:
         """Фильтрация записей по категории или дате."""
-        filtered_records = self.records
+        self._ensure_lookup()
+        name, index, key = self._choose_filter_index(category, date)
+        self._filter_stats[name] = self._filter_stats.get(name, 0) + 1
+        if index is None:
+            return list(self.records)
+        return index.get(key)
 
-        if category is not None:
-            filtered_records = [
-                record
-                for record in filtered_records
-                if record.category.lower() == category.lower()
-            ]
-
-        if date is not None:
-            filtered_records = [
-                record for record in filtered_records if record.date == date
-            ]
+    def explain_filter(
+        self, category: Optional[str] = None, date: Optional[str] = None
+    ) -> dict:
+        """Какой индекс ответит на фильтр и сколько записей он вернет."""
+        self._ensure_lookup()
+        name, index, key = self._choose_filter_index(category, date)
+        return {
+            "index": name,
+            "key": key,
+            "rows": len(self.records) if index is None else index.count(key),
+        }
 
-        return filtered_records
+    def get_index_stats(self) -> dict:
+        """Размеры индексов и число запросов, обслуженных каждым из них."""
+        self._ensure_lookup()
+        return {
+            "records": len(self.records),
+            "categories": len(self._category_index),
+            "dates": len(self._exact_date_index),
+            "category_dates": len(self._category_date_index),
+            "filter_queries": dict(self._filter_stats),
+        }
 
     def generate_report(self, start_date: str, end_date: str) -> List[FinanceRecord]:
-        """Генерация отчета о финансовой активности за определенный период."""
-        start_date_obj = datetime.strptime(start_date, "%d-%m-%Y")
-        end_date_obj = datetime.strptime(end_date, "%d-%m-%Y")
-
-        report_records = [
-            record
-            for record in self.records
-            if start_date_obj
-            <= datetime.strptime(record.date, "%d-%m-%Y")
-            <= end_date_obj
+        """Генерация отчета о финансовой активности за определенный период.
+
+        Записи возвращаются в порядке дат; записи с некорректной датой
+        в отчет не попадают.
+        """
+        start_ordinal = date_key(start_date)
+        end_ordinal = date_key(end_date)
+        if start_ordinal is None or end_ordinal is None:
+            raise ValueError("Даты периода должны быть в формате ДД-ММ-ГГГГ")
+
+        self._ensure_lookup()
+        return self._date_index.range(start_ordinal, end_ordinal)
+
+    def get_totals(self) -> FinanceTotals:
+        """Итоги по всем записям."""
+        self._ensure_totals()
+        return self._totals
+
+    def get_category_totals(self) -> Dict[str, FinanceTotals]:
+        """Итоги по категориям (без учета регистра)."""
+        self._ensure_totals()
+        return self._category_totals
+
+    def get_month_totals(self) -> Dict[str, FinanceTotals]:
+        """Итоги по месяцам ММ-ГГГГ."""
+        self._ensure_totals()
+        return self._month_totals
+
+    def _compute_totals(self):
+        totals = FinanceTotals()
+        category_totals: Dict[str, FinanceTotals] = {}
+        month_totals: Dict[str, FinanceTotals] = {}
+        for record in self.records:
+            totals.add(record.amount)
+            self._add_to_group(
+                category_totals, category_key(record.category), record.amount
+            )
+            ordinal = date_key(record.date)
+            if ordinal is not None:
+                self._add_to_group(month_totals, month_key(ordinal), record.amount)
+        return totals, category_totals, month_totals
+
+    def check_totals(self) -> bool:
+        """Сверка накопленных итогов с пересчетом по всем записям."""
+        self._ensure_totals()
+        totals, category_totals, month_totals = self._compute_totals()
+
+        def same_groups(left, right) -> bool:
+            return left.keys() == right.keys() and all(
+                left[key].matches(right[key]) for key in left
+            )
+
+        return (
+            self._totals.matches(totals)
+            and same_groups(self._category_totals, category_totals)
+            and same_groups(self._month_totals, month_totals)
+        )
+
+    def rebuild_totals(self) -> None:
+        """Пересчет накопленных итогов по всем записям."""
+        self._totals, self._category_totals, self._month_totals = (
+            self._compute_totals()
+        )
+
+    def _require_columns(self) -> "FinanceColumns":
+        if self._columns is None:
+            raise RuntimeError(
+                "Колоночный режим не включен (FinanceService(columnar=True))"
+            )
+        return self._columns
+
+    def sum_by_category(self) -> Dict[str, float]:
+        """Сумма записей по категориям (колоночный режим)."""
+        return self._require_columns().sum_by_category()
+
+    def sum_by_month(self) -> Dict[str, float]:
+        """Сумма записей по месяцам ММ-ГГГГ (колоночный режим)."""
+        return self._require_columns().sum_by_month()
+
+    def balance_between(self, start_date: str, end_date: str) -> float:
+        """Баланс за период (колоночный режим)."""
+        start_ordinal = date_key(start_date)
+        end_ordinal = date_key(end_date)
+        if start_ordinal is None or end_ordinal is None:
+            raise ValueError("Даты периода должны быть в формате ДД-ММ-ГГГГ")
+        return self._require_columns().balance_between(start_ordinal, end_ordinal)
+
+    def top_expenses(self, n: int = 10) -> List[FinanceRecord]:
+        """n самых крупных расходов (колоночный режим)."""
+        return self._require_columns().top_expenses(n)
+
+    def define_formula(self, name: str, expression: str) -> None:
+        """Определение или изменение вычисляемого столбца.
+
+        В формуле доступны поля записи FORMULA_FIELDS, параметры
+        set_formula_parameter и ранее определенные столбцы, например
+        define_formula("net", "amount * (1 - tax)"). Столбец сразу
+        вычисляется для всех записей, а затем пересчитывается только
+        для добавленных и измененных записей.
+        """
+        compiled = compile_expression(expression)
+        if name in FORMULA_FIELDS or name in self._formula_parameters:
+            raise ValueError(f"Имя {name} уже занято полем или параметром")
+        available = set(FORMULA_FIELDS) | set(self._formula_parameters)
+        if name in self._formulas:
+            # Столбец может ссылаться только на столбцы, определенные до него
+            available.update(self._formulas_before(name))
+        else:
+            available.update(self._formulas)
+        unknown = compiled.variables - available
+        if unknown:
+            raise ValueError(
+                f"Неизвестные имена в формуле {name}: {', '.join(sorted(unknown))}"
+            )
+        self._formulas[name] = compiled
+        self._refresh_formulas({name})
+
+    def remove_formula(self, name: str) -> None:
+        """Удаление вычисляемого столбца, от которого не зависят другие."""
+        dependents = [
+            other
+            for other, compiled in self._formulas.items()
+            if name in compiled.variables
         ]
+        if dependents:
+            raise ValueError(
+                f"От столбца {name} зависят столбцы: {', '.join(dependents)}"
+            )
+        del self._formulas[name]
+        self._formula_values.pop(name, None)
+        self._update_row_formulas()
+
+    def set_formula_parameter(self, name: str, value: float) -> None:
+        """Задание параметра формул с пересчетом зависящих от него столбцов."""
+        if name in FORMULA_FIELDS or name in self._formulas:
+            raise ValueError(f"Имя {name} уже занято полем или столбцом")
+        self._formula_parameters[name] = value
+        self._refresh_formulas({name})
+
+    def get_formula_value(
+        self, record_id: Optional[uuid.UUID], name: str
+    ) -> Optional[float]:
+        """Значение вычисляемого столбца для записи."""
+        if name not in self._formulas:
+            raise KeyError(f"Неизвестный вычисляемый столбец: {name}")
+        if name in self._row_formulas:
+            return self._formula_values[name].get(record_id)
+        return self._formula_values[name].get(None)
 
-        return report_records
+    def get_formula_column(self, name: str) -> Dict[uuid.UUID, Optional[float]]:
+        """Значения вычисляемого столбца для всех записей."""
+        if name not in self._row_formulas:
+            value = self.get_formula_value(None, name)
+            return {record.id: value for record in self.records}
+        return dict(self._formula_values[name])
+
+    def _formulas_before(self, name: str) -> List[str]:
+        names = list(self._formulas)
+        return names[: names.index(name)]
+
+    def _update_row_formulas(self) -> None:
+        """Столбцы, зависящие от полей записи прямо или через другие столбцы."""
+        row_formulas: List[str] = []
+        row_names = set(FORMULA_FIELDS)
+        for name, compiled in self._formulas.items():
+            if compiled.variables & row_names:
+                row_formulas.append(name)
+                row_names.add(name)
+        self._row_formulas = row_formulas
+
+    def _refresh_formulas(self, changed: set) -> None:
+        """Пересчет по всем записям столбцов, зависящих от имен changed."""
+        self._update_row_formulas()
+        changed = set(changed)
+        for name, compiled in self._formulas.items():
+            if name in changed or compiled.variables & changed:
+                changed.add(name)
+                self._formula_values[name] = self._compute_formula_column(name)
+
+    def _evaluate_formula(
+        self, name: str, record: Optional[FinanceRecord]
+    ) -> Optional[float]:
+        compiled = self._formulas[name]
+        names = {
+            **self._formula_parameters,
+            **{
+                other: self.get_formula_value(
+                    record.id if record is not None else None, other
+                )
+                for other in compiled.variables
+                if other in self._formulas
+            },
+        }
+        if record is not None:
+            names["amount"] = record.amount
+        if any(value is None for value in names.values()):
+            return None
+        try:
+            return compiled.evaluate(names)
+        except CalculatorError:
+            return None
+
+    def _compute_formula_column(
+        self, name: str
+    ) -> Dict[Optional[uuid.UUID], Optional[float]]:
+        """Значения столбца для всех записей одним проходом.
+
+        Столбец без полей записи хранится одним значением под ключом None.
+        С numpy формула вычисляется векторно, иначе — по записям.
+        """
+        if name not in self._row_formulas:
+            return {None: self._evaluate_formula(name, None)}
+        records = list(self.records)
+        try:
+            import numpy as np
+        except ImportError:
+            return {
+                record.id: self._evaluate_formula(name, record) for record in records
+            }
+        compiled = self._formulas[name]
+        columns: Dict[str, Any] = dict(self._formula_parameters)
+        columns["amount"] = np.fromiter(
+            (record.amount for record in records), np.float64, len(records)
+        )
+        for other in compiled.variables & set(self._formulas):
+            values = self._formula_values[other]
+            if other in self._row_formulas:
+                columns[other] = np.array(
+                    [values.get(record.id) for record in records], dtype=np.float64
+                )
+            else:
+                columns[other] = values.get(None)
+        if any(value is None for value in columns.values()):
+            return {record.id: None for record in records}
+        result = compiled.evaluate_batch(columns)
+        mask = np.ma.getmaskarray(result)
+        values = np.ma.getdata(result).tolist()
+        return {
+            record.id: None if masked else value
+            for record, value, masked in zip(records, values, mask.tolist())
+        }
 
     def export_to_csv(self, filename: str) -> None:
         """Экспорт финансовых записей в CSV файл."""
@@ -113,23 +791,39 @@ class FinanceService:
                     ]
                 )
 
-    def import_from_csv(self, filename: str) -> None:
-        """Импорт финансовых записей из CSV файла."""
-        with open(filename, mode="r", newline="", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            next(reader)  # Пропустить заголовок
-            for row in reader:
-                if len(row) < 5:
-                    continue
-                id_str, amount_str, category, date_str, description = row
-                amount = float(amount_str)
-                record = FinanceRecord(
-                    amount=amount,
-                    category=category,
-                    date=date_str.strip(),
-                    description=description,
-                )
+    def import_from_csv(
+        self,
+        filename: str,
+        reject_filename: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[ImportReport], None]] = None,
+    ) -> ImportReport:
+        """Импорт финансовых записей из CSV файла.
+
+        Импорт выполняется целиком или не выполняется вовсе; некорректные
+        строки при заданном reject_filename пишутся в файл отказов.
+        """
+        added: List[FinanceRecord] = []
+
+        def apply_batch(batch: List[FinanceRecord]) -> None:
+            for record in batch:
                 self.add_record(record)
+                added.append(record)
+
+        def rollback() -> None:
+            for record in added:
+                self.delete_record_by_id(record.id)
+
+        return stream_csv_import(
+            filename,
+            5,
+            _record_from_row,
+            apply_batch,
+            rollback,
+            reject_filename=reject_filename,
+            batch_size=batch_size,
+            progress=progress,
+        )
 
     def save_to_json(self, filename: str = "finance.json") -> None:
         """Сохранение финансовых записей в JSON файл."""
@@ -141,22 +835,59 @@ class FinanceService:
                 indent=4,
             )
 
-    def load_from_json(self, filename: str = "finance.json") -> None:
-        """Загрузка финансовых записей из JSON файла."""
+    def load_from_json(
+        self, filename: str = "finance.json", policy: str = MERGE_OVERWRITE
+    ) -> None:
+        """Загрузка финансовых записей из JSON файла с обновлением записей по ID."""
         try:
             with open(filename, mode="r", encoding="utf-8") as file:
                 records_data = json.load(file)
-                for data in records_data:
-                    record = FinanceRecord(
-                        amount=data["amount"],
-                        category=data["category"],
-                        date=data["date"],
-                        description=data["description"],
-                    )
-                    self.add_record(record)
+                self.upsert_records(
+                    (FinanceRecord.from_dict(data) for data in records_data), policy
+                )
         except FileNotFoundError:
             print(f"Файл {filename} не найден.")
 
+    def save_to_binary(
+        self,
+        filename: str = "finance.bin",
+        append: bool = False,
+        compression: str = "none",
+    ) -> None:
+        """Сохранение записей в двоичный реестр.
+
+        При append=True в существующий файл дописываются только записи,
+        которых в нем еще нет; изменения и удаления требуют полной записи.
+        compression ("none", "zlib" или "lzma") задает сжатие описаний
+        нового файла; для zlib словарь обучается на текущих описаниях.
+        """
+        from binary_ledger import BinaryLedger
+        from compression import METHOD_ZLIB, BlockCodec, train_dictionary
+
+        dictionary = b""
+        if compression == METHOD_ZLIB:
+            dictionary = train_dictionary(
+                record.description for record in self.records
+            )
+        codec = BlockCodec(compression, dictionary=dictionary)
+        with BinaryLedger(filename, create=not append, codec=codec) as ledger:
+            stored_ids = {ledger.record_id(index) for index in range(len(ledger))}
+            ledger.extend(
+                record for record in self.records if record.id not in stored_ids
+            )
+
+    def load_from_binary(
+        self, filename: str = "finance.bin", policy: str = MERGE_OVERWRITE
+    ) -> None:
+        """Загрузка записей из двоичного реестра с обновлением записей по ID."""
+        from binary_ledger import BinaryLedger
+
+        if not os.path.exists(filename):
+            print(f"Файл {filename} не найден.")
+            return
+        with BinaryLedger(filename) as ledger:
+            self.upsert_records(ledger, policy)
+
 
 import uuid
 
@@ -0,0 +1,672 @@
+import uuid
+from bisect import bisect_left, bisect_right
+from heapq import heappop, heappush
+from itertools import chain, islice
+from datetime import datetime
+from functools import lru_cache
+from math import inf
+from operator import itemgetter
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+DATE_FORMAT = "%d-%m-%Y"
+
+# Политики слияния при импорте объекта с уже существующим id
+MERGE_SKIP = "skip"
+MERGE_OVERWRITE = "overwrite"
+MERGE_NEWEST = "newest"
+MERGE_POLICIES = (MERGE_SKIP, MERGE_OVERWRITE, MERGE_NEWEST)
+
+
+@lru_cache(maxsize=4096)
+def date_key(date_str: str) -> Optional[int]:
+    """Порядковый номер дня для даты ДД-ММ-ГГГГ или None, если дата некорректна.
+
+    strptime медленный, а дат в данных немного, поэтому результаты кешируются.
+    """
+    try:
+        return datetime.strptime(date_str, DATE_FORMAT).toordinal()
+    except (TypeError, ValueError):
+        return None
+
+
+def should_replace(existing: Any, incoming: Any, policy: str) -> bool:
+    """Нужно ли заменить existing на incoming с тем же id по политике policy.
+
+    Объект с теми же данными (same_data) не заменяется ни при какой
+    политике: повторный импорт тех же данных не переиндексирует объекты
+    и не рассылает CHANGE_REPLACE.
+    """
+    if policy == MERGE_SKIP:
+        return False
+    if policy == MERGE_OVERWRITE:
+        replace = True
+    elif policy == MERGE_NEWEST:
+        replace = incoming.updated_at > existing.updated_at
+    else:
+        raise ValueError(f"Неизвестная политика слияния: {policy}")
+    return replace and not existing.same_data(incoming)
+
+
+def parse_id(value: Optional[str]) -> Optional[uuid.UUID]:
+    """UUID из строки или None, если строка не является UUID."""
+    try:
+        return uuid.UUID(value)
+    except (TypeError, ValueError, AttributeError):
+        return None
+
+
+class SortedIndex:
+    """Упорядоченный по ключу индекс с поиском диапазона бинарным поиском.
+
+    Элементы с одинаковым ключом хранятся в порядке добавления или, если
+    задан order (id -> уникальный номер), в порядке номеров. Записи
+    лежат в отсортированных блоках длиной до 2 * _LOAD (как в sorted
+    containers): вставка и удаление сдвигают только один блок, поэтому
+    стоят O(log n + _LOAD) вместо O(n) у одного плоского списка.
+    """
+
+    _LOAD = 512
+
+    def __init__(self, order: Optional[Dict[Hashable, int]] = None) -> None:
+        self._order = order
+        # Блоки записей (ключ, порядковый номер), значения и максимумы блоков
+        self._keys: List[List[Tuple[Any, int]]] = []
+        self._values: List[List[Any]] = []
+        self._maxes: List[Tuple[Any, int]] = []
+        self._entries: Dict[Hashable, Tuple[Any, int]] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(self, item_id: Hashable, key: Any, value: Any) -> None:
+        """Добавление значения под ключом key."""
+        self.discard(item_id)
+        entry = (key, self._next_order(item_id))
+        self._entries[item_id] = entry
+        maxes = self._maxes
+        if not maxes:
+            self._keys.append([entry])
+            self._values.append([value])
+            maxes.append(entry)
+            return
+        block = bisect_left(maxes, entry)
+        if block == len(maxes):
+            block -= 1
+            self._keys[block].append(entry)
+            self._values[block].append(value)
+            maxes[block] = entry
+        else:
+            keys = self._keys[block]
+            position = bisect_right(keys, entry)
+            keys.insert(position, entry)
+            self._values[block].insert(position, value)
+        if len(self._keys[block]) > 2 * self._LOAD:
+            self._split(block)
+
+    def update(self, items: Iterable[Tuple[Hashable, Any, Any]]) -> None:
+        """Добавление многих троек (id, ключ, значение) одной сортировкой.
+
+        Для загрузки больших объемов: O((n + m) log(n + m)) вместо m вставок.
+        """
+        batch: Dict[Hashable, Tuple[Any, Any]] = {}
+        for item_id, key, value in items:
+            size = len(batch)
+            batch[item_id] = (key, value)
+            if len(batch) == size:
+                # Повторный id в пакете: он встает в конец, как при add
+                del batch[item_id]
+                batch[item_id] = (key, value)
+        entries = self._entries
+        if entries:
+            for item_id in batch.keys() & entries.keys():
+                self.discard(item_id)
+        pairs = list(
+            zip(chain.from_iterable(self._keys), chain.from_iterable(self._values))
+        )
+        order = self._order
+        for item_id, (key, value) in batch.items():
+            if order is None:
+                self._counter += 1
+                entry = (key, self._counter)
+            else:
+                entry = (key, order[item_id])
+            entries[item_id] = entry
+            pairs.append((entry, value))
+        pairs.sort(key=itemgetter(0))
+        load = self._LOAD
+        self._keys = [
+            [entry for entry, _ in pairs[start : start + load]]
+            for start in range(0, len(pairs), load)
+        ]
+        self._values = [
+            [value for _, value in pairs[start : start + load]]
+            for start in range(0, len(pairs), load)
+        ]
+        self._maxes = [keys[-1] for keys in self._keys]
+
+    def _next_order(self, item_id: Hashable) -> int:
+        if self._order is not None:
+            return self._order[item_id]
+        self._counter += 1
+        return self._counter
+
+    def _split(self, block: int) -> None:
+        keys, values = self._keys[block], self._values[block]
+        half = len(keys) // 2
+        self._keys[block : block + 1] = [keys[:half], keys[half:]]
+        self._values[block : block + 1] = [values[:half], values[half:]]
+        self._maxes[block : block + 1] = [keys[half - 1], keys[-1]]
+
+    def discard(self, item_id: Hashable) -> None:
+        """Удаление значения, если оно есть в индексе."""
+        entry = self._entries.pop(item_id, None)
+        if entry is None:
+            return
+        block = bisect_left(self._maxes, entry)
+        keys = self._keys[block]
+        position = bisect_left(keys, entry)
+        del keys[position]
+        del self._values[block][position]
+        if not keys:
+            del self._keys[block]
+            del self._values[block]
+            del self._maxes[block]
+        elif position == len(keys):
+            self._maxes[block] = keys[-1]
+
+    def _bounds(self, low: Any, high: Any) -> Tuple[int, int, int, int]:
+        """Начало и конец диапазона как (блок, позиция, блок, позиция)."""
+        maxes = self._maxes
+        if low is None:
+            start_block = start = 0
+        else:
+            start_block = bisect_left(maxes, (low,))
+            start = (
+                bisect_left(self._keys[start_block], (low,))
+                if start_block < len(maxes)
+                else 0
+            )
+        if high is None:
+            stop_block, stop = len(maxes), 0
+        else:
+            stop_block = bisect_right(maxes, (high, inf))
+            stop = (
+                bisect_right(self._keys[stop_block], (high, inf))
+                if stop_block < len(maxes)
+                else 0
+            )
+        return start_block, start, stop_block, stop
+
+    def _slices(self, low: Any, high: Any) -> Iterator[Iterable[Any]]:
+        start_block, start, stop_block, stop = self._bounds(low, high)
+        values = self._values
+        if (start_block, start) >= (stop_block, stop):
+            return
+        if start_block == stop_block:
+            yield islice(values[start_block], start, stop)
+            return
+        yield islice(values[start_block], start, None)
+        yield from islice(values, start_block + 1, stop_block)
+        if stop:
+            yield islice(values[stop_block], stop)
+
+    def range(self, low: Any = None, high: Any = None) -> List[Any]:
+        """Значения с ключами в диапазоне [low, high] (None — без границы)."""
+        return list(chain.from_iterable(self._slices(low, high)))
+
+    def iter_range(self, low: Any = None, high: Any = None) -> Iterator[Any]:
+        """Ленивый обход значений с ключами в диапазоне [low, high]."""
+        return chain.from_iterable(self._slices(low, high))
+
+    def count(self, low: Any = None, high: Any = None) -> int:
+        """Число значений с ключами в диапазоне [low, high].
+
+        Стоит O(log n + n / _LOAD): складываются длины целых блоков.
+        """
+        start_block, start, stop_block, stop = self._bounds(low, high)
+        if (start_block, start) >= (stop_block, stop):
+            return 0
+        if start_block == stop_block:
+            return stop - start
+        return (
+            len(self._keys[start_block])
+            - start
+            + sum(map(len, islice(self._keys, start_block + 1, stop_block)))
+            + stop
+        )
+
+
+class HashIndex:
+    """Хеш-индекс: ключ -> значения в порядке добавления.
+
+    Если задан order (id -> уникальный номер), insert ставит значение
+    на место по номеру, а не в конец: так элемент, перенесенный из другого
+    ключа, сохраняет исходный порядок. Такой ключ упорядочивается один раз
+    при следующем чтении, а не при каждой вставке.
+    """
+
+    def __init__(self, order: Optional[Dict[Hashable, int]] = None) -> None:
+        self._buckets: Dict[Hashable, Dict[Hashable, Any]] = {}
+        self._order = order
+        self._unsorted: Set[Hashable] = set()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def add(self, key: Hashable, item_id: Hashable, value: Any) -> None:
+        """Добавление значения в конец ключа key."""
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = {}
+        bucket[item_id] = value
+
+    def insert(self, key: Hashable, item_id: Hashable, value: Any) -> None:
+        """Добавление значения на его место по номеру order."""
+        order = self._order
+        bucket = self._buckets.get(key)
+        if (
+            order is not None
+            and bucket
+            and item_id not in bucket
+            and order[next(reversed(bucket))] > order[item_id]
+        ):
+            self._unsorted.add(key)
+        self.add(key, item_id, value)
+
+    def discard(self, key: Hashable, item_id: Hashable) -> None:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return
+        bucket.pop(item_id, None)
+        if not bucket:
+            del self._buckets[key]
+            self._unsorted.discard(key)
+
+    def _bucket(self, key: Hashable) -> Optional[Dict[Hashable, Any]]:
+        bucket = self._buckets.get(key)
+        if bucket and key in self._unsorted:
+            self._unsorted.discard(key)
+            order = self._order
+            bucket = self._buckets[key] = dict(
+                sorted(bucket.items(), key=lambda item: order[item[0]])
+            )
+        return bucket
+
+    def get(self, key: Hashable) -> List[Any]:
+        """Значения с ключом key."""
+        bucket = self._bucket(key)
+        return list(bucket.values()) if bucket else []
+
+    def iter(self, key: Hashable) -> Iterator[Any]:
+        """Ленивый обход значений с ключом key."""
+        bucket = self._bucket(key)
+        return iter(bucket.values()) if bucket else iter(())
+
+    def contains(self, key: Hashable, item_id: Hashable) -> bool:
+        bucket = self._buckets.get(key)
+        return bucket is not None and item_id in bucket
+
+    def count(self, key: Hashable) -> int:
+        bucket = self._buckets.get(key)
+        return len(bucket) if bucket else 0
+
+
+class NgramIndex:
+    """Инвертированный индекс n-грамм для поиска подстрок."""
+
+    def __init__(self, n: int = 3) -> None:
+        self.n = n
+        self._postings: Dict[str, Set[Hashable]] = {}
+
+    def _grams(self, text: str) -> Set[str]:
+        n = self.n
+        return {text[i : i + n] for i in range(len(text) - n + 1)}
+
+    def add(self, item_id: Hashable, text: str) -> None:
+        for gram in self._grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                posting = self._postings[gram] = set()
+            posting.add(item_id)
+
+    def discard(self, item_id: Hashable, text: str) -> None:
+        for gram in self._grams(text):
+            posting = self._postings.get(gram)
+            if posting is None:
+                continue
+            posting.discard(item_id)
+            if not posting:
+                del self._postings[gram]
+
+    def candidates(self, query: str) -> Optional[Set[Hashable]]:
+        """Элементы, содержащие все n-граммы запроса.
+
+        None означает, что запрос короче n и индекс не может помочь.
+        """
+        if len(query) < self.n:
+            return None
+        postings = []
+        for gram in self._grams(query):
+            posting = self._postings.get(gram)
+            if posting is None:
+                return set()
+            postings.append(posting)
+        postings.sort(key=len)
+        result = set(postings[0])
+        for posting in postings[1:]:
+            result &= posting
+            if not result:
+                break
+        return result
+
+
+class PrefixTrie:
+    """Префиксное дерево строк с поиском точного совпадения и по префиксу."""
+
+    _ITEMS = ""
+
+    def __init__(self) -> None:
+        self._root: Dict[str, Any] = {}
+
+    def add(self, key: str, item_id: Hashable) -> None:
+        node = self._root
+        for char in key:
+            node = node.setdefault(char, {})
+        node.setdefault(self._ITEMS, set()).add(item_id)
+
+    def discard(self, key: str, item_id: Hashable) -> None:
+        path = [self._root]
+        for char in key:
+            node = path[-1].get(char)
+            if node is None:
+                return
+            path.append(node)
+        items = path[-1].get(self._ITEMS)
+        if items is None:
+            return
+        items.discard(item_id)
+        if not items:
+            del path[-1][self._ITEMS]
+        # Удаление опустевших узлов снизу вверх
+        for depth in range(len(key), 0, -1):
+            if path[depth]:
+                break
+            del path[depth - 1][key[depth - 1]]
+
+    def _find(self, key: str) -> Optional[Dict[str, Any]]:
+        node = self._root
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                return None
+        return node
+
+    def exact(self, key: str) -> Set[Hashable]:
+        """Элементы, сохраненные точно под ключом key."""
+        node = self._find(key)
+        return set(node.get(self._ITEMS, ())) if node else set()
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> Set[Hashable]:
+        """Элементы с ключами, начинающимися с prefix (не больше limit)."""
+        node = self._find(prefix)
+        result: Set[Hashable] = set()
+        stack = [node] if node else []
+        while stack and (limit is None or len(result) < limit):
+            node = stack.pop()
+            for char, child in node.items():
+                if char == self._ITEMS:
+                    result.update(child)
+                else:
+                    stack.append(child)
+        if limit is not None and len(result) > limit:
+            result = set(list(result)[:limit])
+        return result
+
+    def fuzzy(self, key: str, max_distance: int) -> List[Tuple[int, Hashable]]:
+        """Пары (расстояние, элемент) для ключей не дальше max_distance от key.
+
+        Обход дерева с одной строкой таблицы Левенштейна на узел (как
+        автомат Левенштейна): общие префиксы ключей считаются один раз,
+        поддеревья, в строке которых все значения больше max_distance,
+        пропускаются, а в строке считается только полоса шириной
+        2 * max_distance + 1 вокруг диагонали - остальные клетки заведомо
+        больше max_distance.
+        """
+        result: List[Tuple[int, Hashable]] = []
+        items_key = self._ITEMS
+        size = len(key)
+        cap = max_distance + 1
+        stack = [(self._root, 0, [min(column, cap) for column in range(size + 1)])]
+        while stack:
+            node, depth, row = stack.pop()
+            if row[-1] < cap and items_key in node:
+                result.extend((row[-1], item_id) for item_id in node[items_key])
+            depth += 1
+            low = max(1, depth - max_distance)
+            high = min(size, depth + max_distance)
+            for char, child in node.items():
+                if char == items_key:
+                    continue
+                new_row = [cap] * (size + 1)
+                previous = lowest = new_row[0] = min(depth, cap)
+                if low > 1:
+                    previous = cap
+                # Условные выражения вместо min(): это внутренний цикл поиска
+                for column in range(low, high + 1):
+                    cost = row[column - 1]
+                    if key[column - 1] != char:
+                        cost += 1
+                    up = row[column]
+                    if up < cost:
+                        cost = up + 1
+                    if previous < cost:
+                        cost = previous + 1
+                    if cost > cap:
+                        cost = cap
+                    elif cost < lowest:
+                        lowest = cost
+                    new_row[column] = previous = cost
+                if lowest < cap:
+                    stack.append((child, depth, new_row))
+        return result
+
+
+class IndexedCollection:
+    """Коллекция объектов с атрибутом id.
+
+    Поиск, замена и удаление по id выполняются за O(1); обход идет
+    в порядке добавления, замена сохраняет позицию элемента.
+    """
+
+    def __init__(self, items: Optional[Iterable[Any]] = None) -> None:
+        self._items: Dict[Hashable, Any] = {}
+        for item in items or ():
+            self.add(item)
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[Any]:
+        return iter(self._items.values())
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._items
+
+    def add(self, item: Any) -> None:
+        """Добавление нового элемента; повторный id — ошибка ValueError."""
+        if item.id in self._items:
+            raise ValueError(f"Элемент с ID {item.id} уже добавлен")
+        self._items[item.id] = item
+
+    def get(self, item_id: Hashable) -> Optional[Any]:
+        return self._items.get(item_id)
+
+    def replace(self, item_id: Hashable, item: Any) -> bool:
+        """Замена элемента с сохранением его id и позиции."""
+        if item_id not in self._items:
+            return False
+        item.id = item_id
+        self._items[item_id] = item
+        return True
+
+    def remove(self, item_id: Hashable) -> Optional[Any]:
+        """Удаление элемента; возвращает удаленный элемент или None."""
+        return self._items.pop(item_id, None)
+
+
+class IndexedHeap:
+    """Двоичная куча с доступом по id элемента.
+
+    Добавление, изменение ключа и удаление выполняются за O(log n);
+    при равных ключах раньше идет элемент, добавленный раньше.
+    """
+
+    def __init__(self) -> None:
+        # элементы кучи: (ключ, порядковый номер, id, значение)
+        self._heap: List[Tuple[Any, int, Hashable, Any]] = []
+        self._positions: Dict[Hashable, int] = {}
+        self._counter = 0
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._positions
+
+    def add(self, item_id: Hashable, key: Any, value: Any) -> None:
+        """Добавление элемента или изменение ключа уже добавленного."""
+        position = self._positions.get(item_id)
+        if position is not None:
+            _, order, _, _ = self._heap[position]
+            self._heap[position] = (key, order, item_id, value)
+            self._sift_up(position)
+            self._sift_down(self._positions[item_id])
+            return
+        self._heap.append((key, self._counter, item_id, value))
+        self._counter += 1
+        self._positions[item_id] = len(self._heap) - 1
+        self._sift_up(len(self._heap) - 1)
+
+    def discard(self, item_id: Hashable) -> None:
+        """Удаление элемента, если он есть в куче."""
+        position = self._positions.pop(item_id, None)
+        if position is None:
+            return
+        last = self._heap.pop()
+        if position == len(self._heap):
+            return
+        self._heap[position] = last
+        self._positions[last[2]] = position
+        self._sift_up(position)
+        self._sift_down(self._positions[last[2]])
+
+    def peek(self) -> Optional[Any]:
+        """Значение с наименьшим ключом или None для пустой кучи."""
+        return self._heap[0][3] if self._heap else None
+
+    def smallest(self, n: int) -> List[Any]:
+        """n значений с наименьшими ключами по возрастанию ключа.
+
+        Обходит только верх кучи: O(n log n) независимо от ее размера.
+        """
+        heap = self._heap
+        result: List[Any] = []
+        frontier = [(heap[0], 0)] if heap and n > 0 else []
+        while frontier and len(result) < n:
+            entry, position = heappop(frontier)
+            result.append(entry[3])
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < len(heap):
+                    heappush(frontier, (heap[child], child))
+        return result
+
+    def below(self, bound: Any) -> List[Any]:
+        """Значения с ключами меньше bound по возрастанию ключа.
+
+        Поддеревья, корень которых не меньше bound, не просматриваются.
+        """
+        heap = self._heap
+        found = []
+        stack = [0] if heap else []
+        while stack:
+            position = stack.pop()
+            entry = heap[position]
+            if not entry[0] < bound:
+                continue
+            found.append(entry)
+            stack.extend(
+                child
+                for child in (2 * position + 1, 2 * position + 2)
+                if child < len(heap)
+            )
+        found.sort(key=lambda entry: entry[:2])
+        return [entry[3] for entry in found]
+
+    def _swap(self, first: int, second: int) -> None:
+        heap = self._heap
+        heap[first], heap[second] = heap[second], heap[first]
+        self._positions[heap[first][2]] = first
+        self._positions[heap[second][2]] = second
+
+    def _less(self, first: int, second: int) -> bool:
+        return self._heap[first][:2] < self._heap[second][:2]
+
+    def _sift_up(self, position: int) -> None:
+        while position > 0:
+            parent = (position - 1) // 2
+            if not self._less(position, parent):
+                break
+            self._swap(position, parent)
+            position = parent
+
+    def _sift_down(self, position: int) -> None:
+        size = len(self._heap)
+        while True:
+            smallest = position
+            for child in (2 * position + 1, 2 * position + 2):
+                if child < size and self._less(child, smallest):
+                    smallest = child
+            if smallest == position:
+                return
+            self._swap(position, smallest)
+            position = smallest
+
+
+# Виды изменений, о которых сообщает ChangeEmitter
+CHANGE_ADD = "add"
+CHANGE_REPLACE = "replace"
+CHANGE_DELETE = "delete"
+
+
+class ChangeEmitter:
+    """Примесь для сервисов: уведомление подписчиков об изменениях.
+
+    Подписчик вызывается синхронно как listener(op, item) после изменения,
+    где op — CHANGE_ADD, CHANGE_REPLACE или CHANGE_DELETE.
+    """
+
+    def __init__(self) -> None:
+        self._listeners: List[Callable[[str, Any], None]] = []
+
+    def subscribe(self, listener: Callable[[str, Any], None]) -> None:
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[str, Any], None]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, op: str, item: Any) -> None:
+        for listener in list(self._listeners):
+            listener(op, item)
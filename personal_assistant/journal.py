@@ -0,0 +1,174 @@
+import json
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from indexes import CHANGE_ADD, CHANGE_DELETE
+
+DEFAULT_SYNC_EVERY = 64
+DEFAULT_COMPACT_EVERY = 10000
+
+
+def _read_lines(filename: str) -> Iterator[dict]:
+    """JSON объекты из файла по одному в строке.
+
+    Недописанная последняя строка (сбой во время записи) пропускается.
+    """
+    if not os.path.exists(filename):
+        return
+    with open(filename, mode="r", encoding="utf-8") as file:
+        for line in file:
+            if not line.endswith("\n"):
+                return
+            if line.strip():
+                yield json.loads(line)
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+class Journal:
+    """Журнал изменений сервиса с дозаписью вместо полной перезаписи файла.
+
+    Каждое добавление, изменение и удаление сервиса дописывается в файл
+    filename одной компактной строкой JSON, поэтому сохранение одной правки
+    не зависит от объема данных. Файл сбрасывается в ОС после каждой
+    строки, а fsync выполняется раз в sync_every изменений (0 — только
+    при sync и close): при сбое процесса ничего не теряется, при отключении
+    питания — не больше sync_every последних изменений.
+
+    При открытии в сервис загружается снимок filename.snapshot и
+    проигрываются изменения журнала. Каждые compact_every изменений журнал
+    переименовывается в filename.old, и фоновый поток сливает его со
+    снимком, не обращаясь к сервису; повторное проигрывание filename.old
+    после сбоя безопасно, так как изменения идемпотентны.
+
+    Сервис должен наследовать ChangeEmitter и реализовывать
+    apply_change(op, data) и iter_items().
+    """
+
+    def __init__(
+        self,
+        service: Any,
+        filename: str,
+        sync_every: int = DEFAULT_SYNC_EVERY,
+        compact_every: Optional[int] = DEFAULT_COMPACT_EVERY,
+    ) -> None:
+        self.service = service
+        self.filename = filename
+        self.snapshot_filename = filename + ".snapshot"
+        self.old_filename = filename + ".old"
+        self.sync_every = sync_every
+        self.compact_every = compact_every
+        self._lock = threading.Lock()
+        self._compaction: Optional[threading.Thread] = None
+        self._unsynced = 0
+        self._entries = 0
+
+        fresh = not any(
+            os.path.exists(name)
+            for name in (filename, self.snapshot_filename, self.old_filename)
+        )
+        self._replay()
+        if os.path.exists(self.old_filename):
+            # Прошлое сжатие не завершилось
+            self._merge_old()
+        if fresh:
+            self._write_snapshot(item.to_dict() for item in service.iter_items())
+        self._file = open(filename, mode="a", encoding="utf-8")
+        service.subscribe(self._on_change)
+
+    def _replay(self) -> None:
+        for data in _read_lines(self.snapshot_filename):
+            self.service.apply_change(CHANGE_ADD, data)
+        for name in (self.old_filename, self.filename):
+            for entry in _read_lines(name):
+                self.service.apply_change(entry["op"], entry["data"])
+                if name == self.filename:
+                    self._entries += 1
+
+    def _on_change(self, op: str, item: Any) -> None:
+        data = {"id": str(item.id)} if op == CHANGE_DELETE else item.to_dict()
+        with self._lock:
+            self._file.write(_dumps({"op": op, "data": data}))
+            self._file.flush()
+            self._unsynced += 1
+            self._entries += 1
+            if self.sync_every and self._unsynced >= self.sync_every:
+                self._sync()
+            if self.compact_every and self._entries >= self.compact_every:
+                self._start_compaction()
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def sync(self) -> None:
+        """Принудительный fsync всех записанных изменений."""
+        with self._lock:
+            self._file.flush()
+            self._sync()
+
+    def _start_compaction(self) -> None:
+        """Переключение на новый файл журнала и запуск фонового сжатия.
+
+        Вызывается под self._lock.
+        """
+        if self._compaction is not None and self._compaction.is_alive():
+            return
+        self._sync()
+        self._file.close()
+        os.replace(self.filename, self.old_filename)
+        self._file = open(self.filename, mode="a", encoding="utf-8")
+        self._entries = 0
+        self._compaction = threading.Thread(target=self._merge_old, daemon=True)
+        self._compaction.start()
+
+    def compact(self) -> None:
+        """Синхронное сжатие журнала в снимок."""
+        with self._lock:
+            self._start_compaction()
+            compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def _merge_old(self) -> None:
+        """Слияние снимка с filename.old в новый снимок."""
+        items: Dict[str, dict] = {
+            data["id"]: data for data in _read_lines(self.snapshot_filename)
+        }
+        for entry in _read_lines(self.old_filename):
+            data = entry["data"]
+            if entry["op"] == CHANGE_DELETE:
+                items.pop(data["id"], None)
+            else:
+                items[data["id"]] = data
+        self._write_snapshot(items.values())
+        os.remove(self.old_filename)
+
+    def _write_snapshot(self, items: Iterable[dict]) -> None:
+        temporary = self.snapshot_filename + ".tmp"
+        with open(temporary, mode="w", encoding="utf-8") as file:
+            for data in items:
+                file.write(_dumps(data))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, self.snapshot_filename)
+
+    def close(self) -> None:
+        """Отписка от сервиса, fsync и ожидание фонового сжатия."""
+        self.service.unsubscribe(self._on_change)
+        with self._lock:
+            self._file.flush()
+            self._sync()
+            self._file.close()
+            compaction = self._compaction
+        if compaction is not None:
+            compaction.join()
+
+    def __enter__(self) -> "Journal":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -1,15 +1,93 @@
 import uuid
 import csv
 import json
-from typing import List, Optional
+import math
+import re
+import struct
+import time
+from typing import (
+    TYPE_CHECKING,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from indexes import (
+    CHANGE_ADD,
+    CHANGE_DELETE,
+    CHANGE_REPLACE,
+    MERGE_OVERWRITE,
+    ChangeEmitter,
+    IndexedCollection,
+    parse_id,
+    should_replace,
+)
+
+if TYPE_CHECKING:
+    from note_bodies import NoteBodyStore
+
+ARCHIVE_MAGIC = b"PANOTEA2"
+BLOCK_LENGTH = struct.Struct("<I")
+# Длина начала текста в списке заметок и число заметок на странице
+PREVIEW_LENGTH = 60
+PAGE_SIZE = 20
 
 
 class Note:
-    def __init__(self, title: str, content: str, timestamp: str) -> None:
-        self.id = uuid.uuid4()
+    def __init__(
+        self,
+        title: str,
+        content: str,
+        timestamp: str,
+        id: Optional[uuid.UUID] = None,
+        updated_at: Optional[float] = None,
+    ) -> None:
+        self.id = id or uuid.uuid4()
         self.title = title
         self.content = content
         self.timestamp = timestamp
+        self.updated_at = time.time() if updated_at is None else updated_at
+
+    @property
+    def content(self) -> str:
+        """Текст заметки; при хранении на диске читается по требованию."""
+        if self._body_store is not None:
+            return self._body_store.get(self.id)
+        return self._content
+
+    @content.setter
+    def content(self, value: str) -> None:
+        self._content = value
+        self._body_store = None
+
+    def _move_body_to(self, body_store: "NoteBodyStore") -> None:
+        """Перенос текста заметки в хранилище на диске."""
+        metadata = (self.title, self.timestamp, self.updated_at)
+        body_store.put(self.id, self.content, metadata)
+        self._content = None
+        self._body_store = body_store
+
+    @classmethod
+    def from_store(
+        cls, body_store: "NoteBodyStore", note_id: uuid.UUID, metadata: tuple
+    ) -> "Note":
+        """Заметка, текст которой уже лежит в хранилище на диске."""
+        title, timestamp, updated_at = metadata
+        note = cls(title, "", timestamp, id=note_id, updated_at=updated_at)
+        note._content = None
+        note._body_store = body_store
+        return note
+
+    def preview(self, length: int = PREVIEW_LENGTH) -> str:
+        """Начало текста заметки в одну строку для списков."""
+        text = " ".join(self.content.split())
+        if len(text) <= length:
+            return text
+        return text[: length - 1] + "…"
 
     def to_dict(self) -> dict:
         return {
@@ -17,43 +95,352 @@ class Note:
             "title": self.title,
             "content": self.content,
             "timestamp": self.timestamp,
+            "updated_at": self.updated_at,
         }
 
+    @classmethod
+    def from_dict(cls, data: dict) -> "Note":
+        """Создание заметки из словаря с сохранением id, если он есть."""
+        return cls(
+            title=data["title"],
+            content=data["content"],
+            timestamp=data["timestamp"],
+            id=parse_id(data.get("id")),
+            updated_at=data.get("updated_at"),
+        )
+
+    def same_data(self, other: "Note") -> bool:
+        """Совпадают ли данные заметок (без id и времени изменения).
+
+        Текст сравнивается последним: у заметки в хранилище он читается
+        с диска.
+        """
+        return (
+            self.title == other.title
+            and self.timestamp == other.timestamp
+            and self.content == other.content
+        )
+
+
+def _note_from_row(row: List[str]) -> Note:
+    """Создание заметки из строки CSV (Id, Title, Content, Timestamp)."""
+    id_str, title, content, timestamp = row[:4]
+    return Note(title=title, content=content, timestamp=timestamp)
+
+
+_WORD = re.compile(r"\w+")
+_PHRASE = re.compile(r'"([^"]*)"')
+
+
+def tokenize(text: str) -> List[str]:
+    """Разбиение текста на слова без учета регистра (кириллица и латиница)."""
+    return _WORD.findall(text.casefold().replace("ё", "е"))
+
+
+class NoteSearchIndex:
+    """Инвертированный индекс заметок с позициями слов и ранжированием BM25.
+
+    Название и содержимое индексируются отдельно; при ранжировании
+    вхождения в название весят title_boost раз больше (упрощенный BM25F).
+    Позиции всех слов хранятся в памяти, и для текстов это несколько
+    размеров самих текстов; с index_content=False индексируются только
+    названия, и поиск идет только по ним.
+    """
+
+    FIELDS = ("title", "content")
+
+    def __init__(
+        self,
+        title_boost: float = 3.0,
+        k1: float = 1.2,
+        b: float = 0.75,
+        index_content: bool = True,
+    ) -> None:
+        self.title_boost = title_boost
+        self.index_content = index_content
+        self.k1 = k1
+        self.b = b
+        # поле -> слово -> id заметки -> позиции слова в поле
+        self._postings: Dict[str, Dict[str, Dict[uuid.UUID, List[int]]]] = {
+            field: {} for field in self.FIELDS
+        }
+        self._lengths: Dict[uuid.UUID, Tuple[int, int]] = {}
+        self._terms: Dict[uuid.UUID, Set[str]] = {}
+        # слово -> число заметок, где оно есть в заголовке или тексте
+        self._document_counts: Dict[str, int] = {}
+        self._total_title = 0
+        self._total_content = 0
+
+    def add(self, note: Note) -> None:
+        title_tokens = tokenize(note.title)
+        content_tokens = tokenize(note.content) if self.index_content else []
+        note_id = note.id
+        for field, tokens in zip(self.FIELDS, (title_tokens, content_tokens)):
+            # позиции сначала собираются по словам заметки, чтобы id
+            # хешировался один раз на слово, а не на каждое вхождение
+            positions: Dict[str, List[int]] = {}
+            for position, token in enumerate(tokens):
+                positions.setdefault(token, []).append(position)
+            postings = self._postings[field]
+            for token, token_positions in positions.items():
+                postings.setdefault(token, {})[note_id] = token_positions
+        self._lengths[note.id] = (len(title_tokens), len(content_tokens))
+        terms = self._terms[note.id] = set(title_tokens) | set(content_tokens)
+        document_counts = self._document_counts
+        for term in terms:
+            document_counts[term] = document_counts.get(term, 0) + 1
+        self._total_title += len(title_tokens)
+        self._total_content += len(content_tokens)
+
+    def remove(self, note_id: uuid.UUID) -> None:
+        terms = self._terms.pop(note_id, None)
+        if terms is None:
+            return
+        document_counts = self._document_counts
+        for term in terms:
+            if document_counts[term] == 1:
+                del document_counts[term]
+            else:
+                document_counts[term] -= 1
+        for field in self.FIELDS:
+            postings = self._postings[field]
+            for term in terms:
+                notes = postings.get(term)
+                if notes is not None and notes.pop(note_id, None) is not None:
+                    if not notes:
+                        del postings[term]
+        title_length, content_length = self._lengths.pop(note_id)
+        self._total_title -= title_length
+        self._total_content -= content_length
+
+    def _has_term(self, note_id: uuid.UUID, term: str) -> bool:
+        return any(
+            note_id in self._postings[field].get(term, ()) for field in self.FIELDS
+        )
+
+    def _has_phrase(self, note_id: uuid.UUID, phrase: List[str]) -> bool:
+        for field in self.FIELDS:
+            postings = self._postings[field]
+            positions = [postings.get(term, {}).get(note_id) for term in phrase]
+            if not all(positions):
+                continue
+            following = [set(term_positions) for term_positions in positions[1:]]
+            for start in positions[0]:
+                if all(
+                    start + offset in term_positions
+                    for offset, term_positions in enumerate(following, 1)
+                ):
+                    return True
+        return False
 
-class NoteService:
-    def __init__(self) -> None:
-        self.notes: List[Note] = []
+    def _idf(self, term: str) -> float:
+        count = len(self._lengths)
+        document_frequency = self._document_counts.get(term, 0)
+        return math.log(
+            1 + (count - document_frequency + 0.5) / (document_frequency + 0.5)
+        )
+
+    def _score(
+        self, note_id: uuid.UUID, idfs: Dict[str, float], average: float
+    ) -> float:
+        boost = self.title_boost
+        title_length, content_length = self._lengths[note_id]
+        length = boost * title_length + content_length
+        norm = self.k1 * (1 - self.b + self.b * length / average)
+        score = 0.0
+        for term, idf in idfs.items():
+            frequency = boost * len(
+                self._postings["title"].get(term, {}).get(note_id, ())
+            ) + len(self._postings["content"].get(term, {}).get(note_id, ()))
+            if frequency:
+                score += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return score
+
+    def search(self, query: str, limit: int = 10) -> List[Tuple[float, uuid.UUID]]:
+        """Поиск заметок, содержащих все слова и фразы запроса.
+
+        Фразы задаются в двойных кавычках. Возвращает пары (оценка, id)
+        от наиболее релевантных к наименее релевантным.
+        """
+        phrases = [tokenize(phrase) for phrase in _PHRASE.findall(query)]
+        phrases = [phrase for phrase in phrases if phrase]
+        terms = set(tokenize(_PHRASE.sub(" ", query)))
+        for phrase in phrases:
+            terms.update(phrase)
+        if not terms:
+            return []
+
+        # Кандидаты - заметки самого редкого слова, остальные слова
+        # проверяются по спискам вхождений без построения множеств
+        document_counts = self._document_counts
+        rarest, *others = sorted(terms, key=lambda term: document_counts.get(term, 0))
+        if rarest not in document_counts:
+            return []
+        candidates = set(self._postings["title"].get(rarest, ())).union(
+            self._postings["content"].get(rarest, ())
+        )
+        for term in others:
+            candidates = {
+                note_id for note_id in candidates if self._has_term(note_id, term)
+            }
+            if not candidates:
+                return []
+
+        # idf и средняя длина считаются один раз на запрос
+        idfs = {term: self._idf(term) for term in terms}
+        boost = self.title_boost
+        count = len(self._lengths)
+        average = (boost * self._total_title + self._total_content) / count or 1.0
+        results = [
+            (self._score(note_id, idfs, average), note_id)
+            for note_id in candidates
+            if all(self._has_phrase(note_id, phrase) for phrase in phrases)
+        ]
+        results.sort(key=lambda result: result[0], reverse=True)
+        return results[:limit]
+
+
+class NoteService(ChangeEmitter):
+    def __init__(
+        self,
+        body_store: Optional["NoteBodyStore"] = None,
+        index_content: Optional[bool] = None,
+    ) -> None:
+        super().__init__()
+        # С body_store в памяти остаются только метаданные заметок,
+        # а тексты читаются с диска по требованию. Заметки, уже сохраненные
+        # в body_store, загружаются из него. Поисковый индекс по текстам
+        # держит позиции всех слов в памяти, а его построение при открытии
+        # хранилища читает все тексты с диска. Поэтому по умолчанию
+        # (index_content=None) тексты индексируются только без body_store,
+        # а с ним поиск идет по названиям; index_content=True включает
+        # индекс по текстам и для хранилища
+        if index_content is None:
+            index_content = body_store is None
+        self.notes = IndexedCollection()
+        self.body_store = body_store
+        self._search_index = NoteSearchIndex(index_content=index_content)
+        # Поисковый индекс не построен после пакетной загрузки в пустой
+        # сервис (upsert_notes); его строит _ensure_search_index
+        self._deferred_index = False
+        if body_store is not None:
+            for note_id, metadata in body_store.items():
+                note = Note.from_store(body_store, note_id, metadata)
+                self.notes.add(note)
+                self._search_index.add(note)
+
+    def _store_body(self, note: Note) -> None:
+        if self.body_store is not None:
+            note._move_body_to(self.body_store)
+
+    def _ensure_search_index(self) -> None:
+        """Построение поискового индекса, отложенного пакетной загрузкой."""
+        if not self._deferred_index:
+            return
+        self._deferred_index = False
+        for note in self.notes:
+            self._search_index.add(note)
 
     def add_note(self, note: Note) -> None:
         """Добавление новой заметки."""
-        self.notes.append(note)
+        self._ensure_search_index()
+        self.notes.add(note)
+        self._search_index.add(note)
+        self._store_body(note)
+        self._emit(CHANGE_ADD, note)
 
     def get_all_notes(self) -> List[Note]:
         """Получение всех заметок."""
-        return self.notes
+        return list(self.notes)
 
     def get_note_by_id(self, id: uuid.UUID) -> Optional[Note]:
         """Получение заметки по ID."""
-        for note in self.notes:
-            if note.id == id:
-                return note
-        return None
+        return self.notes.get(id)
 
     def replace_note_by_id(self, id: uuid.UUID, new_note: Note) -> bool:
-        """Замена заметки по ID."""
-        for i, note in enumerate(self.notes):
-            if note.id == id:
-                self.notes[i] = new_note
-                return True
-        return False
+        """Замена заметки по ID, заметка сохраняет прежний ID."""
+        self._ensure_search_index()
+        if not self.notes.replace(id, new_note):
+            return False
+        self._search_index.remove(id)
+        self._search_index.add(new_note)
+        self._store_body(new_note)
+        self._emit(CHANGE_REPLACE, new_note)
+        return True
+
+    def upsert_note(self, note: Note, policy: str = MERGE_OVERWRITE) -> bool:
+        """Добавление заметки или замена заметки с тем же ID.
+
+        Возвращает True, если заметка добавлена или заменена.
+        """
+        existing = self.notes.get(note.id)
+        if existing is None:
+            self.add_note(note)
+            return True
+        if not should_replace(existing, note, policy):
+            return False
+        return self.replace_note_by_id(note.id, note)
+
+    def upsert_notes(self, notes: Iterable[Note], policy: str = MERGE_OVERWRITE) -> int:
+        """Пакетный upsert_note для загрузки больших архивов.
+
+        В пустой сервис заметки только складываются (и пишутся в body_store),
+        а поисковый индекс строится одним проходом при первом поиске или
+        изменении. Иначе заметки сливаются по одной. Возвращает число
+        добавленных или замененных заметок.
+        """
+        if self.notes:
+            return sum(self.upsert_note(note, policy) for note in notes)
+        changed = 0
+        for note in notes:
+            existing = self.notes.get(note.id)
+            if existing is None:
+                self.notes.add(note)
+                op = CHANGE_ADD
+            elif should_replace(existing, note, policy):
+                self.notes.replace(note.id, note)
+                op = CHANGE_REPLACE
+            else:
+                continue
+            self._store_body(note)
+            self._deferred_index = True
+            self._emit(op, note)
+            changed += 1
+        return changed
 
     def delete_note_by_id(self, id: uuid.UUID) -> bool:
         """Удаление заметки по ID."""
-        for i, note in enumerate(self.notes):
-            if note.id == id:
-                self.notes.pop(i)
-                return True
-        return False
+        self._ensure_search_index()
+        note = self.notes.remove(id)
+        if note is None:
+            return False
+        self._search_index.remove(id)
+        if self.body_store is not None:
+            self.body_store.discard(id)
+        self._emit(CHANGE_DELETE, note)
+        return True
+
+    def iter_items(self) -> Iterator[Note]:
+        """Обход всех заметок (для снимков журнала)."""
+        return iter(self.notes)
+
+    def apply_change(self, op: str, data: dict) -> None:
+        """Применение изменения из журнала: добавление или удаление по ID."""
+        if op == CHANGE_DELETE:
+            self.delete_note_by_id(uuid.UUID(data["id"]))
+        else:
+            self.upsert_note(Note.from_dict(data))
+
+    def search_notes(self, query: str, limit: int = 10) -> List[Note]:
+        """Полнотекстовый поиск заметок по названию и содержимому.
+
+        Слова в двойных кавычках ищутся как фраза.
+        """
+        self._ensure_search_index()
+        return [
+            self.notes.get(note_id)
+            for _, note_id in self._search_index.search(query, limit)
+        ]
 
     def export_as_csv(self, filename: str = "notes.csv") -> None:
         """Экспорт всех заметок в CSV файл."""
@@ -74,9 +461,7 @@ class NoteService:
                 for row in reader:
                     if len(row) < 4:
                         continue
-                    id_str, title, content, timestamp = row
-                    note = Note(title=title, content=content, timestamp=timestamp)
-                    self.add_note(note)
+                    self.add_note(_note_from_row(row))
         except FileNotFoundError:
             print(f"Файл {filename} не найден.")
 
@@ -90,18 +475,67 @@ class NoteService:
                 indent=4,
             )
 
-    def import_json(self, filename: str = "notes.json") -> None:
-        """Загрузка заметок из JSON файла."""
+    def import_json(
+        self, filename: str = "notes.json", policy: str = MERGE_OVERWRITE
+    ) -> None:
+        """Загрузка заметок из JSON файла с обновлением заметок по ID."""
         try:
             with open(filename, mode="r", encoding="utf-8") as file:
                 notes_data = json.load(file)
-                for data in notes_data:
-                    note = Note(
-                        title=data["title"],
-                        content=data["content"],
-                        timestamp=data["timestamp"],
-                    )
-                    self.add_note(note)
+                self.upsert_notes((Note.from_dict(data) for data in notes_data), policy)
+        except FileNotFoundError:
+            print(f"Файл {filename} не найден.")
+
+    def export_as_compressed(
+        self,
+        filename: str = "notes.pack",
+        method: str = "zlib",
+        use_dictionary: bool = True,
+    ) -> None:
+        """Сохранение заметок в сжатый архив, каждая заметка — отдельный блок.
+
+        При use_dictionary для zlib сначала обучается общий словарь
+        на текстах заметок, что сильно улучшает сжатие коротких блоков.
+        """
+        from compression import METHOD_ZLIB, BlockCodec, train_dictionary
+
+        dictionary = b""
+        if use_dictionary and method == METHOD_ZLIB:
+            dictionary = train_dictionary(
+                note.title + " " + note.content for note in self.notes
+            )
+        codec = BlockCodec(method, dictionary=dictionary)
+        with open(filename, mode="wb") as file:
+            file.write(ARCHIVE_MAGIC + codec.header())
+            for note in self.notes:
+                block = codec.compress(
+                    json.dumps(note.to_dict(), ensure_ascii=False).encode("utf-8")
+                )
+                file.write(BLOCK_LENGTH.pack(len(block)))
+                file.write(block)
+
+    def import_compressed(
+        self, filename: str = "notes.pack", policy: str = MERGE_OVERWRITE
+    ) -> None:
+        """Загрузка заметок из сжатого архива с обновлением заметок по ID."""
+        from compression import BlockCodec
+
+        try:
+            with open(filename, mode="rb") as file:
+                if file.read(len(ARCHIVE_MAGIC)) != ARCHIVE_MAGIC:
+                    raise ValueError(f"Файл {filename} не является архивом заметок")
+                codec = BlockCodec.read_header(file)
+
+                def notes() -> Iterator[Note]:
+                    while True:
+                        length_bytes = file.read(BLOCK_LENGTH.size)
+                        if not length_bytes:
+                            return
+                        (length,) = BLOCK_LENGTH.unpack(length_bytes)
+                        data = json.loads(codec.decompress(file.read(length)))
+                        yield Note.from_dict(data)
+
+                self.upsert_notes(notes(), policy)
         except FileNotFoundError:
             print(f"Файл {filename} не найден.")
 
@@ -110,6 +544,22 @@ class NoteController:
     def __init__(self, note_service: NoteService) -> None:
         self.note_service = note_service
 
+    @staticmethod
+    def _print_pages(notes: List[Note]) -> None:
+        """Вывод заметок страницами по PAGE_SIZE.
+
+        Вместо полного текста печатается начало заметки; тексты
+        из хранилища на диске читаются только для показанной страницы.
+        """
+        for start in range(0, len(notes), PAGE_SIZE):
+            if start and input("Enter — дальше, q — выход: ").strip() == "q":
+                break
+            for note in notes[start : start + PAGE_SIZE]:
+                print(
+                    f"ID: {note.id}, Название: {note.title}, "
+                    f"Начало: {note.preview()}, Время: {note.timestamp}"
+                )
+
     def handle_choice(self):
         while True:
             print(
@@ -123,6 +573,7 @@ class NoteController:
 7. Импортировать заметки из CSV
 8. Сохранить заметки в JSON
 9. Загрузить заметки из JSON
+10. Найти заметки по тексту
 0. Выход
 """
             )
@@ -141,10 +592,7 @@ class NoteController:
                 if not notes:
                     print("Нет доступных заметок.")
                 else:
-                    for note in notes:
-                        print(
-                            f"ID: {note.id}, Название: {note.title}, Контент: {note.content}, Время: {note.timestamp}"
-                        )
+                    self._print_pages(notes)
 
             elif choice == "3":
                 note_id = input("Введите ID заметки: ")
@@ -224,6 +672,17 @@ class NoteController:
                 self.note_service.import_json(file_name)
                 print(f"Заметки загружены из файла {file_name}.")
 
+            elif choice == "10":
+                query = input("Введите слова для поиска (фразу — в кавычках): ")
+                found_notes = self.note_service.search_notes(query)
+                if not found_notes:
+                    print("Заметки не найдены.")
+                else:
+                    for note in found_notes:
+                        print(
+                            f"ID: {note.id}, Название: {note.title}, Время: {note.timestamp}"
+                        )
+
             elif choice == "0":
                 print("Выход из программы.")
                 break
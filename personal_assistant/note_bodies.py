@@ -0,0 +1,246 @@
+import json
+import os
+import struct
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterator, Optional, Tuple
+
+from compression import METHOD_NONE, BlockCodec
+
+MAGIC = b"PANOTES2"
+# id заметки, длина метаданных и длина текста; длина _DELETED - удаление
+ENTRY_HEADER = struct.Struct("<16sII")
+_DELETED = 0xFFFFFFFF
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+INDEX_SUFFIX = ".index"
+
+# Метаданные заметки, которые хранятся рядом с текстом: название, дата
+# и время изменения
+Metadata = Tuple[str, str, float]
+
+
+class NoteBodyStore:
+    """Файл текстов заметок с дозаписью в конец и LRU-кешем.
+
+    Файл начинается с описания кодека сжатия, дальше идут записи:
+    заголовок (id, длины), метаданные заметки в JSON и текст в UTF-8,
+    сжатый кодеком отдельно от других. Новая версия дописывается в конец;
+    неизмененный текст с теми же метаданными повторно не пишется.
+    Индекс смещений и метаданные хранятся в памяти, а при close и compact
+    сохраняются в файл filename + INDEX_SUFFIX: при открытии читается он
+    и только записи, дописанные после него. Без индекса (например, после
+    сбоя) смещения восстанавливаются чтением заголовков всего файла.
+    Кодек нового файла задается параметром codec, существующего — читается
+    из файла.
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        cache_bytes: int = DEFAULT_CACHE_BYTES,
+        codec: Optional[BlockCodec] = None,
+    ) -> None:
+        self.filename = filename
+        self.cache_bytes = cache_bytes
+        self._file = open(filename, "a+b")
+        if os.fstat(self._file.fileno()).st_size == 0:
+            self._remove_index()
+            self.codec = codec or BlockCodec(METHOD_NONE)
+            self._file.write(MAGIC + self.codec.header())
+            self._file.flush()
+        else:
+            self._file.seek(0)
+            if self._file.read(len(MAGIC)) != MAGIC:
+                self._file.close()
+                raise ValueError(f"Файл {filename} не является хранилищем заметок")
+            self.codec = BlockCodec.read_header(self._file)
+        self._data_start = self._file.tell()
+        # id -> (смещение текста, длина текста, метаданные)
+        self._offsets: Dict[uuid.UUID, Tuple[int, int, Metadata]] = {}
+        # байты устаревших версий и удалений, которые уберет compact
+        self.garbage_bytes = 0
+        # id -> (текст, размер в байтах)
+        self._cache: "OrderedDict[uuid.UUID, Tuple[str, int]]" = OrderedDict()
+        self._cached_bytes = 0
+        self._load_offsets(self._load_index())
+
+    def _load_index(self) -> int:
+        """Чтение сохраненного индекса.
+
+        Возвращает позицию первой записи, которой нет в индексе.
+        """
+        size = os.fstat(self._file.fileno()).st_size
+        try:
+            with open(self.filename + INDEX_SUFFIX, encoding="utf-8") as file:
+                index = json.load(file)
+        except (OSError, ValueError):
+            return self._data_start
+        if not self._data_start <= index["size"] <= size:
+            return self._data_start
+        for note_id, offset, length, title, timestamp, updated_at in index["notes"]:
+            self._offsets[uuid.UUID(note_id)] = (
+                offset,
+                length,
+                (title, timestamp, updated_at),
+            )
+        self.garbage_bytes = index["garbage"]
+        return index["size"]
+
+    def _load_offsets(self, position: int) -> None:
+        """Восстановление индекса смещений по заголовкам записей."""
+        size = os.fstat(self._file.fileno()).st_size
+        while position + ENTRY_HEADER.size <= size:
+            self._file.seek(position)
+            raw_id, meta_length, length = ENTRY_HEADER.unpack(
+                self._file.read(ENTRY_HEADER.size)
+            )
+            note_id = uuid.UUID(bytes=raw_id)
+            position += ENTRY_HEADER.size
+            previous = self._offsets.get(note_id)
+            if previous is not None:
+                self.garbage_bytes += self._entry_size(previous)
+            if length == _DELETED:
+                self._offsets.pop(note_id, None)
+                self.garbage_bytes += ENTRY_HEADER.size
+                continue
+            metadata = tuple(json.loads(self._file.read(meta_length)))
+            position += meta_length
+            self._offsets[note_id] = (position, length, metadata)
+            position += length
+
+    @staticmethod
+    def _entry_size(entry: Tuple[int, int, Metadata]) -> int:
+        _, length, metadata = entry
+        return ENTRY_HEADER.size + len(_encode_metadata(metadata)) + length
+
+    def __contains__(self, note_id: uuid.UUID) -> bool:
+        return note_id in self._offsets
+
+    def __len__(self) -> int:
+        return len(self._offsets)
+
+    def close(self) -> None:
+        """Сохранение индекса и закрытие файла."""
+        self._save_index()
+        self._file.close()
+
+    def items(self) -> Iterator[Tuple[uuid.UUID, Metadata]]:
+        """Пары (id, метаданные) в порядке добавления; тексты не читаются."""
+        for note_id, (_, _, metadata) in self._offsets.items():
+            yield note_id, metadata
+
+    def put(self, note_id: uuid.UUID, content: str, metadata: Metadata) -> None:
+        """Запись новой версии текста и метаданных заметки.
+
+        Если текст и метаданные не изменились, файл не растет.
+        """
+        data = self.codec.compress(content.encode("utf-8"))
+        previous = self._offsets.get(note_id)
+        if previous is not None and previous[1:] == (len(data), metadata):
+            self._file.seek(previous[0])
+            if self._file.read(previous[1]) == data:
+                return
+        encoded_metadata = _encode_metadata(metadata)
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(
+            ENTRY_HEADER.pack(note_id.bytes, len(encoded_metadata), len(data))
+        )
+        self._file.write(encoded_metadata)
+        if previous is not None:
+            self.garbage_bytes += self._entry_size(previous)
+        self._offsets[note_id] = (self._file.tell(), len(data), metadata)
+        self._file.write(data)
+        self._file.flush()
+        self._forget(note_id)
+
+    def discard(self, note_id: uuid.UUID) -> None:
+        """Удаление текста заметки."""
+        previous = self._offsets.pop(note_id, None)
+        if previous is None:
+            return
+        self.garbage_bytes += self._entry_size(previous) + ENTRY_HEADER.size
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(ENTRY_HEADER.pack(note_id.bytes, 0, _DELETED))
+        self._file.flush()
+        self._forget(note_id)
+
+    def get(self, note_id: uuid.UUID) -> str:
+        """Текст заметки: из кеша или с диска."""
+        cached = self._cache.get(note_id)
+        if cached is not None:
+            self._cache.move_to_end(note_id)
+            return cached[0]
+        offset, length, _ = self._offsets[note_id]
+        self._file.seek(offset)
+        raw = self.codec.decompress(self._file.read(length))
+        content = raw.decode("utf-8")
+        self._remember(note_id, content, len(raw))
+        return content
+
+    def compact(self) -> None:
+        """Перезапись файла только с актуальными версиями текстов.
+
+        Сжатые тексты копируются без перепаковки; порядок заметок
+        сохраняется. Новый файл заменяет старый атомарно.
+        """
+        temporary = self.filename + ".tmp"
+        offsets: Dict[uuid.UUID, Tuple[int, int, Metadata]] = {}
+        with open(temporary, "wb") as target:
+            target.write(MAGIC + self.codec.header())
+            for note_id, (offset, length, metadata) in self._offsets.items():
+                self._file.seek(offset)
+                data = self._file.read(length)
+                encoded_metadata = _encode_metadata(metadata)
+                target.write(
+                    ENTRY_HEADER.pack(note_id.bytes, len(encoded_metadata), length)
+                )
+                target.write(encoded_metadata)
+                offsets[note_id] = (target.tell(), length, metadata)
+                target.write(data)
+        self._file.close()
+        # Старый индекс не подходит к новому файлу, даже если сбой случится
+        # до записи нового
+        self._remove_index()
+        os.replace(temporary, self.filename)
+        self._file = open(self.filename, "a+b")
+        self._offsets = offsets
+        self.garbage_bytes = 0
+        self._save_index()
+
+    def _save_index(self) -> None:
+        index = {
+            "size": os.fstat(self._file.fileno()).st_size,
+            "garbage": self.garbage_bytes,
+            "notes": [
+                [str(note_id), offset, length, *metadata]
+                for note_id, (offset, length, metadata) in self._offsets.items()
+            ],
+        }
+        temporary = self.filename + INDEX_SUFFIX + ".tmp"
+        with open(temporary, "w", encoding="utf-8") as file:
+            json.dump(index, file, ensure_ascii=False)
+        os.replace(temporary, self.filename + INDEX_SUFFIX)
+
+    def _remove_index(self) -> None:
+        try:
+            os.remove(self.filename + INDEX_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    def _remember(self, note_id: uuid.UUID, content: str, size: int) -> None:
+        if size > self.cache_bytes:
+            return
+        self._cache[note_id] = (content, size)
+        self._cached_bytes += size
+        while self._cached_bytes > self.cache_bytes:
+            _, (_, evicted_size) = self._cache.popitem(last=False)
+            self._cached_bytes -= evicted_size
+
+    def _forget(self, note_id: uuid.UUID) -> None:
+        cached = self._cache.pop(note_id, None)
+        if cached is not None:
+            self._cached_bytes -= cached[1]
+
+
+def _encode_metadata(metadata: Metadata) -> bytes:
+    return json.dumps(metadata, ensure_ascii=False).encode("utf-8")
@@ -0,0 +1,169 @@
+import csv
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+from typing import Any, Callable, List, Optional, Tuple
+
+from contact import ContactService, _contact_from_row
+from finance_record import FinanceService, _record_from_row
+from note import NoteService, _note_from_row
+from task import TaskService, _task_from_row
+
+_BLOCK_SIZE = 1 << 20
+_QUOTE = b'"'
+_NEWLINE = b"\n"
+
+
+def _target(service: Any) -> Tuple[Callable[[List[str]], Any], int, Callable]:
+    """Функция разбора строки, число столбцов и пакетный метод слияния."""
+    if isinstance(service, ContactService):
+        return _contact_from_row, 4, service.upsert_contacts
+    if isinstance(service, NoteService):
+        return _note_from_row, 4, service.upsert_notes
+    if isinstance(service, TaskService):
+        return _task_from_row, 6, service.upsert_tasks
+    if isinstance(service, FinanceService):
+        return _record_from_row, 5, service.upsert_records
+    raise TypeError(f"Параллельный импорт не поддерживается для {type(service)}")
+
+
+def _next_record_end(file, position: int, quotes: int) -> Tuple[int, int]:
+    """Позиция сразу после ближайшего перевода строки вне кавычек.
+
+    quotes — число кавычек от начала текущей записи до position.
+    Возвращает найденную позицию и число кавычек до нее.
+    """
+    file.seek(position)
+    while True:
+        block = file.read(_BLOCK_SIZE)
+        if not block:
+            return position, quotes
+        start = 0
+        while True:
+            newline = block.find(_NEWLINE, start)
+            if newline < 0:
+                break
+            quotes += block.count(_QUOTE, start, newline)
+            if quotes % 2 == 0:
+                return position + newline + 1, quotes
+            start = newline + 1
+        quotes += block.count(_QUOTE, start)
+        position += len(block)
+
+
+def _count_quotes(file, start: int, end: int) -> int:
+    file.seek(start)
+    quotes = 0
+    remaining = end - start
+    while remaining > 0:
+        block = file.read(min(_BLOCK_SIZE, remaining))
+        if not block:
+            break
+        quotes += block.count(_QUOTE)
+        remaining -= len(block)
+    return quotes
+
+
+def split_csv_ranges(filename: str, parts: int) -> List[Tuple[int, int]]:
+    """Разбиение CSV файла (без заголовка) на диапазоны байт по границам записей.
+
+    Граница ставится только после перевода строки, перед которым в записи
+    четное число кавычек, поэтому переводы строк внутри кавычек не режут запись.
+    """
+    size = os.path.getsize(filename)
+    with open(filename, "rb") as file:
+        header_end, _ = _next_record_end(file, 0, 0)
+        boundaries = [header_end]
+        position, quotes = header_end, 0
+        for part in range(1, parts):
+            target = header_end + (size - header_end) * part // parts
+            if target <= boundaries[-1]:
+                continue
+            quotes = (quotes + _count_quotes(file, position, target)) % 2
+            position, _ = _next_record_end(file, target, quotes)
+            if position >= size:
+                break
+            boundaries.append(position)
+            quotes = 0
+        boundaries.append(size)
+    return [
+        (start, end) for start, end in zip(boundaries, boundaries[1:]) if end > start
+    ]
+
+
+def _parse_range(
+    filename: str,
+    start: int,
+    end: int,
+    convert: Callable[[List[str]], Any],
+    min_columns: int,
+) -> Tuple[List[Any], List[Tuple[int, str]], int]:
+    """Разбор диапазона байт в отдельном процессе.
+
+    Возвращает объекты, ошибки (номер строки в диапазоне, причина)
+    и число строк в диапазоне.
+    """
+    with open(filename, "rb") as file:
+        file.seek(start)
+        data = file.read(end - start)
+    reader = csv.reader(io.StringIO(data.decode("utf-8"), newline=""))
+    items: List[Any] = []
+    errors: List[Tuple[int, str]] = []
+    next_line = 1
+    for row in reader:
+        line, next_line = next_line, reader.line_num + 1
+        if len(row) < min_columns:
+            continue
+        try:
+            items.append(convert(row))
+        except ValueError as error:
+            errors.append((line, str(error)))
+    return items, errors, data.count(_NEWLINE)
+
+
+def parallel_import_csv(
+    service: Any, filename: str, workers: Optional[int] = None
+) -> int:
+    """Параллельный импорт CSV файла в сервис.
+
+    Файл делится на диапазоны, которые разбираются в ProcessPoolExecutor;
+    результаты сливаются в сервис по ID в порядке строк файла одним вызовом
+    пакетного метода сервиса (upsert_contacts, upsert_records и т. д.).
+    Если хотя бы одна строка некорректна, бросается ValueError и сервис
+    не изменяется.
+    Возвращает число импортированных объектов.
+    """
+    convert, min_columns, merge = _target(service)
+    workers = workers or os.cpu_count() or 1
+    ranges = split_csv_ranges(filename, workers)
+
+    if workers == 1 or len(ranges) <= 1:
+        results = [
+            _parse_range(filename, start, end, convert, min_columns)
+            for start, end in ranges
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    _parse_range,
+                    [filename] * len(ranges),
+                    [start for start, _ in ranges],
+                    [end for _, end in ranges],
+                    [convert] * len(ranges),
+                    [min_columns] * len(ranges),
+                )
+            )
+
+    with open(filename, "rb") as file:
+        header_lines = file.read(ranges[0][0] if ranges else 0).count(_NEWLINE)
+    lines_before = header_lines
+    for _, errors, line_count in results:
+        if errors:
+            line, reason = errors[0]
+            raise ValueError(f"Строка {lines_before + line}: {reason}")
+        lines_before += line_count
+
+    merge(chain.from_iterable(items for items, _, _ in results))
+    return sum(len(items) for items, _, _ in results)
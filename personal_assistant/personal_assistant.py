@@ -1,20 +1,18 @@
-from note import NoteService, NoteController
-from task import TaskService, TaskController
-from contact import ContactController, ContactService
-from finance_record import FinanceController, FinanceService
-from calculator import calculate
+import sys
+from functools import lru_cache
+from importlib import import_module
 
-note_service = NoteService()
-note_controller = NoteController(note_service)
+# Сервисы и контроллеры создаются при первом обращении: модули разделов
+# импортируются только тогда, когда раздел действительно нужен
+_SECTIONS = {
+    "note": ("note", "NoteService", "NoteController"),
+    "task": ("task", "TaskService", "TaskController"),
+    "contact": ("contact", "ContactService", "ContactController"),
+    "finance": ("finance_record", "FinanceService", "FinanceController"),
+}
 
-task_service = TaskService()
-task_controller = TaskController(task_service)
-
-contact_service = ContactService()
-contact_controller = ContactController(contact_service)
-
-finance_service = FinanceService()
-finance_controller = FinanceController(finance_service)
+# Допустимое время от запуска до первого приглашения и выхода, в секундах
+STARTUP_BUDGET = 0.1
 
 welcome_msg = """
 Добро пожаловать в Персональный помощник!
@@ -27,29 +25,58 @@ welcome_msg = """
 6. Выход
 """
 
+_MENU_SECTIONS = {"1": "note", "2": "task", "3": "contact", "4": "finance"}
+
+
+@lru_cache(maxsize=None)
+def get_service(section: str):
+    """Сервис раздела; создается при первом вызове."""
+    module_name, service_name, _ = _SECTIONS[section]
+    return getattr(import_module(module_name), service_name)()
+
+
+@lru_cache(maxsize=None)
+def get_controller(section: str):
+    """Контроллер раздела над его сервисом; создается при первом вызове."""
+    module_name, _, controller_name = _SECTIONS[section]
+    controller = getattr(import_module(module_name), controller_name)
+    return controller(get_service(section))
+
+
+def __getattr__(name: str):
+    # Совместимость с прежними атрибутами модуля: note_service, task_controller...
+    section, _, kind = name.rpartition("_")
+    if section in _SECTIONS and kind == "service":
+        return get_service(section)
+    if section in _SECTIONS and kind == "controller":
+        return get_controller(section)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 def exit_program():
     print("До свидания!")
 
 
+def run_calculator():
+    from calculator import CalculatorError, calculate
+
+    expression = input("Введите арифметическое выражение: ")
+    try:
+        print("Результат:", calculate(expression))
+    except CalculatorError as error:
+        print(f"Ошибка: {error}")
+
+
 def handle_choice_main():
 
     while True:
         print(welcome_msg)
         choice = input("Выберите действие: ")
 
-        if choice == "1":
-            note_controller.handle_choice()
-        elif choice == "2":
-            task_controller.handle_choice()
-        elif choice == "3":
-            contact_controller.handle_choice()
-        elif choice == "4":
-            finance_controller.handle_choice()
+        if choice in _MENU_SECTIONS:
+            get_controller(_MENU_SECTIONS[choice]).handle_choice()
         elif choice == "5":
-            expression = input("Введите арифметическое выражение: ")
-            result = calculate(expression)
-            print("Результат:", result)
+            run_calculator()
         elif choice == "6":
             exit_program()
             break
@@ -58,4 +85,46 @@ def handle_choice_main():
             handle_choice_main()
 
 
-handle_choice_main()
+def startup_check(budget: float = STARTUP_BUDGET, top: int = 10) -> int:
+    """Замер холодного запуска: меню до выхода в отдельном процессе.
+
+    Печатает время запуска и самые тяжелые импорты (по -X importtime);
+    возвращает 1, если запуск не уложился в budget секунд.
+    """
+    import subprocess
+    import time
+
+    command = [sys.executable, "-X", "importtime", __file__]
+    started = time.perf_counter()
+    result = subprocess.run(
+        command, input="6\n", capture_output=True, text=True, encoding="utf-8"
+    )
+    elapsed = time.perf_counter() - started
+
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if fields[0].strip().isdigit():
+            imports.append((int(fields[1]), fields[2].strip()))
+    imports.sort(reverse=True)
+    print(
+        f"Запуск до выхода: {elapsed * 1000:.1f} мс "
+        f"(бюджет {budget * 1000:.0f} мс)"
+    )
+    print("Самые тяжелые импорты (суммарно, мкс):")
+    for cumulative, module in imports[:top]:
+        print(f"{cumulative:>10}  {module}")
+    return 0 if result.returncode == 0 and elapsed <= budget else 1
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--batch"]:
+        from batch import BatchRunner, main
+
+        runner = BatchRunner(*(get_service(section) for section in _SECTIONS))
+        sys.exit(main(sys.argv[2:], runner))
+    if sys.argv[1:2] == ["--startup-check"]:
+        sys.exit(startup_check())
+    handle_choice_main()
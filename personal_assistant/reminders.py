@@ -0,0 +1,217 @@
+import asyncio
+import time
+import uuid
+from datetime import date, datetime
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+from indexes import CHANGE_DELETE, IndexedHeap, date_key
+from task import Task, TaskService
+
+DAY = 24 * 60 * 60
+
+
+class Reminder(NamedTuple):
+    task: Task
+    fire_at: float
+    lead: float
+
+
+ReminderCallback = Callable[[Reminder], Awaitable[Any]]
+
+
+class SystemClock:
+    """Wall-clock time and real asyncio sleeps."""
+
+    def now(self) -> float:
+        return time.time()
+
+    async def sleep(self, seconds: float) -> None:
+        await asyncio.sleep(seconds)
+
+
+class VirtualClock:
+    """Simulated time: sleeping advances the clock instantly.
+
+    Lets tests run months of reminders in milliseconds.
+    """
+
+    def __init__(self, start: float = 0.0) -> None:
+        self._now = start
+
+    def now(self) -> float:
+        return self._now
+
+    def advance(self, seconds: float) -> None:
+        self._now += max(seconds, 0.0)
+
+    async def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+        await asyncio.sleep(0)
+
+
+def due_timestamp(task: Task) -> Optional[float]:
+    """Start of the task's due day as a local timestamp, or None if invalid."""
+    ordinal = date_key(task.due_date)
+    if ordinal is None:
+        return None
+    due_day = date.fromordinal(ordinal)
+    return datetime(due_day.year, due_day.month, due_day.day).timestamp()
+
+
+class ReminderScheduler:
+    """Due-date reminders for the open tasks of a TaskService.
+
+    Pending reminders live in one IndexedHeap keyed by fire time, so a
+    single asyncio loop sleeps until the earliest one instead of polling
+    the tasks or holding a timer per task. The scheduler subscribes to
+    the service and reschedules a task whenever it is added, replaced,
+    marked done or deleted. Each lead (in seconds before the due day)
+    gives one reminder; reminders already in the past are fired at once
+    while the task is not yet due, and skipped for overdue tasks.
+    Each reminder fires once per due date: editing other fields of a
+    task keeps its pending reminders, and only a new due date re-arms
+    the leads that were already delivered.
+    """
+
+    def __init__(
+        self,
+        service: TaskService,
+        clock: Optional[Any] = None,
+        leads: Sequence[float] = (DAY,),
+    ) -> None:
+        self.service = service
+        self.clock = clock or SystemClock()
+        self.leads = tuple(leads)
+        self._callbacks: List[ReminderCallback] = []
+        self._heap = IndexedHeap()
+        self._scheduled: Dict[uuid.UUID, List[Tuple[uuid.UUID, float]]] = {}
+        # Due timestamp each scheduled task was armed for.
+        self._armed: Dict[uuid.UUID, float] = {}
+        # Leads already delivered, with the due timestamp they were for.
+        self._delivered: Dict[uuid.UUID, Tuple[float, Set[float]]] = {}
+        self._wakeup = asyncio.Event()
+        self._running = False
+        for task in service.tasks:
+            self._schedule(task)
+        service.subscribe(self._on_change)
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def add_callback(self, callback: ReminderCallback) -> None:
+        """Register an async callable that receives each fired Reminder."""
+        self._callbacks.append(callback)
+
+    def close(self) -> None:
+        """Stop following the service and stop a running loop."""
+        self.service.unsubscribe(self._on_change)
+        self._running = False
+        self._wakeup.set()
+
+    def _on_change(self, op: str, task: Task) -> None:
+        if op == CHANGE_DELETE:
+            self._unschedule(task.id)
+            self._delivered.pop(task.id, None)
+        elif not task.done and self._armed.get(task.id) == due_timestamp(task):
+            # Same due date: point the pending reminders at the new task
+            # object without re-arming anything.
+            for key in self._scheduled.get(task.id, ()):
+                lead = key[1]
+                fire_at = self._armed[task.id] - lead
+                self._heap.add(key, fire_at, Reminder(task, fire_at, lead))
+        else:
+            self._unschedule(task.id)
+            self._schedule(task)
+        self._wakeup.set()
+
+    def _schedule(self, task: Task) -> None:
+        if task.done:
+            return
+        due = due_timestamp(task)
+        if due is None or due <= self.clock.now():
+            return
+        delivered = self._delivered.get(task.id)
+        if delivered is not None and delivered[0] != due:
+            del self._delivered[task.id]
+            delivered = None
+        self._armed[task.id] = due
+        keys = []
+        for lead in self.leads:
+            if delivered is not None and lead in delivered[1]:
+                continue
+            key = (task.id, lead)
+            self._heap.add(key, due - lead, Reminder(task, due - lead, lead))
+            keys.append(key)
+        if keys:
+            self._scheduled[task.id] = keys
+
+    def _unschedule(self, task_id: uuid.UUID) -> None:
+        self._armed.pop(task_id, None)
+        for key in self._scheduled.pop(task_id, ()):
+            self._heap.discard(key)
+
+    def next_fire_time(self) -> Optional[float]:
+        reminder = self._heap.peek()
+        return None if reminder is None else reminder.fire_at
+
+    async def _deliver(self, reminder: Reminder) -> None:
+        for callback in self._callbacks:
+            try:
+                await callback(reminder)
+            except Exception as error:
+                print(f"Ошибка при отправке напоминания: {error}")
+
+    async def run_pending(self) -> int:
+        """Fire every reminder that is due by now; returns how many fired."""
+        fired = 0
+        now = self.clock.now()
+        while True:
+            reminder = self._heap.peek()
+            if reminder is None or reminder.fire_at > now:
+                return fired
+            key = (reminder.task.id, reminder.lead)
+            self._heap.discard(key)
+            task_id = reminder.task.id
+            keys = self._scheduled.get(task_id)
+            if keys is not None:
+                keys.remove(key)
+                if not keys:
+                    del self._scheduled[task_id]
+            due = self._armed[task_id]
+            self._delivered.setdefault(task_id, (due, set()))[1].add(reminder.lead)
+            await self._deliver(reminder)
+            fired += 1
+
+    async def run(self, until: Optional[float] = None) -> None:
+        """Fire reminders as they come due until close() is called.
+
+        With until set, returns once the clock passes that time or
+        nothing is left to fire before it.
+        """
+        self._running = True
+        while self._running:
+            await self.run_pending()
+            next_time = self.next_fire_time()
+            if until is not None and (next_time is None or next_time > until):
+                return
+            self._wakeup.clear()
+            waits = [asyncio.ensure_future(self._wakeup.wait())]
+            if next_time is not None:
+                delay = max(next_time - self.clock.now(), 0.0)
+                waits.append(asyncio.ensure_future(self.clock.sleep(delay)))
+            _, pending = await asyncio.wait(
+                waits, return_when=asyncio.FIRST_COMPLETED
+            )
+            for waiter in pending:
+                waiter.cancel()
@@ -0,0 +1,473 @@
+import sqlite3
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from contact import Contact, ContactService
+from finance_record import FinanceRecord, FinanceService, category_key
+from indexes import CHANGE_DELETE, date_key
+from note import Note, NoteService, tokenize
+from task import Task, TaskService
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    name_lower TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    email TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_phone ON contacts (phone);
+
+CREATE TABLE IF NOT EXISTS notes (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    content TEXT NOT NULL,
+    timestamp TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS tasks (
+    id TEXT PRIMARY KEY,
+    title TEXT NOT NULL,
+    description TEXT NOT NULL,
+    done INTEGER NOT NULL,
+    priority INTEGER NOT NULL,
+    due_date TEXT NOT NULL,
+    due_ordinal INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS tasks_done_priority ON tasks (done, priority);
+CREATE INDEX IF NOT EXISTS tasks_due ON tasks (due_ordinal);
+
+CREATE TABLE IF NOT EXISTS finance (
+    id TEXT PRIMARY KEY,
+    amount REAL NOT NULL,
+    category TEXT NOT NULL,
+    category_key TEXT NOT NULL,
+    date TEXT NOT NULL,
+    date_ordinal INTEGER,
+    description TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    seq INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS finance_seq ON finance (seq);
+CREATE INDEX IF NOT EXISTS finance_category ON finance (category_key, seq);
+CREATE INDEX IF NOT EXISTS finance_category_date ON finance (category_key, date, seq);
+CREATE INDEX IF NOT EXISTS finance_date ON finance (date, seq);
+CREATE INDEX IF NOT EXISTS finance_date_ordinal ON finance (date_ordinal, seq);
+"""
+
+# Полнотекстовые индексы создаются, только если SQLite собран с FTS5
+_NOTES_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts "
+    "USING fts5(id UNINDEXED, title, content)"
+)
+_CONTACTS_FTS = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts "
+    "USING fts5(id UNINDEXED, name, phone, tokenize='trigram')"
+)
+
+
+def _contact_row(contact: Contact) -> tuple:
+    return (
+        str(contact.id),
+        contact.name,
+        contact.name.lower(),
+        contact.phone,
+        contact.email,
+        contact.updated_at,
+    )
+
+
+def _note_row(note: Note) -> tuple:
+    return (str(note.id), note.title, note.content, note.timestamp, note.updated_at)
+
+
+def _task_row(task: Task) -> tuple:
+    return (
+        str(task.id),
+        task.title,
+        task.description,
+        int(bool(task.done)),
+        task.priority,
+        task.due_date,
+        date_key(task.due_date),
+        task.updated_at,
+    )
+
+
+def _record_row(record: FinanceRecord) -> tuple:
+    return (
+        str(record.id),
+        record.amount,
+        record.category,
+        category_key(record.category),
+        record.date,
+        date_key(record.date),
+        record.description,
+        record.updated_at,
+    )
+
+
+class _Table:
+    """Описание таблицы сервиса: строка из объекта и SQL запросы."""
+
+    def __init__(
+        self,
+        name: str,
+        model: Any,
+        to_row: Callable[[Any], tuple],
+        columns: Tuple[str, ...],
+        select: Tuple[str, ...],
+        bulk_upsert: str,
+        sequenced: bool = False,
+    ) -> None:
+        self.name = name
+        self.model = model
+        self.to_row = to_row
+        self.upsert = _upsert_sql(name, columns, sequenced)
+        self.delete = f"DELETE FROM {name} WHERE id = ?"
+        order = "seq" if sequenced else "rowid"
+        self.select = f"SELECT {', '.join(select)} FROM {name} ORDER BY {order}"
+        self.select_columns = select
+        # Пакетный upsert сервиса для загрузки из базы
+        self.bulk_upsert = bulk_upsert
+
+
+def _upsert_sql(name: str, columns: Tuple[str, ...], sequenced: bool) -> str:
+    """INSERT для строки таблицы с обновлением строки с тем же id.
+
+    Обновление сохраняет rowid, то есть порядок добавления, как у
+    IndexedCollection. Со sequenced новая строка получает следующий номер
+    seq, а обновленная сохраняет прежний: так порядок строк в запросах
+    совпадает с порядком реестра FinanceService и после правок.
+    """
+    updates = ", ".join(f"{column} = excluded.{column}" for column in columns[1:])
+    values = ["?"] * len(columns)
+    if sequenced:
+        columns += ("seq",)
+        values.append(f"(SELECT coalesce(max(seq), 0) + 1 FROM {name})")
+    insert = (
+        f"INSERT INTO {name} ({', '.join(columns)}) VALUES ({', '.join(values)})"
+    )
+    return f"{insert} ON CONFLICT(id) DO UPDATE SET {updates}"
+
+
+_CONTACTS = _Table(
+    "contacts",
+    Contact,
+    _contact_row,
+    ("id", "name", "name_lower", "phone", "email", "updated_at"),
+    ("id", "name", "phone", "email", "updated_at"),
+    "upsert_contacts",
+)
+_NOTES = _Table(
+    "notes",
+    Note,
+    _note_row,
+    ("id", "title", "content", "timestamp", "updated_at"),
+    ("id", "title", "content", "timestamp", "updated_at"),
+    "upsert_notes",
+)
+_TASKS = _Table(
+    "tasks",
+    Task,
+    _task_row,
+    (
+        "id",
+        "title",
+        "description",
+        "done",
+        "priority",
+        "due_date",
+        "due_ordinal",
+        "updated_at",
+    ),
+    ("id", "title", "description", "done", "priority", "due_date", "updated_at"),
+    "upsert_tasks",
+)
+_FINANCE = _Table(
+    "finance",
+    FinanceRecord,
+    _record_row,
+    (
+        "id",
+        "amount",
+        "category",
+        "category_key",
+        "date",
+        "date_ordinal",
+        "description",
+        "updated_at",
+    ),
+    ("id", "amount", "category", "date", "description", "updated_at"),
+    "upsert_records",
+    sequenced=True,
+)
+
+
+def _table_for(service: Any) -> _Table:
+    if isinstance(service, ContactService):
+        return _CONTACTS
+    if isinstance(service, NoteService):
+        return _NOTES
+    if isinstance(service, TaskService):
+        return _TASKS
+    if isinstance(service, FinanceService):
+        return _FINANCE
+    raise TypeError(f"Хранение в SQLite не поддерживается для {type(service)}")
+
+
+def _fts_phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+class SQLiteStorage:
+    """Хранилище сервисов в базе SQLite со сквозной записью изменений.
+
+    База - сохраняемое зеркало сервисов, а не замена их памяти: сервисы
+    по-прежнему держат все объекты в памяти и отвечают на свои запросы
+    сами. attach(service) загружает в сервис сохраненные объекты (пакетным
+    upsert сервиса, если он есть) и подписывается на его изменения: каждое
+    добавление, изменение и удаление сразу записывается в базу одним
+    подготовленным запросом, поэтому методы сервисов и их сигнатуры
+    не меняются. База работает в режиме WAL, объекты, которых еще нет
+    в базе, записываются пачкой через executemany.
+
+    Методы find_contacts, filter_records, generate_report и search_notes
+    отвечают на те же запросы, что и сервисы, прямо из базы по индексам,
+    не загружая данные в память. Для заметок используется FTS5, для поиска
+    подстрок в контактах — FTS5 с токенизатором trigram, если SQLite
+    их поддерживает; иначе запросы выполняются обычным просмотром таблицы.
+    """
+
+    def __init__(self, filename: str = "personal_assistant.db") -> None:
+        self.filename = filename
+        self._connection = sqlite3.connect(filename, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+        self.notes_fts = self._create_fts(_NOTES_FTS)
+        self.contacts_fts = self._create_fts(_CONTACTS_FTS)
+        self._listeners: Dict[int, Callable[[str, Any], None]] = {}
+
+    def _create_fts(self, statement: str) -> bool:
+        try:
+            self._connection.execute(statement)
+        except sqlite3.OperationalError:
+            return False
+        return True
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> "SQLiteStorage":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    # Сквозная запись
+
+    def attach(self, service: Any, load: bool = True) -> None:
+        """Подключение сервиса к базе.
+
+        При load в сервис загружаются объекты из базы; объекты сервиса,
+        которых в базе нет, записываются в нее.
+        """
+        table = _table_for(service)
+        stored = set()
+        if load:
+            items = []
+            for data in self._rows(table, table.select, ()):
+                stored.add(data["id"])
+                items.append(table.model.from_dict(data))
+            getattr(service, table.bulk_upsert)(items)
+        self.save_all(
+            (item for item in service.iter_items() if str(item.id) not in stored),
+            table,
+        )
+
+        def listener(op: str, item: Any) -> None:
+            if op == CHANGE_DELETE:
+                self._delete(table, item)
+            else:
+                self._write(table, item)
+
+        service.subscribe(listener)
+        self._listeners[id(service)] = listener
+
+    def detach(self, service: Any) -> None:
+        listener = self._listeners.pop(id(service), None)
+        if listener is not None:
+            service.unsubscribe(listener)
+
+    def save_all(self, items: Iterable[Any], table: Optional[_Table] = None) -> None:
+        """Запись объектов одной транзакцией через executemany."""
+        items = list(items)
+        if not items:
+            return
+        table = table or _table_for_model(items[0])
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(table.upsert, map(table.to_row, items))
+            for item in items:
+                self._write_fts(table, item, replace=False)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _write(self, table: _Table, item: Any) -> None:
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            connection.execute(table.upsert, table.to_row(item))
+            self._write_fts(table, item, replace=True)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _delete(self, table: _Table, item: Any) -> None:
+        connection = self._connection
+        connection.execute("BEGIN")
+        try:
+            connection.execute(table.delete, (str(item.id),))
+            self._delete_fts(table, item)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _write_fts(self, table: _Table, item: Any, replace: bool) -> None:
+        if replace:
+            self._delete_fts(table, item)
+        if table is _NOTES and self.notes_fts:
+            self._connection.execute(
+                "INSERT INTO notes_fts (id, title, content) VALUES (?, ?, ?)",
+                (
+                    str(item.id),
+                    " ".join(tokenize(item.title)),
+                    " ".join(tokenize(item.content)),
+                ),
+            )
+        elif table is _CONTACTS and self.contacts_fts:
+            self._connection.execute(
+                "INSERT INTO contacts_fts (id, name, phone) VALUES (?, ?, ?)",
+                (str(item.id), item.name.lower(), item.phone),
+            )
+
+    def _delete_fts(self, table: _Table, item: Any) -> None:
+        if table is _NOTES and self.notes_fts:
+            self._connection.execute(
+                "DELETE FROM notes_fts WHERE id = ?", (str(item.id),)
+            )
+        elif table is _CONTACTS and self.contacts_fts:
+            self._connection.execute(
+                "DELETE FROM contacts_fts WHERE id = ?", (str(item.id),)
+            )
+
+    # Запросы
+
+    def _rows(self, table: _Table, sql: str, parameters: tuple) -> Iterable[dict]:
+        columns = table.select_columns
+        for row in self._connection.execute(sql, parameters):
+            data = dict(zip(columns, row))
+            if table is _TASKS:
+                data["done"] = bool(data["done"])
+            yield data
+
+    def _objects(self, table: _Table, sql: str, parameters: tuple) -> List[Any]:
+        return [
+            table.model.from_dict(data) for data in self._rows(table, sql, parameters)
+        ]
+
+    def _select(self, table: _Table, where: str, order: str = "rowid") -> str:
+        columns = ", ".join(f"{table.name}.{column}" for column in table.select_columns)
+        return f"SELECT {columns} FROM {table.name} WHERE {where} ORDER BY {order}"
+
+    def find_contacts(self, search_term: str) -> List[Contact]:
+        """Поиск контактов по подстроке имени или телефона, как find_contact."""
+        term_lower = search_term.lower()
+        condition = "(instr(name_lower, ?) > 0 OR instr(phone, ?) > 0)"
+        parameters: tuple = (term_lower, search_term)
+        if self.contacts_fts and len(search_term) >= 3:
+            condition += (
+                " AND id IN (SELECT id FROM contacts_fts WHERE contacts_fts MATCH ?)"
+            )
+            parameters += (
+                f"name : {_fts_phrase(term_lower)} OR phone : "
+                f"{_fts_phrase(search_term)}",
+            )
+        return self._objects(_CONTACTS, self._select(_CONTACTS, condition), parameters)
+
+    def filter_records(
+        self, category: Optional[str] = None, date: Optional[str] = None
+    ) -> List[FinanceRecord]:
+        """Фильтрация записей по категории или дате, как у FinanceService."""
+        conditions = []
+        parameters: tuple = ()
+        if category is not None:
+            conditions.append("category_key = ?")
+            parameters += (category_key(category),)
+        if date is not None:
+            conditions.append("date = ?")
+            parameters += (date,)
+        if not conditions:
+            return self._objects(_FINANCE, _FINANCE.select, ())
+        where = " AND ".join(conditions)
+        return self._objects(
+            _FINANCE, self._select(_FINANCE, where, "seq"), parameters
+        )
+
+    def generate_report(self, start_date: str, end_date: str) -> List[FinanceRecord]:
+        """Записи за период в порядке дат, как FinanceService.generate_report."""
+        start_ordinal = date_key(start_date)
+        end_ordinal = date_key(end_date)
+        if start_ordinal is None or end_ordinal is None:
+            raise ValueError("Даты периода должны быть в формате ДД-ММ-ГГГГ")
+        return self._objects(
+            _FINANCE,
+            self._select(
+                _FINANCE, "date_ordinal BETWEEN ? AND ?", "date_ordinal, seq"
+            ),
+            (start_ordinal, end_ordinal),
+        )
+
+    def search_notes(self, query: str, limit: int = 10) -> List[Note]:
+        """Полнотекстовый поиск заметок; фразы задаются в двойных кавычках.
+
+        Название весит втрое больше содержимого, как в NoteSearchIndex.
+        """
+        phrases = [" ".join(tokenize(phrase)) for phrase in query.split('"')[1::2]]
+        words = tokenize(" ".join(query.split('"')[0::2]))
+        terms = [phrase for phrase in phrases if phrase] + words
+        if not terms:
+            return []
+        if self.notes_fts:
+            columns = ", ".join(f"notes.{column}" for column in _NOTES.select_columns)
+            sql = (
+                f"SELECT {columns} FROM notes_fts JOIN notes ON notes.id = notes_fts.id"
+                " WHERE notes_fts MATCH ? ORDER BY bm25(notes_fts, 0, 3.0, 1.0)"
+                " LIMIT ?"
+            )
+            match = " AND ".join(_fts_phrase(term) for term in terms)
+            return self._objects(_NOTES, sql, (match, limit))
+        # Без FTS5: просмотр таблицы с проверкой каждого слова в Python
+        result = []
+        for note in self._objects(_NOTES, _NOTES.select, ()):
+            text = " " + " ".join(tokenize(note.title + " " + note.content)) + " "
+            if all(f" {term} " in text for term in terms):
+                result.append(note)
+                if len(result) >= limit:
+                    break
+        return result
+
+
+def _table_for_model(item: Any) -> _Table:
+    for table in (_CONTACTS, _NOTES, _TASKS, _FINANCE):
+        if isinstance(item, table.model):
+            return table
+    raise TypeError(f"Хранение в SQLite не поддерживается для {type(item)}")
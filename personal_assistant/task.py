@@ -1,19 +1,47 @@
 import uuid
 import csv
 import json
-from typing import List, Optional
+import time
+from datetime import date
+from itertools import islice
+from math import inf
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from csv_import import DEFAULT_BATCH_SIZE, ImportReport, stream_csv_import
+from indexes import (
+    CHANGE_ADD,
+    CHANGE_DELETE,
+    CHANGE_REPLACE,
+    MERGE_OVERWRITE,
+    ChangeEmitter,
+    HashIndex,
+    IndexedCollection,
+    IndexedHeap,
+    SortedIndex,
+    date_key,
+    parse_id,
+    should_replace,
+)
 
 
 class Task:
     def __init__(
-        self, title: str, description: str, done: bool, priority: int, due_date: str
+        self,
+        title: str,
+        description: str,
+        done: bool,
+        priority: int,
+        due_date: str,
+        id: Optional[uuid.UUID] = None,
+        updated_at: Optional[float] = None,
     ) -> None:
-        self.id = uuid.uuid4()
+        self.id = id or uuid.uuid4()
         self.title = title
         self.description = description
         self.done = done
         self.priority = priority
         self.due_date = due_date
+        self.updated_at = time.time() if updated_at is None else updated_at
 
     def to_dict(self) -> dict:
         return {
@@ -23,36 +51,360 @@ class Task:
             "done": self.done,
             "priority": self.priority,
             "due_date": self.due_date,
+            "updated_at": self.updated_at,
         }
 
-
-class TaskService:
+    @classmethod
+    def from_dict(cls, data: dict) -> "Task":
+        """Build a task from a dict, keeping its stored id if present."""
+        return cls(
+            title=data["title"],
+            description=data["description"],
+            done=data["done"],
+            priority=data["priority"],
+            due_date=data["due_date"],
+            id=parse_id(data.get("id")),
+            updated_at=data.get("updated_at"),
+        )
+
+    def same_data(self, other: "Task") -> bool:
+        """Whether both tasks hold the same data, ignoring id and updated_at."""
+        return (
+            self.title == other.title
+            and self.description == other.description
+            and self.done == other.done
+            and self.priority == other.priority
+            and self.due_date == other.due_date
+        )
+
+
+def _task_from_row(row: List[str]) -> Task:
+    """Build a task from a CSV row (Id, Title, Description, Done, Priority, Due)."""
+    id_str, title, description, done_str, priority_str, due_date = row[:6]
+    try:
+        priority = int(priority_str)
+    except ValueError:
+        raise ValueError(f"некорректный приоритет: {priority_str!r}") from None
+    return Task(
+        title=title,
+        description=description,
+        done=done_str.lower() == "true",
+        priority=priority,
+        due_date=due_date,
+    )
+
+
+def _date_ordinal(value: Union[str, date, None]) -> Optional[int]:
+    """Day ordinal of a DD-MM-YYYY string or a date; None stays None."""
+    if value is None:
+        return None
+    if isinstance(value, date):
+        return value.toordinal()
+    ordinal = date_key(value)
+    if ordinal is None:
+        raise ValueError(f"некорректная дата: {value!r}, ожидается ДД-ММ-ГГГГ")
+    return ordinal
+
+
+class TaskQuery:
+    """Composable query over the tasks of a TaskService.
+
+    Conditions are combined with AND; calling the same condition again
+    replaces it. On iteration a planner picks the most selective of the
+    done, priority and due date indexes (or a full scan), streams its
+    candidates and checks the remaining conditions lazily. Results come
+    in the order of the chosen index, which explain() reports.
+    """
+
+    def __init__(self, service: "TaskService") -> None:
+        self._service = service
+        self._done: Optional[bool] = None
+        self._priority: Optional[Tuple[Optional[int], Optional[int]]] = None
+        self._due: Optional[Tuple[Optional[int], Optional[int]]] = None
+        self._title: Optional[str] = None
+        self._predicates: List[Callable[[Task], bool]] = []
+        self._offset = 0
+        self._limit: Optional[int] = None
+
+    def done(self, value: bool = True) -> "TaskQuery":
+        self._done = bool(value)
+        return self
+
+    def priority(
+        self, low: Optional[int] = None, high: Optional[int] = None
+    ) -> "TaskQuery":
+        """Priority within [low, high]; None leaves that side open."""
+        self._priority = (low, high)
+        return self
+
+    def due(
+        self,
+        start: Union[str, date, None] = None,
+        end: Union[str, date, None] = None,
+    ) -> "TaskQuery":
+        """Due date within [start, end]; tasks without a valid date never match."""
+        self._due = (_date_ordinal(start), _date_ordinal(end))
+        return self
+
+    def due_within(
+        self, days: int, today: Union[str, date, None] = None
+    ) -> "TaskQuery":
+        """Due date from today through today + days."""
+        start = _date_ordinal(today if today is not None else date.today())
+        self._due = (start, start + days)
+        return self
+
+    def title_contains(self, text: str) -> "TaskQuery":
+        """Case-insensitive substring match on the title."""
+        self._title = text.casefold()
+        return self
+
+    def where(self, predicate: Callable[[Task], bool]) -> "TaskQuery":
+        """Add an arbitrary condition; it is always checked by scanning."""
+        self._predicates.append(predicate)
+        return self
+
+    def offset(self, count: int) -> "TaskQuery":
+        self._offset = count
+        return self
+
+    def limit(self, count: Optional[int]) -> "TaskQuery":
+        self._limit = count
+        return self
+
+    def _plan(self) -> Tuple[str, int, Callable[[], Iterator[Task]]]:
+        """The cheapest access path as (name, estimated rows, iterator factory)."""
+        service = self._service
+        plans = [("scan", len(service.tasks), lambda: iter(service.tasks))]
+        if self._done is not None:
+            done = self._done
+            plans.append(
+                (
+                    "done",
+                    service._done_index.count(done),
+                    lambda: service._done_index.iter(done),
+                )
+            )
+        if self._priority is not None:
+            low, high = self._priority
+            plans.append(
+                (
+                    "priority",
+                    service._priority_index.count(low, high),
+                    lambda: service._priority_index.iter_range(low, high),
+                )
+            )
+        if self._due is not None:
+            start, end = self._due
+            plans.append(
+                (
+                    "due_date",
+                    service._due_index.count(start, end),
+                    lambda: service._due_index.iter_range(start, end),
+                )
+            )
+        return min(plans, key=lambda plan: plan[1])
+
+    def explain(self) -> dict:
+        """Which access path the query will use and how many rows it reads."""
+        name, rows, _ = self._plan()
+        return {"index": name, "rows": rows}
+
+    def _matches(self, task: Task) -> bool:
+        if self._done is not None and bool(task.done) != self._done:
+            return False
+        if self._priority is not None:
+            low, high = self._priority
+            if low is not None and task.priority < low:
+                return False
+            if high is not None and task.priority > high:
+                return False
+        if self._due is not None:
+            ordinal = date_key(task.due_date)
+            start, end = self._due
+            if ordinal is None:
+                return False
+            if start is not None and ordinal < start:
+                return False
+            if end is not None and ordinal > end:
+                return False
+        if self._title is not None and self._title not in task.title.casefold():
+            return False
+        return all(predicate(task) for predicate in self._predicates)
+
+    def __iter__(self) -> Iterator[Task]:
+        _, _, candidates = self._plan()
+        matches = (task for task in candidates() if self._matches(task))
+        stop = None if self._limit is None else self._offset + self._limit
+        return islice(matches, self._offset, stop)
+
+    def all(self) -> List[Task]:
+        return list(self)
+
+
+class TaskService(ChangeEmitter):
     def __init__(self, tasks: Optional[List[Task]] = None) -> None:
-        self.tasks = tasks if tasks is not None else []
+        super().__init__()
+        self.tasks = IndexedCollection()
+        # Open tasks only: highest priority first, then earliest due date.
+        self._queue = IndexedHeap()
+        # Open tasks with a valid due date, earliest first.
+        self._due_queue = IndexedHeap()
+        # Secondary indexes over all tasks for TaskQuery.
+        self._done_index = HashIndex()
+        self._priority_index = SortedIndex()
+        self._due_index = SortedIndex()
+        # Set by upsert_tasks into an empty service; see _ensure_indexes.
+        self._deferred_index = False
+        for task in tasks or ():
+            self.add_task(task)
+
+    def _index_task(self, task: Task) -> None:
+        due = date_key(task.due_date)
+        self._done_index.add(bool(task.done), task.id, task)
+        self._priority_index.add(task.id, task.priority, task)
+        if due is not None:
+            self._due_index.add(task.id, due, task)
+        if task.done:
+            return
+        self._queue.add(task.id, (-task.priority, inf if due is None else due), task)
+        if due is not None:
+            self._due_queue.add(task.id, due, task)
+
+    def _ensure_indexes(self) -> None:
+        """Build the indexes deferred by a bulk load into an empty service."""
+        if not self._deferred_index:
+            return
+        self._deferred_index = False
+        for task in self.tasks:
+            self._index_task(task)
+
+    def _unindex_task(self, task: Task) -> None:
+        self._done_index.discard(bool(task.done), task.id)
+        self._priority_index.discard(task.id)
+        self._due_index.discard(task.id)
+        self._queue.discard(task.id)
+        self._due_queue.discard(task.id)
 
     def add_task(self, task: Task) -> None:
-        self.tasks.append(task)
+        self._ensure_indexes()
+        self.tasks.add(task)
+        self._index_task(task)
+        self._emit(CHANGE_ADD, task)
 
     def get_all_tasks(self) -> List[Task]:
-        return self.tasks
+        return list(self.tasks)
 
     def get_task_by_id(self, id: uuid.UUID) -> Optional[Task]:
-        for task in self.tasks:
-            if task.id == id:
-                return task
-        return None
-
-    def replace_task_by_id(self, id: uuid.UUID, new_task: Task) -> None:
-        for i, task in enumerate(self.tasks):
-            if task.id == id:
-                self.tasks[i] = new_task
-                break
-
-    def delete_task_by_id(self, id: uuid.UUID) -> None:
-        for i, task in enumerate(self.tasks):
-            if task.id == id:
-                self.tasks.pop(i)
-                break
+        return self.tasks.get(id)
+
+    def replace_task_by_id(self, id: uuid.UUID, new_task: Task) -> bool:
+        """Replace a task in place; the new task keeps the old id."""
+        self._ensure_indexes()
+        old_task = self.tasks.get(id)
+        if old_task is None:
+            return False
+        self._unindex_task(old_task)
+        self.tasks.replace(id, new_task)
+        self._index_task(new_task)
+        self._emit(CHANGE_REPLACE, new_task)
+        return True
+
+    def mark_task_done(self, id: uuid.UUID) -> bool:
+        """Mark a task as done and drop it from the open-task queues."""
+        self._ensure_indexes()
+        task = self.tasks.get(id)
+        if task is None:
+            return False
+        self._unindex_task(task)
+        task.done = True
+        task.updated_at = time.time()
+        self._index_task(task)
+        self._emit(CHANGE_REPLACE, task)
+        return True
+
+    def next_tasks(self, n: int = 5) -> List[Task]:
+        """The n open tasks to work on next.
+
+        Higher priority comes first; equal priorities are ordered by due
+        date, with tasks without a valid due date last.
+        """
+        self._ensure_indexes()
+        return self._queue.smallest(n)
+
+    def overdue(self, today: Union[str, date, None] = None) -> List[Task]:
+        """Open tasks due before today (DD-MM-YYYY or a date), earliest first."""
+        self._ensure_indexes()
+        return self._due_queue.below(
+            _date_ordinal(today if today is not None else date.today())
+        )
+
+    def query(self) -> TaskQuery:
+        """Start a query, e.g. query().done(False).priority(3).due_within(7)."""
+        self._ensure_indexes()
+        return TaskQuery(self)
+
+    def upsert_task(self, task: Task, policy: str = MERGE_OVERWRITE) -> bool:
+        """Add a task or replace the task with the same id per the merge policy.
+
+        Returns True if the task was added or replaced.
+        """
+        self._ensure_indexes()
+        existing = self.tasks.get(task.id)
+        if existing is None:
+            self.add_task(task)
+            return True
+        if not should_replace(existing, task, policy):
+            return False
+        return self.replace_task_by_id(task.id, task)
+
+    def upsert_tasks(
+        self, tasks: Iterable[Task], policy: str = MERGE_OVERWRITE
+    ) -> int:
+        """Batch upsert_task for loading large task lists.
+
+        Into an empty service tasks are only stored, and the indexes and
+        queues are built in one pass on the first query or change.
+        Otherwise tasks are merged one by one. Returns the number of added
+        or replaced tasks.
+        """
+        if self.tasks:
+            return sum(self.upsert_task(task, policy) for task in tasks)
+        changed = 0
+        for task in tasks:
+            existing = self.tasks.get(task.id)
+            if existing is None:
+                self.tasks.add(task)
+                op = CHANGE_ADD
+            elif should_replace(existing, task, policy):
+                self.tasks.replace(task.id, task)
+                op = CHANGE_REPLACE
+            else:
+                continue
+            self._deferred_index = True
+            self._emit(op, task)
+            changed += 1
+        return changed
+
+    def delete_task_by_id(self, id: uuid.UUID) -> bool:
+        self._ensure_indexes()
+        task = self.tasks.remove(id)
+        if task is None:
+            return False
+        self._unindex_task(task)
+        self._emit(CHANGE_DELETE, task)
+        return True
+
+    def iter_items(self) -> Iterator[Task]:
+        """Iterate over all tasks (used for journal snapshots)."""
+        return iter(self.tasks)
+
+    def apply_change(self, op: str, data: dict) -> None:
+        """Apply a journal change: upsert for add/replace, delete by id."""
+        if op == CHANGE_DELETE:
+            self.delete_task_by_id(uuid.UUID(data["id"]))
+        else:
+            self.upsert_task(Task.from_dict(data))
 
     def export_as_csv(self, filename: str) -> None:
         with open(filename, mode="w", newline="", encoding="utf-8") as file:
@@ -72,24 +424,39 @@ class TaskService:
                     ]
                 )
 
-    def import_csv(self, filename: str) -> None:
-        with open(filename, mode="r", newline="", encoding="utf-8") as file:
-            reader = csv.reader(file)
-            next(reader)  # Skip header
-            for row in reader:
-                if len(row) < 6:
-                    continue
-                id_str, title, description, done_str, priority_str, due_date = row
-                done = done_str.lower() == "true"
-                priority = int(priority_str)
-                task = Task(
-                    title=title,
-                    description=description,
-                    done=done,
-                    priority=priority,
-                    due_date=due_date,
-                )
+    def import_csv(
+        self,
+        filename: str,
+        reject_filename: Optional[str] = None,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        progress: Optional[Callable[[ImportReport], None]] = None,
+    ) -> ImportReport:
+        """Import tasks from a CSV file, all rows or none.
+
+        Invalid rows abort the import unless reject_filename is given,
+        in which case they are written there with their line numbers.
+        """
+        added: List[Task] = []
+
+        def apply_batch(batch: List[Task]) -> None:
+            for task in batch:
                 self.add_task(task)
+                added.append(task)
+
+        def rollback() -> None:
+            for task in added:
+                self.delete_task_by_id(task.id)
+
+        return stream_csv_import(
+            filename,
+            6,
+            _task_from_row,
+            apply_batch,
+            rollback,
+            reject_filename=reject_filename,
+            batch_size=batch_size,
+            progress=progress,
+        )
 
     def export_as_json(self, filename: str) -> None:
         """Save tasks to a JSON file."""
@@ -101,18 +468,11 @@ class TaskService:
                 indent=4,
             )
 
-    def import_json(self, filename: str) -> None:
+    def import_json(self, filename: str, policy: str = MERGE_OVERWRITE) -> None:
+        """Load tasks from a JSON file, upserting them by their stored ids."""
         with open(filename, mode="r", encoding="utf-8") as file:
             tasks_data = json.load(file)
-            for data in tasks_data:
-                task = Task(
-                    title=data["title"],
-                    description=data["description"],
-                    done=data["done"],
-                    priority=data["priority"],
-                    due_date=data["due_date"],
-                )
-                self.add_task(task)
+            self.upsert_tasks((Task.from_dict(data) for data in tasks_data), policy)
 
 
 class TaskController:
@@ -132,6 +492,9 @@ class TaskController:
 7. Импортировать задачи из CSV
 8. Сохранить задачи в JSON
 9. Загрузить задачи из JSON
+10. Отметить задачу выполненной
+11. Показать следующие задачи
+12. Показать просроченные задачи
 0. Выход
 """
             )
@@ -240,6 +603,28 @@ class TaskController:
                 self.task_service.import_json(file_name)
                 print(f"Задачи загружены из файла {file_name}.")
 
+            elif choice == "10":
+                task_id = input("Введите ID выполненной задачи: ")
+
+                if self.task_service.mark_task_done(uuid.UUID(task_id)):
+                    print("Задача отмечена выполненной.")
+                else:
+                    print("Задача не найдена.")
+
+            elif choice == "11" or choice == "12":
+                if choice == "11":
+                    count_input = input("Сколько задач показать (по умолчанию 5): ")
+                    tasks = self.task_service.next_tasks(int(count_input or 5))
+                else:
+                    tasks = self.task_service.overdue()
+                if not tasks:
+                    print("Нет подходящих задач.")
+                for task in tasks:
+                    print(
+                        f"ID: {task.id}, Название: {task.title}, "
+                        f"Приоритет: {task.priority}, Срок: {task.due_date}"
+                    )
+
             elif choice == "0":
                 print("Выход из программы.")
                 break
@@ -0,0 +1,59 @@
+"""Накопленные итоги FinanceService после добавлений, правок и удалений."""
+
+import math
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "personal_assistant"))
+
+from finance_record import FinanceRecord, FinanceService  # noqa: E402
+
+CATEGORIES = ("Еда", "Транспорт", "Зарплата", "Жилье", "Связь")
+
+
+def _record(rng: random.Random) -> FinanceRecord:
+    return FinanceRecord(
+        round(rng.uniform(-500, 500), 2),
+        rng.choice(CATEGORIES),
+        f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2024",
+        "",
+    )
+
+
+def test_totals_are_exact_after_add_edit_delete():
+    rng = random.Random(1)
+    service = FinanceService()
+    records = [_record(rng) for _ in range(20_000)]
+    for record in records:
+        service.add_record(record)
+    for record in rng.sample(records, 5_000):
+        service.replace_record_by_id(record.id, _record(rng))
+    for record in rng.sample(records, 10_000):
+        service.delete_record_by_id(record.id)
+
+    assert service.check_totals()
+    amounts = [record.amount for record in service.get_all_records()]
+    totals = service.get_totals()
+    assert totals.count == len(amounts)
+    assert totals.income == math.fsum(amount for amount in amounts if amount >= 0)
+    assert totals.expense == -math.fsum(amount for amount in amounts if amount < 0)
+    assert totals.balance == math.fsum(amounts)
+
+
+def test_totals_return_to_zero_after_deleting_everything():
+    rng = random.Random(2)
+    service = FinanceService()
+    records = [_record(rng) for _ in range(1_000)]
+    for record in records:
+        service.add_record(record)
+    for record in records:
+        service.delete_record_by_id(record.id)
+
+    assert service.check_totals()
+    assert service.get_totals().to_dict() == {
+        "income": 0.0,
+        "expense": 0.0,
+        "balance": 0.0,
+        "count": 0,
+    }